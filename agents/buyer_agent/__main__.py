@@ -1,7 +1,9 @@
-from common.a2a_server import create_app 
-from .task_manager import run 
+from common.a2a_server import create_app, serve
+from .task_manager import run, run_stream, startup
 
-app = create_app(agent=type("Agent", (), {"execute": run}))
+app = create_app(
+    agent=type("Agent", (), {"execute": run, "stream": run_stream, "startup": startup}),
+    name="buyer_agent",
+)
 if __name__ == "__main__":
-    import uvicorn 
-    uvicorn.run(app,port=8001)
\ No newline at end of file
+    serve("agents.buyer_agent.__main__:app", port=8001)
@@ -1,22 +1,29 @@
 # agent.py
-import json
+import asyncio
 import logging
+import os
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 from google.genai import types
+from common.listing_store import ListingStore
+from common.logging_setup import configure_logging, LogPayload
+from common.model_backend import get_model
+from common.prompt_budget import after_model, before_model
+from common.rate_limit import limit_model_call, settle_model_call
+from common.response_cache import ResponseCache
+from common.session_store import make_session_service
+from common.sessions import SessionPool
+from common.streaming import stream_model
+from common.structured_output import OutputSchema, SchemaError
+from common.tracing import span, traced
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # --- Agent definition ---
 buyer_agent = Agent(
     name="buyer_agent",
-    model="gemini-2.0-flash",
+    model=get_model("buyer"),
     description=(
         "Helps buyers find and evaluate real estate properties "
         "based on their preferences, location, and budget."
@@ -28,11 +35,13 @@ buyer_agent = Agent(
         "{ \"buyer\": [ { \"name\": \"...\", \"description\": \"...\", \"price\": 0, "
         "\"location\": \"...\", \"size\": 0, \"features\": [\"...\"] } ] }\n"
         "Do not include any extra text, markdown, or code fences."
-    )
+    ),
+    before_model_callback=[before_model, limit_model_call],
+    after_model_callback=[after_model, settle_model_call],
 )
 
 # --- Session + Runner ---
-session_service = InMemorySessionService()
+session_service = make_session_service()
 runner = Runner(
     agent=buyer_agent,
     app_name="buyer_app",
@@ -40,26 +49,21 @@ runner = Runner(
 )
 
 USER_ID = "user_buyer"
-SESSION_ID = "session_buyer"
+sessions = SessionPool(session_service, app_name="buyer_app", default_user_id=USER_ID)
+cache = ResponseCache("buyer", fields=("location", "budget", "property_type", "requirements"))
+SCHEMA = OutputSchema("buyer", required=("name", "price"))
 
+# --- Listing retrieval ---
+# Listings published by the seller agent are searched first; the model only
+# suggests properties when fewer than BUYER_MIN_LISTINGS match.
+listing_store = ListingStore("listings")
+RESULT_COUNT = int(os.getenv("BUYER_RESULT_COUNT", "3"))
+MIN_LISTINGS = int(os.getenv("BUYER_MIN_LISTINGS", "2"))
 
-# --- Execution function ---
-async def execute(request: dict):
-    """
-    Runs the buyer agent with the given request dict.
-    Expected keys: location, budget, property_type, requirements
-    """
-    logger.debug(f"Incoming request to buyer agent: {request}")
-
-    # Ensure session exists
-    await session_service.create_session(
-        app_name="buyer_app",
-        user_id=USER_ID,
-        session_id=SESSION_ID
-    )
 
-    # Build prompt
-    prompt = (
+# --- Prompt + parsing ---
+def build_prompt(request: dict) -> str:
+    return (
         f"Suggest real estate properties for a buyer.\n"
         f"Location: {request.get('location', 'Not specified')}\n"
         f"Budget: {request.get('budget', 'Not specified')}\n"
@@ -68,43 +72,130 @@ async def execute(request: dict):
         "Return ONLY valid JSON with a 'buyer' array."
     )
 
-    message = types.Content(role="user", parts=[types.Part(text=prompt)])
-
-    found_final = False
-    async for event in runner.run_async(
-        user_id=USER_ID,
-        session_id=SESSION_ID,
-        new_message=message
-    ):
-        if event.is_final_response():
-            found_final = True
-            response_text = event.content.parts[0].text.strip()
-            logger.debug(f"Raw model output: {response_text}")
-
-            # Strip code fences if present
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-
-            try:
-                parsed = json.loads(response_text)
-                return {"buyer": parsed.get("buyer", []), "status": "success"}
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parse error: {e}")
-                return {
-                    "buyer": [],
-                    "status": "error",
-                    "message": "Failed to parse buyer data"
-                }
-
-    if not found_final:
+
+@traced("parse")
+def parse_response(response_text, extractor=None):
+    """Turn the model's final text (None if there was none) into the buyer response."""
+    if response_text is None:
         logger.error("No final response from agent")
         return {
             "buyer": [],
             "status": "error",
             "message": "No final response from agent"
         }
+
+    logger.debug("Raw model output: %s", LogPayload(response_text))
+    try:
+        return {"buyer": SCHEMA.parse(response_text, extractor), "status": "success"}
+    except SchemaError as e:
+        logger.error(f"Buyer output rejected: {e}")
+        return {
+            "buyer": [],
+            "status": "error",
+            "message": "Failed to parse buyer data"
+        }
+
+
+def to_option(listing):
+    """A stored listing in the buyer response format."""
+    return {
+        "name": listing["title"],
+        "description": listing["description"] or f"{listing['property_type']} in {listing['location']}",
+        "price": listing["price"],
+        "location": listing["location"],
+        "size": listing["size_sqft"],
+        "features": listing["features"],
+        "listing_id": listing["id"],
+        "source": "listing",
+        "match": listing["match"],  # locality, nearby or city
+    }
+
+
+async def find_listings(request: dict):
+    with span("retrieve"):
+        found = await asyncio.to_thread(
+            listing_store.search,
+            location=request.get("location"),
+            budget=request.get("budget"),
+            property_type=request.get("property_type"),
+            requirements=request.get("requirements") or "",
+            min_size=request.get("min_size_sqft"),
+            max_size=request.get("max_size_sqft"),
+            limit=RESULT_COUNT,
+        )
+    return [to_option(listing) for listing in found]
+
+
+def merge_options(found, suggested):
+    """Stored listings first, then the model's suggestions up to RESULT_COUNT."""
+    if suggested.get("status") != "success":
+        return {"buyer": found, "status": "success"} if found else suggested
+    if found:
+        listing_store.stats["gaps_filled"] += 1
+    extra = [{**option, "source": "suggested"} for option in suggested["buyer"]]
+    return {"buyer": found + extra[:max(0, RESULT_COUNT - len(found))], "status": "success"}
+
+
+# --- Execution function ---
+async def execute(request: dict):
+    """
+    Runs the buyer agent with the given request dict.
+    Expected keys: location, budget, property_type, requirements
+    (optionally min_size_sqft, max_size_sqft)
+    """
+    logger.debug("Incoming request to buyer agent: %s", LogPayload(request))
+
+    found = await find_listings(request)
+    if len(found) >= MIN_LISTINGS:
+        listing_store.stats["answered"] += 1
+        return {"buyer": found, "status": "success"}
+    return merge_options(found, await suggest(request))
+
+
+@cache.cached
+async def suggest(request: dict):
+    """Ask the model for properties matching the request."""
+    message = types.Content(role="user", parts=[types.Part(text=build_prompt(request))])
+
+    response_text = None
+    async with sessions.lease(request) as (user_id, session_id):
+        with span("model"):
+            async for event in runner.run_async(
+                user_id=user_id,
+                session_id=session_id,
+                new_message=message
+            ):
+                if event.is_final_response() and event.content:
+                    response_text = event.content.parts[0].text
+                    break
+
+    return parse_response(response_text)
+
+
+async def execute_stream(request: dict):
+    """
+    Streaming variant of execute: yields ("token", {...}) for each partial
+    chunk of model output, then ("result", response) with the parsed result.
+    """
+    logger.debug("Incoming streaming request to buyer agent: %s", LogPayload(request))
+
+    found = await find_listings(request)
+    if len(found) >= MIN_LISTINGS:
+        listing_store.stats["answered"] += 1
+        yield "result", {"buyer": found, "status": "success"}
+        return
+
+    cached = cache.get(request)
+    if cached is not None:
+        yield "result", merge_options(found, cached)
+        return
+
+    message = types.Content(role="user", parts=[types.Part(text=build_prompt(request))])
+    extractor = SCHEMA.extractor()
+    async for kind, text in stream_model(runner, sessions, request, message, extractor):
+        if kind == "token":
+            yield "token", {"text": text}
+        else:
+            result = parse_response(text, extractor)
+            cache.put(request, result)
+            yield "result", merge_options(found, result)
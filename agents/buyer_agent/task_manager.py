@@ -1,3 +1,9 @@
-from .agent import execute
+from .agent import execute, execute_stream, listing_store
 async def run(payload):
-    return await execute(payload)
\ No newline at end of file
+    return await execute(payload)
+
+def run_stream(payload):
+    return execute_stream(payload)
+
+async def startup():
+    await listing_store.load()
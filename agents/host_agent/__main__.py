@@ -1,11 +1,6 @@
-from fastapi import FastAPI, Request
-from agents.buyer_agent.agent import execute  # adjust import to your file structure
-import asyncio
+from common.a2a_server import create_app, serve
+from .task_manager import run, run_stream
 
-app = FastAPI()
-
-@app.post("/run")
-async def run_agent(request: Request):
-    data = await request.json()
-    result = await execute(data)
-    return result
+app = create_app(agent=type("Agent", (), {"execute": run, "stream": run_stream}), name="host_agent")
+if __name__ == "__main__":
+    serve("agents.host_agent.__main__:app", port=8000)
@@ -1,28 +1,34 @@
 # agent.py
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 from google.genai import types
+from common.model_backend import get_model
+from common.prompt_budget import after_model, before_model
+from common.rate_limit import limit_model_call, settle_model_call
+from common.session_store import make_session_service
+from common.sessions import SessionPool
+from common.tracing import span
 
 # ---------------------------
 # Define Host Agent
 # ---------------------------
 host_agent = Agent(
     name="host_agent",
-    model="gemini-2.0-flash",
+    model=get_model("host"),
     description="Coordinates real estate planning by calling buyer, seller, price estimator, and neighborhood agents.",
     instruction=(
         "You are the Host Agent responsible for orchestrating real estate tasks. "
         "You call the buyer agent, seller agent, price estimator agent, and neighborhood agent. "
         "Your job is to collect their results and return a structured summary to the user."
-    )
+    ),
+    before_model_callback=[before_model, limit_model_call],
+    after_model_callback=[after_model, settle_model_call],
 )
 
 # ---------------------------
 # Setup session + runner
 # ---------------------------
-session_service = InMemorySessionService()
+session_service = make_session_service()
 runner = Runner(
     agent=host_agent,
     app_name="host_app",
@@ -30,19 +36,12 @@ runner = Runner(
 )
 
 USER_ID = "user_host"
-SESSION_ID = "session_host"
+sessions = SessionPool(session_service, app_name="host_app", default_user_id=USER_ID)
 
 # ---------------------------
 # Execution function
 # ---------------------------
 async def execute(request):
-    # Ensure session exists
-    await session_service.create_session(
-        app_name="host_app",
-        user_id=USER_ID,
-        session_id=SESSION_ID
-    )
-
     # Build prompt dynamically from request
     prompt = (
         f"Find real estate insights for the user.\n"
@@ -55,6 +54,8 @@ async def execute(request):
 
     # Send message to model
     message = types.Content(role="user", parts=[types.Part(text=prompt)])
-    async for event in runner.run_async(user_id=USER_ID, session_id=SESSION_ID, new_message=message):
-        if event.is_final_response():
-            return {"summary": event.content.parts[0].text}
+    async with sessions.lease(request) as (user_id, session_id):
+        with span("model"):
+            async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=message):
+                if event.is_final_response() and event.content:
+                    return {"summary": event.content.parts[0].text}
@@ -1,11 +1,17 @@
+from collections import OrderedDict
 from common.a2a_client import call_agent
+from common.circuit_breaker import OPEN, breaker_for, circuit_state
+from common.logging_setup import configure_logging, LogPayload
+from common.singleflight import SingleFlight
+from common.tracing import current_trace, record, span
+import asyncio
 import json
 import logging
+import os
+import re
+import time
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 def sanitize_url(url):
@@ -88,38 +94,246 @@ def format_neighborhood_markdown(neighborhoods):
         markdown += "\n"
     return markdown
 
+# ---------------------------
+# Fan-out settings
+# ---------------------------
+# Each downstream call gets its own deadline, and the whole fan-out is capped
+# by a global deadline so host latency tracks the slowest agent, not the sum.
+AGENT_DEADLINE_SECONDS = float(os.getenv("HOST_AGENT_DEADLINE_SECONDS", "20"))
+GLOBAL_DEADLINE_SECONDS = float(os.getenv("HOST_GLOBAL_DEADLINE_SECONDS", "30"))
+FANOUT_MODE = os.getenv("HOST_FANOUT_MODE", "concurrent")  # "concurrent" or "sequential"
+LAST_GOOD_MAX_ENTRIES = 256
+# Concurrent identical requests to one downstream agent share a single call
+COALESCE_CALLS = os.getenv("HOST_COALESCE_CALLS", "on") == "on"
+
+AGENT_URLS = {
+    "buyer": BUYER_URL,
+    "seller": SELLER_URL,
+    "price": PRICE_URL,
+    "neighborhood": NEIGHBORHOOD_URL,
+}
+
+FORMATTERS = {
+    "buyer": format_buyer_markdown,
+    "seller": format_seller_markdown,
+    "price": format_price_markdown,
+    "neighborhood": format_neighborhood_markdown,
+}
+
+# Read-only agents whose calls may be hedged (see A2A_HEDGE_AFTER_SECONDS)
+IDEMPOTENT_AGENTS = {"buyer", "price", "neighborhood"}
+
+ERROR_MESSAGES = {
+    "buyer": "Error fetching buyer data.",
+    "seller": "Error fetching seller data.",
+    "price": "Error fetching price data.",
+    "neighborhood": "Error fetching neighborhood data.",
+}
+
+DEGRADED_MESSAGES = {
+    "buyer": "Buyer agent is temporarily unavailable.",
+    "seller": "Seller agent is temporarily unavailable.",
+    "price": "Price agent is temporarily unavailable.",
+    "neighborhood": "Neighborhood agent is temporarily unavailable.",
+}
+
+# Last successful response per (agent, payload), served as a stale section
+# when the agent is slow or down.
+_last_good = OrderedDict()
+
+
+def _payload_key(name, payload):
+    return name, json.dumps(payload, sort_keys=True, default=str)
+
+
+def _remember(name, payload, data):
+    key = _payload_key(name, payload)
+    _last_good[key] = data
+    _last_good.move_to_end(key)
+    while len(_last_good) > LAST_GOOD_MAX_ENTRIES:
+        _last_good.popitem(last=False)
+
+
+# ---------------------------
+# Downstream call coalescing
+# ---------------------------
+# One SingleFlight per downstream agent. A call is cancelled only when every
+# host request waiting on it has given up (deadline or client disconnect).
+_flights = {name: SingleFlight(f"host_{name}", cancel_abandoned=True) for name in AGENT_URLS}
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value.casefold()).strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def _flight_key(payload):
+    # The shared call forwards its leader's X-Priority downstream, so only
+    # requests of the same priority class may share one.
+    trace = current_trace()
+    priority = trace.priority if trace is not None else None
+    return json.dumps([priority, _normalize(payload)], sort_keys=True, default=str)
+
+
+def _coalesced_call(name, url, payload, deadline):
+    make_call = lambda: call_agent(url, payload, timeout=deadline, idempotent=name in IDEMPOTENT_AGENTS)
+    # Session-scoped requests depend on the conversation so far; never share them.
+    if not COALESCE_CALLS or (isinstance(payload, dict) and payload.get("session_id")):
+        return make_call()
+    return _flights[name].do(_flight_key(payload), make_call)
+
+
+def _fallback(name, payload, status, elapsed_ms):
+    """Serve the last good response as stale, or nothing with the given status."""
+    stale = _last_good.get(_payload_key(name, payload))
+    if stale is not None:
+        return stale, "stale", elapsed_ms
+    return None, status, elapsed_ms
+
+
+async def _call_section(name, payload, deadline):
+    """Call one downstream agent and return (data, status, elapsed_ms).
+
+    status is "ok" for a fresh response, "stale" when a previous response
+    for the same payload was served instead, "degraded" when the agent's
+    circuit is open, and "missing" otherwise.
+    """
+    url = AGENT_URLS[name]
+    if circuit_state(url) == OPEN:
+        logger.warning(f"{name} agent circuit is open; serving degraded section")
+        return _fallback(name, payload, "degraded", 0.0)
+
+    start = time.perf_counter()
+    data = None
+    try:
+        result = await asyncio.wait_for(_coalesced_call(name, url, payload, deadline), deadline)
+        data = json.loads(result) if isinstance(result, str) else result
+    except asyncio.TimeoutError:
+        # The deadline cancels the attempt before the client's own timeout
+        # fires, so count the miss against the agent's circuit here.
+        breaker_for(url).record_failure()
+        logger.warning(f"{name} agent missed its {deadline}s deadline")
+    except Exception as e:
+        logger.error(f"Error calling {name} agent: {e}")
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    record(f"call_{name}", elapsed_ms / 1000)
+
+    if data:
+        logger.debug("%s response: %s", name, LogPayload(data))
+        _remember(name, payload, data)
+        return data, "ok", elapsed_ms
+    status = "degraded" if circuit_state(url) == OPEN else "missing"
+    return _fallback(name, payload, status, elapsed_ms)
+
+
+def _render_section(name, outcome):
+    """Return (markdown, section info) for one agent's outcome."""
+    data, status, elapsed_ms = outcome
+    if data is None and status == "degraded":
+        markdown = DEGRADED_MESSAGES[name]
+    elif data is None:
+        markdown = ERROR_MESSAGES[name]
+    else:
+        markdown = FORMATTERS[name](data.get(name, []))
+    return markdown, {"status": status, "elapsed_ms": elapsed_ms}
+
+
+def _build_response(outcomes):
+    response = {}
+    sections = {}
+    for name in AGENT_URLS:
+        response[name], sections[name] = _render_section(
+            name, outcomes.get(name, (None, "missing", None))
+        )
+    response["sections"] = sections
+    return response
+
+
+async def _run_sequential(payload, agent_deadline):
+    outcomes = {}
+    for name in AGENT_URLS:
+        outcomes[name] = await _call_section(name, payload, agent_deadline)
+    return outcomes
+
+
+async def _run_concurrent(payload, agent_deadline, global_deadline):
+    tasks = {
+        name: asyncio.create_task(_call_section(name, payload, agent_deadline))
+        for name in AGENT_URLS
+    }
+    done, pending = await asyncio.wait(tasks.values(), timeout=global_deadline)
+    for task in pending:
+        task.cancel()
+
+    outcomes = {}
+    for name, task in tasks.items():
+        if task in done:
+            outcomes[name] = task.result()
+        else:
+            logger.warning(f"{name} agent cut off by the {global_deadline}s global deadline")
+            outcomes[name] = _fallback(name, payload, "missing", round(global_deadline * 1000, 1))
+    return outcomes
+
+
+async def run_stream(
+    payload,
+    agent_deadline=AGENT_DEADLINE_SECONDS,
+    global_deadline=GLOBAL_DEADLINE_SECONDS,
+):
+    """Concurrent fan-out that yields ("section", {...}) as each agent finishes,
+    then ("done", {"sections": ...}) once all four are in or the global deadline hits."""
+    tasks = {
+        asyncio.create_task(_call_section(name, payload, agent_deadline)): name
+        for name in AGENT_URLS
+    }
+    outcomes = {}
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + global_deadline
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for task in done:
+                name = tasks[task]
+                outcomes[name] = task.result()
+                markdown, info = _render_section(name, outcomes[name])
+                yield "section", {"name": name, "markdown": markdown, **info}
+    finally:
+        for task in pending:
+            task.cancel()
+
+    for task in pending:
+        name = tasks[task]
+        logger.warning(f"{name} agent cut off by the {global_deadline}s global deadline")
+        outcomes[name] = _fallback(name, payload, "missing", round(global_deadline * 1000, 1))
+        markdown, info = _render_section(name, outcomes[name])
+        yield "section", {"name": name, "markdown": markdown, **info}
+    yield "done", {"sections": _build_response(outcomes)["sections"]}
+
+
 # Main runner
-async def run(payload):
+async def run(
+    payload,
+    mode=None,
+    agent_deadline=AGENT_DEADLINE_SECONDS,
+    global_deadline=GLOBAL_DEADLINE_SECONDS,
+):
     try:
-        # Call all agents
-        buyer = await call_agent(BUYER_URL, payload)
-        seller = await call_agent(SELLER_URL, payload)
-        price = await call_agent(PRICE_URL, payload)
-        neighborhood = await call_agent(NEIGHBORHOOD_URL, payload)
-
-        # Parse JSON if needed
-        buyer_data = json.loads(buyer) if isinstance(buyer, str) else buyer
-        seller_data = json.loads(seller) if isinstance(seller, str) else seller
-        price_data = json.loads(price) if isinstance(price, str) else price
-        neighborhood_data = json.loads(neighborhood) if isinstance(neighborhood, str) else neighborhood
-
-        # Log raw responses
-        logger.debug(f"Buyer response: {buyer_data}")
-        logger.debug(f"Seller response: {seller_data}")
-        logger.debug(f"Price Estimator response: {price_data}")
-        logger.debug(f"Neighborhood response: {neighborhood_data}")
-
-        return {
-            "buyer": format_buyer_markdown(buyer_data.get("buyer", [])),
-            "seller": format_seller_markdown(seller_data.get("seller", [])),
-            "price": format_price_markdown(price_data.get("price", [])),
-            "neighborhood": format_neighborhood_markdown(neighborhood_data.get("neighborhood", [])),
-        }
+        if (mode or FANOUT_MODE) == "sequential":
+            outcomes = await _run_sequential(payload, agent_deadline)
+        else:
+            outcomes = await _run_concurrent(payload, agent_deadline, global_deadline)
+        with span("render"):
+            return _build_response(outcomes)
     except Exception as e:
         logger.error(f"Error in host agent run: {e}")
-        return {
-            "buyer": "Error fetching buyer data.",
-            "seller": "Error fetching seller data.",
-            "price": "Error fetching price data.",
-            "neighborhood": "Error fetching neighborhood data.",
-        }
+        return dict(ERROR_MESSAGES)
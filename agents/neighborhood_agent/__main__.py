@@ -1,7 +1,9 @@
-from common.a2a_server import create_app 
-from .task_manager import run 
+from common.a2a_server import create_app, serve
+from .task_manager import run, run_stream, shutdown, startup
 
-app = create_app(agent=type("Agent", (), {"execute": run}))
+app = create_app(
+    agent=type("Agent", (), {"execute": run, "stream": run_stream, "startup": startup, "shutdown": shutdown}),
+    name="neighborhood_agent",
+)
 if __name__ == "__main__":
-    import uvicorn 
-    uvicorn.run(app,port=8004)
\ No newline at end of file
+    serve("agents.neighborhood_agent.__main__:app", port=8004)
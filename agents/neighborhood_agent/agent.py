@@ -1,22 +1,28 @@
-from fastapi import FastAPI, Request
-import uvicorn
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 from google.genai import types
-import json
+from common import geo, insight_store
+from common.insight_store import InsightStore, run_warmer
+from common.logging_setup import configure_logging, LogPayload
+from common.model_backend import get_model
+from common.prompt_budget import after_model, before_model
+from common.rate_limit import limit_model_call, settle_model_call
+from common.response_cache import ResponseCache
+from common.session_store import make_session_service
+from common.sessions import SessionPool
+from common.streaming import stream_model
+from common.structured_output import OutputSchema, SchemaError
+from common.tracing import span, traced
+from common.valuation import canonical_location, known_localities
+import asyncio
 import logging
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 neighborhood_agent = Agent(
     name="neighborhood_agent",
-    model="gemini-2.0-flash",
+    model=get_model("neighborhood"),
     description="Provides detailed neighborhood insights such as safety, schools, amenities, transportation, and lifestyle based on the buyer's preferred location.",
     instruction=(
         "Given a neighborhood location, provide insights about:\n"
@@ -28,10 +34,12 @@ neighborhood_agent = Agent(
         "- Lifestyle & community description\n"
         "Return the result strictly in JSON format with a 'neighborhood' array. "
         "Do not include extra text or markdown formatting."
-    )
+    ),
+    before_model_callback=[before_model, limit_model_call],
+    after_model_callback=[after_model, settle_model_call],
 )
 
-session_service = InMemorySessionService()
+session_service = make_session_service()
 runner = Runner(
     agent=neighborhood_agent,
     app_name="neighborhood_app",
@@ -39,55 +47,122 @@ runner = Runner(
 )
 
 USER_ID = "user_neighborhood"
-SESSION_ID = "session_neighborhood"
+sessions = SessionPool(session_service, app_name="neighborhood_app", default_user_id=USER_ID)
+cache = ResponseCache("neighborhood", fields=("location", "requirements"))
+SCHEMA = OutputSchema("neighborhood")
+insights = InsightStore("neighborhood")
+_warmer = None
 
-async def execute(request):
-    logger.debug(f"Incoming request to neighborhood agent: {request}")
-    await session_service.create_session(
-        app_name="neighborhood_app",
-        user_id=USER_ID,
-        session_id=SESSION_ID
-    )
-    prompt = (
+def build_prompt(request):
+    return (
         f"Provide neighborhood insights.\n"
         f"Location: {request.get('location', 'Not specified')}\n"
         f"Requirements: {request.get('requirements', 'None')}\n"
         "Return as JSON with a 'neighborhood' array."
     )
-    message = types.Content(role="user", parts=[types.Part(text=prompt)])
-    async for event in runner.run_async(
-        user_id=USER_ID,
-        session_id=SESSION_ID,
-        new_message=message
-    ):
-        if event.is_final_response():
-            response_text = event.content.parts[0].text.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-            try:
-                parsed = json.loads(response_text)
-                return {
-                    "neighborhood": parsed.get("neighborhood", []),
-                    "status": "success"
-                }
-            except json.JSONDecodeError:
-                return {
-                    "neighborhood": [],
-                    "status": "error",
-                    "message": "Failed to parse neighborhood data"
-                }
 
-app = FastAPI()
+@traced("parse")
+def parse_response(response_text, extractor=None):
+    if response_text is None:
+        return {
+            "neighborhood": [],
+            "status": "error",
+            "message": "No final response from agent"
+        }
+    try:
+        return {
+            "neighborhood": SCHEMA.parse(response_text, extractor),
+            "status": "success"
+        }
+    except SchemaError as e:
+        logger.warning(f"Neighborhood output rejected: {e}")
+        return {
+            "neighborhood": [],
+            "status": "error",
+            "message": "Failed to parse neighborhood data"
+        }
+
+def insight_key(request):
+    """Store key for requests the precomputed insights can answer, else None."""
+    if request.get("session_id") or request.get("requirements") or not request.get("location"):
+        return None
+    return canonical_location(request["location"]) or None
+
+async def generate(request):
+    message = types.Content(role="user", parts=[types.Part(text=build_prompt(request))])
+    response_text = None
+    async with sessions.lease(request) as (user_id, session_id):
+        with span("model"):
+            async for event in runner.run_async(
+                user_id=user_id,
+                session_id=session_id,
+                new_message=message
+            ):
+                if event.is_final_response() and event.content:
+                    response_text = event.content.parts[0].text
+                    break
+    return parse_response(response_text)
 
-@app.post("/run")
-async def run_agent(request: Request):
-    data = await request.json()
-    return await execute(data)
+async def store_result(key, request, result):
+    if key and result.get("status") == "success":
+        await insights.put(key, request["location"], result)
+
+def with_nearby(request, result):
+    """Add the localities around the requested one, from the gazetteer."""
+    if result.get("status") != "success" or not request.get("location"):
+        return result
+    with span("nearby"):
+        return {**result, "nearby": geo.nearby(request["location"])}
+
+@cache.cached
+async def execute(request):
+    logger.debug("Incoming request to neighborhood agent: %s", LogPayload(request))
+    key = insight_key(request)
+    if key:
+        stored = insights.get(key, request["location"])
+        if stored is not None:
+            return with_nearby(request, stored)
+    result = await generate(request)
+    await store_result(key, request, result)
+    return with_nearby(request, result)
+
+async def execute_stream(request):
+    logger.debug("Incoming streaming request to neighborhood agent: %s", LogPayload(request))
+    key = insight_key(request)
+    stored = insights.get(key, request["location"]) if key else None
+    if stored is not None:
+        yield "result", with_nearby(request, stored)
+        return
+    cached = cache.get(request)
+    if cached is not None:
+        yield "result", cached
+        return
+    message = types.Content(role="user", parts=[types.Part(text=build_prompt(request))])
+    extractor = SCHEMA.extractor()
+    async for kind, text in stream_model(runner, sessions, request, message, extractor):
+        if kind == "token":
+            yield "token", {"text": text}
+        else:
+            result = parse_response(text, extractor)
+            await store_result(key, request, result)
+            result = with_nearby(request, result)
+            cache.put(request, result)
+            yield "result", result
+
+# ---------------------------
+# Insight warmer
+# ---------------------------
+async def start_warmer():
+    global _warmer
+    if insight_store.WARMER != "on" or _warmer is not None:
+        return
+    _warmer = asyncio.create_task(
+        run_warmer(insights, lambda location: generate({"location": location}), seeds=known_localities())
+    )
 
-if __name__ == "__main__":
-    uvicorn.run("agents.neighborhood_agent.agent:app", host="127.0.0.1", port=8004, reload=True)
+async def stop_warmer():
+    global _warmer
+    if _warmer is not None:
+        _warmer.cancel()
+        _warmer = None
+    await insights.flush()
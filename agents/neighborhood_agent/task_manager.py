@@ -1,9 +1,18 @@
 import asyncio
-from agents.neighborhood_agent.agent import execute  # absolute import is safer
+from agents.neighborhood_agent.agent import execute, execute_stream, start_warmer, stop_warmer  # absolute import is safer
 
 async def run(payload: dict):
     return await execute(payload)
 
+def run_stream(payload: dict):
+    return execute_stream(payload)
+
+async def startup():
+    await start_warmer()
+
+async def shutdown():
+    await stop_warmer()
+
 # Optional: allow running standalone for testing
 if __name__ == "__main__":
     test_payload = {"location": "Bengaluru", "requirements": "Good schools"}
@@ -1,22 +1,30 @@
 from google.adk.agents import Agent 
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import Runner 
-from google.adk.sessions import InMemorySessionService 
 from google.genai import types 
-import json 
+from common.logging_setup import configure_logging, LogPayload
+from common.model_backend import get_model
+from common.prompt_budget import after_model, before_model
+from common.rate_limit import limit_model_call, settle_model_call
+from common.response_cache import ResponseCache
+from common.session_store import make_session_service
+from common.sessions import SessionPool
+from common.streaming import stream_model
+from common.structured_output import OutputSchema, SchemaError
+from common.tracing import span, traced
+from common.valuation import value_properties
+from collections import Counter
+import asyncio
 import logging 
+import os
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
 # Price Agent definition
 price_agent = Agent(
     name="price_agent",
-    model="gemini-2.0-flash",
+    model=get_model("price"),
     description="Estimates and compares property prices based on location, size, and property type.",
     instruction=(
         "Given property details (location, property type, and size in sq. ft), "
@@ -29,11 +37,13 @@ price_agent = Agent(
         "- Justification (why this price range, e.g., demand, locality, market trends)\n"
         "Return the result strictly in JSON format with a 'price' array. "
         "Do not include extra text or markdown formatting."
-    )
+    ),
+    before_model_callback=[before_model, limit_model_call],
+    after_model_callback=[after_model, settle_model_call],
 )
 
 
-session_service = InMemorySessionService()
+session_service = make_session_service()
 runner = Runner(
     agent=price_agent,
     app_name="price_app",
@@ -41,20 +51,20 @@ runner = Runner(
 )
 
 USER_ID = "user_price"
-SESSION_ID = "session_price"
+sessions = SessionPool(session_service, app_name="price_app", default_user_id=USER_ID)
+cache = ResponseCache(
+    "price", fields=("location", "property_type", "size", "size_sqft", "bedrooms", "bathrooms", "fast")
+)
+SCHEMA = OutputSchema("price")
 
-# Execute function
-async def execute(request):
-    logger.debug(f"Incoming request to price agent: {request}")
-    
-    # Create a session
-    await session_service.create_session(
-        app_name="price_app",
-        user_id=USER_ID,
-        session_id=SESSION_ID
-    )
-    
-    prompt = (
+# Batch settings
+BATCH_CHUNK_SIZE = int(os.getenv("PRICE_BATCH_CHUNK_SIZE", "10"))
+BATCH_CONCURRENCY = int(os.getenv("PRICE_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("PRICE_BATCH_MAX_ITEMS", "10000"))
+
+# Prompt + parsing
+def build_prompt(request):
+    return (
         f"Estimate the property price.\n"
         f"Location: {request.get('location', 'Not specified')}\n"
         f"Property Type: {request.get('property_type', 'Not specified')}\n"
@@ -62,36 +72,198 @@ async def execute(request):
         "Return as JSON with a 'price' array."
     )
 
+
+@traced("parse")
+def parse_response(response_text, extractor=None):
+    """Turn the model's final text (None if there was none) into the price response."""
+    if response_text is None:
+        return {
+            "price": [],
+            "status": "error",
+            "message": "No final response from agent"
+        }
+
+    try:
+        return {
+            "price": SCHEMA.parse(response_text, extractor),
+            "status": "success"
+        }
+    except SchemaError as e:
+        logger.warning(f"Price output rejected: {e}")
+        return {
+            "price": [],
+            "status": "error",
+            "message": "Failed to parse price data"
+        }
+
+
+async def run_model(request, prompt):
+    """Send one prompt through the runner and return the final text (None if there was none)."""
     message = types.Content(role="user", parts=[types.Part(text=prompt)])
 
-    async for event in runner.run_async(
-        user_id=USER_ID,
-        session_id=SESSION_ID,
-        new_message=message
-    ):
-        if event.is_final_response():
-            response_text = event.content.parts[0].text
-            response_text = response_text.strip()
-            
-            # Clean response formatting
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-            
-            # Try parsing JSON
-            try:
-                parsed = json.loads(response_text)
-                return {
-                    "price": parsed.get("price", []),
-                    "status": "success"
-                }
-            except json.JSONDecodeError:
-                return {
-                    "price": [],
-                    "status": "error",
-                    "message": "Failed to parse price data"
-                }
+    response_text = None
+    async with sessions.lease(request) as (user_id, session_id):
+        with span("model"):
+            async for event in runner.run_async(
+                user_id=user_id,
+                session_id=session_id,
+                new_message=message
+            ):
+                if event.is_final_response() and event.content:
+                    response_text = event.content.parts[0].text
+                    break
+    return response_text
+
+
+# Rate-table fast path (no model call)
+FAST_RANGE_SPREAD = 0.1
+
+
+def fast_estimates(properties):
+    """Value a list of property dicts from the rate table in one vectorized pass."""
+    sizes = [p.get("size", p.get("size_sqft")) for p in properties]
+    types_ = [str(p.get("property_type") or "Apartment") for p in properties]
+    locations = [str(p.get("location") or "") for p in properties]
+    values = value_properties(locations, sizes, types_)
+    low = (values * (1 - FAST_RANGE_SPREAD)).astype(int)
+    high = (values * (1 + FAST_RANGE_SPREAD)).astype(int)
+    return [
+        {
+            "Property type": property_type,
+            "Location": location,
+            "Size (sq. ft)": size,
+            "Estimated price in INR": int(value),
+            "Estimated price range (min–max INR)": f"{lo:,} – {hi:,}",
+            "Justification": "Rate-table estimate from city/locality price per sq. ft (no model call)",
+        }
+        for property_type, location, size, value, lo, hi in zip(types_, locations, sizes, values, low, high)
+    ]
+
+
+# Execute function
+@cache.cached
+async def execute(request):
+    logger.debug("Incoming request to price agent: %s", LogPayload(request))
+    if request.get("fast"):
+        return {"price": fast_estimates([request]), "status": "success"}
+    return parse_response(await run_model(request, build_prompt(request)))
+
+
+# Streaming execute function
+async def execute_stream(request):
+    logger.debug("Incoming streaming request to price agent: %s", LogPayload(request))
+    if request.get("fast"):
+        yield "result", {"price": fast_estimates([request]), "status": "success"}
+        return
+
+    cached = cache.get(request)
+    if cached is not None:
+        yield "result", cached
+        return
+
+    message = types.Content(role="user", parts=[types.Part(text=build_prompt(request))])
+    extractor = SCHEMA.extractor()
+    async for kind, text in stream_model(runner, sessions, request, message, extractor):
+        if kind == "token":
+            yield "token", {"text": text}
+        else:
+            result = parse_response(text, extractor)
+            cache.put(request, result)
+            yield "result", result
+
+
+# Batch execute function
+def build_batch_prompt(items):
+    lines = [
+        f"- id: {item_id} | Location: {item.get('location', 'Not specified')} | "
+        f"Property Type: {item.get('property_type', 'Not specified')} | "
+        f"Size: {item.get('size', item.get('size_sqft', 'Not specified'))} sq. ft"
+        for item_id, item in items
+    ]
+    return (
+        f"Estimate the price of each of these {len(items)} properties.\n"
+        + "\n".join(lines)
+        + "\nReturn as JSON with a 'price' array holding exactly one entry per property, "
+        "in the same order, and copy each property's id into an 'id' field."
+    )
+
+
+async def _value_chunk(items, semaphore):
+    """Value one chunk of (id, item) pairs with a single model call; returns {id: result}."""
+    async with semaphore:
+        try:
+            parsed = parse_response(await run_model({}, build_batch_prompt(items)))
+        except Exception as e:
+            logger.error(f"Batch chunk failed: {e}")
+            parsed = {"status": "error", "message": f"Model call failed: {e}"}
+
+    if parsed["status"] != "success":
+        return {item_id: {"id": item_id, "status": "error", "message": parsed["message"]} for item_id, _ in items}
+
+    estimates = [e for e in parsed["price"] if isinstance(e, dict)]
+    by_id = {str(e.get("id")): e for e in estimates if e.get("id") is not None}
+    if not by_id and len(estimates) == len(items):
+        # Model dropped the ids but kept the order
+        by_id = {item_id: e for (item_id, _), e in zip(items, estimates)}
+
+    results = {}
+    for item_id, _ in items:
+        estimate = by_id.get(item_id)
+        if estimate is None:
+            results[item_id] = {"id": item_id, "status": "error", "message": "No estimate returned for this property"}
+        else:
+            results[item_id] = {"id": item_id, "status": "success", "price": estimate}
+    return results
+
+
+async def execute_batch(request):
+    """
+    Values many properties per call.
+    Expected keys: properties (list of {id, location, property_type, size}),
+    optional chunk_size and concurrency. With "fast": true the whole batch is
+    valued from the rate table without calling the model.
+    """
+    properties = request.get("properties") or []
+    if not isinstance(properties, list) or not properties:
+        return {"results": [], "status": "error", "message": "'properties' must be a non-empty list"}
+    if len(properties) > BATCH_MAX_ITEMS:
+        return {"results": [], "status": "error", "message": f"At most {BATCH_MAX_ITEMS} properties per batch"}
+
+    try:
+        chunk_size = max(1, int(request.get("chunk_size") or BATCH_CHUNK_SIZE))
+        concurrency = max(1, int(request.get("concurrency") or BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        return {"results": [], "status": "error", "message": "'chunk_size' and 'concurrency' must be integers"}
+    logger.debug("Batch request to price agent: %d properties, chunk_size=%d", len(properties), chunk_size)
+
+    ids = [str(item.get("id", index)) if isinstance(item, dict) else str(index) for index, item in enumerate(properties)]
+    duplicates = sorted(item_id for item_id, count in Counter(ids).items() if count > 1)
+    if duplicates:
+        return {"results": [], "status": "error", "message": f"Duplicate property ids: {', '.join(duplicates)}"}
+
+    # Results are matched back by id; malformed entries get their own error result.
+    merged = {
+        item_id: {"id": item_id, "status": "error", "message": "Each property must be an object"}
+        for item_id, item in zip(ids, properties) if not isinstance(item, dict)
+    }
+    items = [(item_id, item) for item_id, item in zip(ids, properties) if isinstance(item, dict)]
+
+    chunks = []
+    if request.get("fast"):
+        estimates = fast_estimates([item for _, item in items])
+        for (item_id, _), estimate in zip(items, estimates):
+            merged[item_id] = {"id": item_id, "status": "success", "price": {**estimate, "id": item_id}}
+    else:
+        semaphore = asyncio.Semaphore(concurrency)
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        for chunk_results in await asyncio.gather(*(_value_chunk(chunk, semaphore) for chunk in chunks)):
+            merged.update(chunk_results)
+
+    results = [merged[item_id] for item_id in ids]
+    failed = sum(1 for r in results if r["status"] != "success")
+    status = "success" if not failed else "partial" if failed < len(results) else "error"
+    return {
+        "results": results,
+        "status": status,
+        "stats": {"items": len(results), "failed": failed, "chunks": len(chunks)},
+    }
@@ -1,3 +1,9 @@
-from .agent import execute
+from .agent import execute, execute_batch, execute_stream
 async def run(payload):
-    return await execute(payload)
\ No newline at end of file
+    return await execute(payload)
+
+def run_stream(payload):
+    return execute_stream(payload)
+
+async def run_batch(payload):
+    return await execute_batch(payload)
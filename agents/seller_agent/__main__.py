@@ -1,13 +1,6 @@
-from fastapi import FastAPI, Request
-import uvicorn
-from .seller_agent import execute
-
-app = FastAPI()
-
-@app.post("/run")
-async def run_seller_agent(request: Request):
-    payload = await request.json()
-    return await execute(payload)
+from common.a2a_server import create_app, serve
+from .task_manager import run, run_stream
 
+app = create_app(agent=type("Agent", (), {"execute": run, "stream": run_stream}), name="seller_agent")
 if __name__ == "__main__":
-    uvicorn.run("agents.price_agent.__main__:app", host="127.0.0.1", port=8002, reload=True)
+    serve("agents.seller_agent.__main__:app", port=8002)
@@ -1,20 +1,28 @@
 from google.adk.agents import Agent
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 from google.genai import types
-import json
+from common.listing_store import ListingStore
+from common.logging_setup import configure_logging, LogPayload
+from common.model_backend import get_model
+from common.prompt_budget import after_model, before_model
+from common.rate_limit import limit_model_call, settle_model_call
+from common.response_cache import ResponseCache
+from common.session_store import make_session_service
+from common.sessions import SessionPool
+from common.streaming import stream_model
+from common.structured_output import OutputSchema, SchemaError
+from common.tracing import span, traced
+from common.valuation import FALLBACK_PRICE, value_property
+import asyncio
 import logging
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Simplified but robust Seller Agent
 seller_agent = Agent(
     name="seller_agent",
-    model="gemini-2.0-flash",
+    model=get_model("seller"),
     description="Creates property listings with market-based pricing and detailed descriptions.",
     instruction=(
         "You are a real estate agent. Create a property listing based on the given details. "
@@ -38,10 +46,12 @@ seller_agent = Agent(
         "- Smaller cities: ₹3,000-6,000 per sq.ft\n"
         
         "NO MARKDOWN. NO EXTRA TEXT. ONLY JSON."
-    )
+    ),
+    before_model_callback=[before_model, limit_model_call],
+    after_model_callback=[after_model, settle_model_call],
 )
 
-session_service = InMemorySessionService()
+session_service = make_session_service()
 runner = Runner(
     agent=seller_agent,
     app_name="seller_app",
@@ -49,155 +59,203 @@ runner = Runner(
 )
 
 USER_ID = "user_seller"
-SESSION_ID = "session_seller"
+sessions = SessionPool(session_service, app_name="seller_app", default_user_id=USER_ID)
+cache = ResponseCache(
+    "seller",
+    fields=(
+        "location", "size_sqft", "size", "price", "property_type",
+        "property.location", "property.size_sqft", "property.price", "property.type",
+    ),
+)
+SCHEMA = OutputSchema("seller", required=("title", "price_in_inr"))
+# Every listing created here is published for the buyer agent to search
+listing_store = ListingStore("listings")
 
 # Helper function for fallback pricing
 def calculate_fallback_price(location, size_sqft, property_type):
     """Calculate reasonable price if agent fails"""
     try:
-        size_sqft = int(size_sqft) if size_sqft else 1000
-        
-        # Base pricing per sq.ft based on location
-        location_lower = str(location).lower()
-        
-        if any(city in location_lower for city in ['mumbai', 'delhi', 'bangalore', 'gurgaon']):
-            base_price = 15000
-        elif any(city in location_lower for city in ['pune', 'chennai', 'hyderabad', 'kolkata']):
-            base_price = 7500
-        elif any(city in location_lower for city in ['ahmedabad', 'jaipur', 'surat', 'lucknow']):
-            base_price = 5000
-        else:
-            base_price = 4000
-        
-        # Property type adjustment
-        if str(property_type).lower() == 'villa':
-            base_price *= 1.3
-        elif str(property_type).lower() == 'plot':
-            base_price *= 0.7
-            
-        return int(base_price * size_sqft)
-    except:
-        return 5000000  # Default fallback
+        return value_property(location, size_sqft, property_type)
+    except Exception as e:
+        logger.warning(f"Fallback valuation failed: {e}")
+        return FALLBACK_PRICE  # Default fallback
+
+# Request + response helpers
+def extract_property(request):
+    """Return (location, size_sqft, asking_price, property_type) from a nested or flat request"""
+    # Handle nested property structure
+    if 'property' in request:
+        prop = request['property']
+        location = prop.get('location', 'Not specified')
+        size_sqft = prop.get('size_sqft', 1000)
+        asking_price = prop.get('price', 0)
+        property_type = prop.get('type', 'Apartment')
+    else:
+        # Handle flat structure
+        location = request.get('location', 'Not specified')
+        size_sqft = request.get('size_sqft', request.get('size', 1000))
+        asking_price = request.get('price', 0)
+        property_type = request.get('property_type', 'Apartment')
+    return location, size_sqft, asking_price, property_type
+
+
+def build_prompt(location, size_sqft, property_type, asking_price):
+    return (
+        f"Create a property listing:\n"
+        f"Location: {location}\n"
+        f"Size: {size_sqft} sq ft\n"
+        f"Property Type: {property_type}\n"
+        f"Reference Price: ₹{asking_price}\n"
+        f"Generate market-appropriate pricing and features."
+    )
+
+
+@traced("parse")
+def parse_listings(response_text, extractor=None):
+    """Return the 'seller' listings from the model output, or None if unusable"""
+    if not response_text:
+        return None
+    logger.debug("Agent response: %s", LogPayload(response_text))
+
+    try:
+        listings = SCHEMA.parse(response_text, extractor)
+    except SchemaError as e:
+        logger.warning(f"Seller output rejected: {e}")
+        return None
+    if listings:
+        logger.debug("Successfully parsed agent response")
+    return listings or None
+
+
+def build_fallback_listing(location, size_sqft, property_type):
+    """Create a listing without the model"""
+    logger.info("Using fallback listing generation")
+
+    fallback_price = calculate_fallback_price(location, size_sqft, property_type)
+
+    return {
+        "title": f"Beautiful {property_type} in {location}",
+        "description": f"Well-maintained {property_type.lower()} spanning {size_sqft} sq ft in the heart of {location}. Perfect for families looking for a comfortable home.",
+        "price_in_inr": fallback_price,
+        "location": location,
+        "size_sq_ft": int(size_sqft),
+        "features": [
+            "Prime location",
+            "Well-ventilated rooms",
+            "Good connectivity",
+            "Peaceful neighborhood",
+            "Ready to move"
+        ]
+    }
+
+
+async def publish_listings(created, location, size_sqft, property_type):
+    """Record listings the model created in the shared listing store"""
+    for listing in created:
+        try:
+            await asyncio.to_thread(listing_store.add, {
+                "title": listing.get("title"),
+                "description": listing.get("description"),
+                "price": listing.get("price_in_inr"),
+                "location": listing.get("location") or location,
+                "size_sqft": listing.get("size_sq_ft") or size_sqft,
+                "property_type": property_type,
+                "features": listing.get("features"),
+            })
+        except Exception as e:
+            logger.warning(f"Could not store listing {listing.get('title')!r}: {e}")
+
+
+def build_error_response(error):
+    logger.error(f"Execute function failed: {error}")
+    return {
+        "seller": [],
+        "status": "error",
+        "message": f"Failed to create listing: {str(error)}"
+    }
+
 
 # Main execute function
+@cache.cached
 async def execute(request):
-    logger.debug(f"Seller agent request: {request}")
+    logger.debug("Seller agent request: %s", LogPayload(request))
     
     try:
-        # Extract data from request
-        seller_name = request.get('seller_name', 'Property Owner')
-        contact = request.get('contact', 'Contact available')
-        
-        # Handle nested property structure
-        if 'property' in request:
-            prop = request['property']
-            location = prop.get('location', 'Not specified')
-            size_sqft = prop.get('size_sqft', 1000)
-            asking_price = prop.get('price', 0)
-            property_type = prop.get('type', 'Apartment')
-        else:
-            # Handle flat structure
-            location = request.get('location', 'Not specified')
-            size_sqft = request.get('size_sqft', request.get('size', 1000))
-            asking_price = request.get('price', 0)
-            property_type = request.get('property_type', 'Apartment')
-
-        logger.debug(f"Extracted: location={location}, size={size_sqft}, price={asking_price}")
-
-        # Create session
-        try:
-            await session_service.create_session(
-                app_name="seller_app",
-                user_id=USER_ID,
-                session_id=SESSION_ID
-            )
-        except Exception as session_error:
-            logger.warning(f"Session creation failed: {session_error}")
-
-        # Create prompt
-        prompt = (
-            f"Create a property listing:\n"
-            f"Location: {location}\n"
-            f"Size: {size_sqft} sq ft\n"
-            f"Property Type: {property_type}\n"
-            f"Reference Price: ₹{asking_price}\n"
-            f"Generate market-appropriate pricing and features."
-        )
+        location, size_sqft, asking_price, property_type = extract_property(request)
+        logger.debug("Extracted: location=%s, size=%s, price=%s", location, size_sqft, asking_price)
 
+        prompt = build_prompt(location, size_sqft, property_type, asking_price)
         message = types.Content(role="user", parts=[types.Part(text=prompt)])
 
         # Try to get response from agent
         try:
             response_text = None
-            async for event in runner.run_async(
-                user_id=USER_ID,
-                session_id=SESSION_ID,
-                new_message=message
-            ):
-                if event.is_final_response():
-                    response_text = event.content.parts[0].text
-                    break
-
-            if response_text:
-                logger.debug(f"Agent response: {response_text}")
-                
-                # Clean response
-                cleaned = response_text.strip()
-                if cleaned.startswith('```json'):
-                    cleaned = cleaned[7:]
-                if cleaned.startswith('```'):
-                    cleaned = cleaned[3:]
-                if cleaned.endswith('```'):
-                    cleaned = cleaned[:-3]
-                cleaned = cleaned.strip()
-
-                # Parse JSON
-                try:
-                    parsed = json.loads(cleaned)
-                    if 'seller' in parsed and parsed['seller']:
-                        logger.debug("Successfully parsed agent response")
-                        return {
-                            "seller": parsed['seller'],
-                            "status": "success"
-                        }
-                except json.JSONDecodeError as json_error:
-                    logger.warning(f"JSON parsing failed: {json_error}")
+            async with sessions.lease(request) as (user_id, session_id):
+                with span("model"):
+                    async for event in runner.run_async(
+                        user_id=user_id,
+                        session_id=session_id,
+                        new_message=message
+                    ):
+                        if event.is_final_response() and event.content:
+                            response_text = event.content.parts[0].text
+                            break
+
+            created = parse_listings(response_text)
 
         except Exception as agent_error:
             logger.warning(f"Agent execution failed: {agent_error}")
+            created = None
 
-        # Fallback: Create listing manually
-        logger.info("Using fallback listing generation")
-        
-        fallback_price = calculate_fallback_price(location, size_sqft, property_type)
-        
-        fallback_listing = {
-            "title": f"Beautiful {property_type} in {location}",
-            "description": f"Well-maintained {property_type.lower()} spanning {size_sqft} sq ft in the heart of {location}. Perfect for families looking for a comfortable home.",
-            "price_in_inr": fallback_price,
-            "location": location,
-            "size_sq_ft": int(size_sqft),
-            "features": [
-                "Prime location",
-                "Well-ventilated rooms",
-                "Good connectivity",
-                "Peaceful neighborhood",
-                "Ready to move"
-            ]
-        }
-
+        # Fallback: Create listing manually. It is a placeholder, so it is not published.
+        if created:
+            await publish_listings(created, location, size_sqft, property_type)
+        created = created or [build_fallback_listing(location, size_sqft, property_type)]
         return {
-            "seller": [fallback_listing],
+            "seller": created,
             "status": "success"
         }
 
     except Exception as e:
-        logger.error(f"Execute function failed: {e}")
-        return {
-            "seller": [],
-            "status": "error",
-            "message": f"Failed to create listing: {str(e)}"
+        return build_error_response(e)
+
+# Streaming execute function
+async def execute_stream(request):
+    logger.debug("Seller agent streaming request: %s", LogPayload(request))
+
+    cached = cache.get(request)
+    if cached is not None:
+        yield "result", cached
+        return
+
+    try:
+        location, size_sqft, asking_price, property_type = extract_property(request)
+        prompt = build_prompt(location, size_sqft, property_type, asking_price)
+        message = types.Content(role="user", parts=[types.Part(text=prompt)])
+
+        created = None
+        try:
+            extractor = SCHEMA.extractor()
+            async for kind, text in stream_model(runner, sessions, request, message, extractor):
+                if kind == "token":
+                    yield "token", {"text": text}
+                else:
+                    created = parse_listings(text, extractor)
+        except Exception as agent_error:
+            logger.warning(f"Agent execution failed: {agent_error}")
+
+        if created:
+            await publish_listings(created, location, size_sqft, property_type)
+        created = created or [build_fallback_listing(location, size_sqft, property_type)]
+        result = {
+            "seller": created,
+            "status": "success"
         }
+        cache.put(request, result)
+        yield "result", result
+
+    except Exception as e:
+        yield "result", build_error_response(e)
 
 # Wrapper function for external calls
 async def run_seller_agent(request_data):
@@ -1,3 +1,6 @@
-from .agent import execute
+from .agent import execute, execute_stream
 async def run(payload):
-    return await execute(payload)
\ No newline at end of file
+    return await execute(payload)
+
+def run_stream(payload):
+    return execute_stream(payload)
@@ -0,0 +1,54 @@
+"""
+Proximity lookup latency.
+
+Times radius and k-nearest queries on the grid index against a brute-force
+scan, over the locality gazetteer and over N synthetic points spread
+across India.
+
+    python -m benchmarks.geo_lookup --points 100000 --queries 2000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from common.geo import GridIndex, gazetteer, haversine_km, nearby
+
+
+def timed(label, queries, call):
+    start = time.perf_counter()
+    for query in queries:
+        call(*query)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22}: {elapsed / len(queries) * 1e6:9.1f} us/query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--radius-km", type=float, default=10)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    places = gazetteer()
+    rng = random.Random(7)
+    locations = [(f"{name}, {city}",) for name, city in places.labels]
+    timed(f"nearby ({len(places.names)} localities)", [rng.choice(locations) for _ in range(args.queries)], nearby)
+
+    gen = np.random.default_rng(7)
+    lats, lons = gen.uniform(8, 32, args.points), gen.uniform(68, 92, args.points)
+    start = time.perf_counter()
+    grid = GridIndex(lats, lons)
+    print(f"{'grid build':>22}: {(time.perf_counter() - start) * 1000:9.1f} ms for {args.points} points")
+
+    queries = [(rng.uniform(10, 30), rng.uniform(70, 90)) for _ in range(args.queries)]
+    timed("grid radius", queries, lambda lat, lon: grid.within(lat, lon, args.radius_km))
+    timed("grid k-nearest", queries, lambda lat, lon: grid.nearest(lat, lon, args.k))
+    scan = lambda lat, lon: np.argpartition(haversine_km(lat, lon, lats, lons), args.k)[:args.k]
+    timed("brute-force k-nearest", queries[:200], scan)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Host fan-out latency benchmark.
+
+Starts four stub agent servers that sleep for a fixed delay before returning
+canned JSON, then times `host_agent.task_manager.run` in sequential and
+concurrent mode against them.
+
+    python -m benchmarks.host_fanout --iterations 20 --delays 0.4,0.3,0.5,0.2
+    python -m benchmarks.host_fanout --down price
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+
+from agents.host_agent import task_manager
+
+STUB_RESPONSES = {
+    "buyer": {"buyer": [{"Property name/title": "Stub Flat", "Price in INR": 5000000}], "status": "success"},
+    "seller": {"seller": [{"Property name/title": "Stub Listing", "Asking price in INR": 6000000}], "status": "success"},
+    "price": {"price": [{"Property name/title": "Stub Flat", "Estimated price in INR": 5500000}], "status": "success"},
+    "neighborhood": {"neighborhood": [{"Neighborhood name": "Stub Nagar", "Safety rating": 4}], "status": "success"},
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def stub_app(name, delay):
+    app = FastAPI()
+
+    @app.post("/run")
+    async def run(payload: dict):
+        await asyncio.sleep(delay)
+        return STUB_RESPONSES[name]
+
+    return app
+
+
+def start_stub(name, delay):
+    port = free_port()
+    config = uvicorn.Config(stub_app(name, delay), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/run"
+
+
+async def measure(mode, iterations, payload, agent_deadline, global_deadline):
+    samples = []
+    last = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        last = await task_manager.run(
+            payload, mode=mode, agent_deadline=agent_deadline, global_deadline=global_deadline
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, last
+
+
+def summarize(mode, samples, last):
+    samples = sorted(samples)
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    statuses = ", ".join(f"{k}={v['status']}" for k, v in last["sections"].items())
+    print(f"{mode:>10}: mean {statistics.mean(samples):8.1f} ms  p95 {p95:8.1f} ms  [{statuses}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--delays", default="0.4,0.3,0.5,0.2", help="buyer,seller,price,neighborhood delay in seconds")
+    parser.add_argument("--down", default="", help="comma-separated agents to point at a closed port")
+    parser.add_argument("--agent-deadline", type=float, default=2.0)
+    parser.add_argument("--global-deadline", type=float, default=3.0)
+    args = parser.parse_args()
+
+    delays = dict(zip(task_manager.AGENT_URLS, (float(d) for d in args.delays.split(","))))
+    down = {d for d in args.down.split(",") if d}
+    for name, delay in delays.items():
+        if name in down:
+            task_manager.AGENT_URLS[name] = f"http://127.0.0.1:{free_port()}/run"
+        else:
+            task_manager.AGENT_URLS[name] = start_stub(name, delay)
+
+    payload = {"location": "Koramangala, Bangalore", "budget": 8000000, "property_type": "Apartment"}
+
+    async def bench():
+        for mode in ("sequential", "concurrent"):
+            samples, last = await measure(
+                mode, args.iterations, payload, args.agent_deadline, args.global_deadline
+            )
+            summarize(mode, samples, last)
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Listing search latency.
+
+Fills a temporary listing store with N synthetic listings, then times the
+index build and buyer-style searches (location, budget, type and
+requirement words).
+
+    python -m benchmarks.listing_search --listings 100000 --queries 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from common.listing_store import ListingStore
+
+LOCATIONS = [
+    "Koramangala, Bangalore", "Whitefield, Bengaluru", "Andheri West, Mumbai", "Powai, Mumbai",
+    "Baner, Pune", "Gachibowli, Hyderabad", "Adyar, Chennai", "Salt Lake, Kolkata",
+    "Gomti Nagar, Lucknow", "Satellite, Ahmedabad", "Sector 62, Noida", "Civil Lines, Nagpur",
+]
+QUERY_LOCATIONS = LOCATIONS + ["Jayanagar, Bangalore", "Bandra, Mumbai", "Pune"]
+TYPES = ["Apartment", "Villa", "Plot"]
+FEATURES = [
+    "Near metro station", "Gym", "Swimming pool", "2BHK", "3BHK", "Park facing", "Covered parking",
+    "Gated community", "Power backup", "Vastu compliant", "Modular kitchen", "Pet friendly",
+]
+REQUIREMENTS = ["2BHK near metro", "pool and gym", "gated community, parking", "pet friendly 3BHK", ""]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ListingStore("benchmark", path=os.path.join(tmp, "listings.sqlite3"))
+        start = time.perf_counter()
+        for i in range(args.listings):
+            store.add({
+                "title": f"{rng.choice(TYPES)} {i}", "description": "", "location": rng.choice(LOCATIONS),
+                "price": rng.randint(20, 400) * 100000, "size_sqft": rng.randint(400, 4000),
+                "property_type": rng.choice(TYPES), "features": rng.sample(FEATURES, 4),
+            })
+        print(f"insert: {args.listings:>7} listings in {time.perf_counter() - start:6.2f} s")
+
+        start = time.perf_counter()
+        len(store)  # builds the index
+        print(f" index: {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        timings, hits = [], 0
+        for _ in range(args.queries):
+            query = {
+                "location": rng.choice(QUERY_LOCATIONS), "budget": rng.randint(30, 300) * 100000,
+                "property_type": rng.choice(TYPES), "requirements": rng.choice(REQUIREMENTS),
+            }
+            start = time.perf_counter()
+            hits += bool(store.search(**query))
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(
+            f"search: {args.queries:>7} queries  p50 {statistics.median(timings):.3f} ms"
+            f"  p99 {timings[int(0.99 * (len(timings) - 1))]:.3f} ms  ({hits} with results)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Open-loop load generator for the running agent services.
+
+Replays a JSONL workload (see `benchmarks.workloads`) at a fixed arrival
+rate, whether or not earlier requests have finished, and reports latency
+percentiles, throughput and errors per agent. For host requests the
+per-agent "sections" timings are broken out as hops. Latency is measured
+from each request's scheduled start, so a backed-up server is not hidden by
+the generator slowing down.
+
+Start the services first (MODEL_BACKEND=stub runs them without a model):
+
+    python -m benchmarks.workloads --count 2000 --out workload.jsonl
+    python -m benchmarks.loadgen workload.jsonl --rate 20 --duration 60
+    python -m benchmarks.loadgen workload.jsonl --rate 20 --compare benchmarks/reports/<old>.json
+
+The JSON report is written to benchmarks/reports/<commit>-<time>.json
+unless --out is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+DEFAULT_URLS = {
+    "host": "http://localhost:8000/run",
+    "buyer": "http://localhost:8001/run",
+    "seller": "http://localhost:8002/run",
+    "price": "http://localhost:8003/run",
+    "neighborhood": "http://localhost:8004/run",
+}
+REPORTS_DIR = os.path.join(os.path.dirname(__file__), "reports")
+COMPARE_METRICS = ("throughput_rps", "error_rate", "p50_ms", "p95_ms", "p99_ms")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "count": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round((count - errors) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / count, 1) if count else None,
+        "p50_ms": percentile(values, 0.50),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": values[-1] if values else None,
+    }
+
+
+def classify(response=None, error=None):
+    """'ok' or an error class for one request."""
+    if error is not None:
+        if isinstance(error, httpx.TimeoutException):
+            return "timeout"
+        if isinstance(error, httpx.TransportError):
+            return "connect"
+        return type(error).__name__
+    if response.status_code != 200:
+        return f"http_{response.status_code}"
+    try:
+        body = response.json()
+    except ValueError:
+        return "bad_json"
+    if isinstance(body, dict) and body.get("status") == "error":
+        return "agent_error"
+    return "ok"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # agent -> ms
+        self.outcomes = defaultdict(Counter)  # agent -> outcome -> count
+        self.hops = defaultdict(list)  # downstream agent -> ms, from host sections
+        self.hop_status = defaultdict(Counter)
+        self.host_overhead = []  # host latency beyond its slowest section
+        self.dropped = 0
+
+    def record(self, agent, latency_ms, outcome, body=None):
+        self.latencies[agent].append(round(latency_ms, 1))
+        self.outcomes[agent][outcome] += 1
+        sections = body.get("sections") if agent == "host" and isinstance(body, dict) else None
+        if not sections:
+            return
+        slowest = 0.0
+        for name, section in sections.items():
+            self.hop_status[name][section.get("status", "unknown")] += 1
+            if section.get("elapsed_ms") is not None:
+                self.hops[name].append(section["elapsed_ms"])
+                slowest = max(slowest, section["elapsed_ms"])
+        self.host_overhead.append(round(latency_ms - slowest, 1))
+
+    def report(self, elapsed):
+        all_latencies = [ms for values in self.latencies.values() for ms in values]
+        all_errors = sum(n for c in self.outcomes.values() for k, n in c.items() if k != "ok")
+        return {
+            "overall": {**summarize(all_latencies, all_errors, elapsed), "dropped": self.dropped},
+            "agents": {
+                agent: {
+                    **summarize(values, sum(n for k, n in self.outcomes[agent].items() if k != "ok"), elapsed),
+                    "outcomes": dict(self.outcomes[agent]),
+                }
+                for agent, values in sorted(self.latencies.items())
+            },
+            "hops": {
+                name: {**summarize(values, 0, elapsed), "status": dict(self.hop_status[name])}
+                for name, values in sorted(self.hops.items())
+            },
+            "host_overhead": summarize(self.host_overhead, 0, elapsed) if self.host_overhead else None,
+        }
+
+
+async def send(client, urls, item, scheduled, recorder, timeout):
+    agent = item["agent"]
+    body = None
+    try:
+        response = await client.post(urls[agent], json=item["payload"], timeout=timeout)
+        outcome = classify(response)
+        if outcome in ("ok", "agent_error"):
+            body = response.json()
+    except Exception as e:
+        outcome = classify(error=e)
+    recorder.record(agent, (time.perf_counter() - scheduled) * 1000, outcome, body)
+
+
+async def run_load(items, urls, rate, duration, arrivals, max_outstanding, timeout, seed):
+    rng = random.Random(seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=max_outstanding, max_keepalive_connections=max_outstanding)
+    total = int(rate * duration) if duration else len(items)
+    tasks = set()
+    async with httpx.AsyncClient(limits=limits) as client:
+        start = time.perf_counter()
+        next_at = start
+        for i in range(total):
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(tasks) >= max_outstanding:
+                # Open loop: never wait for the server, count the miss instead.
+                recorder.dropped += 1
+            else:
+                task = asyncio.create_task(
+                    send(client, urls, items[i % len(items)], next_at, recorder, timeout)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            next_at += rng.expovariate(rate) if arrivals == "poisson" else 1 / rate
+        if tasks:
+            await asyncio.wait(tasks)
+        elapsed = time.perf_counter() - start
+    return recorder.report(elapsed), elapsed
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(report):
+    def row(label, stats):
+        print(f"{label:<22}{stats['count']:>7}{stats['error_rate'] * 100:>8.1f}%{stats['throughput_rps']:>9.1f}"
+              + "".join(f"{stats[k] if stats[k] is not None else '-':>10}" for k in ("p50_ms", "p95_ms", "p99_ms")))
+
+    print(f"{'':<22}{'count':>7}{'errors':>9}{'ok rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    row("overall", report["overall"])
+    for agent, stats in report["agents"].items():
+        row(f"  {agent}", stats)
+    if report["hops"]:
+        print("host hops:")
+        for name, stats in report["hops"].items():
+            row(f"  host -> {name}", stats)
+        row("  host overhead", report["host_overhead"])
+    if report["overall"]["dropped"]:
+        print(f"dropped {report['overall']['dropped']} arrivals at the outstanding-request cap")
+
+
+def print_comparison(report, baseline):
+    print(f"\nvs {baseline['meta']['commit']} ({baseline['meta']['timestamp']}):")
+    sections = [("overall", report["overall"], baseline["overall"])]
+    sections += [(agent, stats, baseline["agents"].get(agent)) for agent, stats in report["agents"].items()]
+    for label, new, old in sections:
+        if not old:
+            continue
+        changes = []
+        for metric in COMPARE_METRICS:
+            if new.get(metric) is None or old.get(metric) is None:
+                continue
+            delta = new[metric] - old[metric]
+            pct = f" ({delta / old[metric] * 100:+.0f}%)" if old[metric] else ""
+            changes.append(f"{metric} {old[metric]} -> {new[metric]}{pct}")
+        print(f"  {label}: " + "; ".join(changes))
+
+
+def load_workload(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_url(text):
+    agent, _, url = text.partition("=")
+    if agent not in DEFAULT_URLS or not url:
+        raise argparse.ArgumentTypeError("expected AGENT=URL")
+    return agent, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("workload", help="JSONL file from benchmarks.workloads")
+    parser.add_argument("--rate", type=float, default=10, help="arrivals per second")
+    parser.add_argument("--duration", type=float, default=0, help="seconds; 0 replays the file once")
+    parser.add_argument("--arrivals", choices=("constant", "poisson"), default="poisson")
+    parser.add_argument("--max-outstanding", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--url", type=parse_url, action="append", default=[], help="AGENT=URL override")
+    parser.add_argument("--out", help="report path (default benchmarks/reports/<commit>-<time>.json)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    items = load_workload(args.workload)
+    urls = {**DEFAULT_URLS, **dict(args.url)}
+    report, elapsed = asyncio.run(run_load(
+        items, urls, args.rate, args.duration, args.arrivals, args.max_outstanding, args.timeout, args.seed
+    ))
+    report["meta"] = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "workload": args.workload,
+        "rate": args.rate,
+        "arrivals": args.arrivals,
+        "elapsed_s": round(elapsed, 2),
+    }
+
+    print_report(report)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+    out = args.out or os.path.join(
+        REPORTS_DIR, f"{report['meta']['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Structured-output parsing: the old fence-strip + json.loads vs the shared extractor.
+
+The built-in corpus takes the stub model's replies for each agent and wraps
+them the ways real models do: code fences, a lead-in sentence, trailing
+commentary, both, and truncation. Recorded cassettes (MODEL_BACKEND=record)
+can be used instead or as well:
+
+    python -m benchmarks.parse_output
+    python -m benchmarks.parse_output --cassettes shared/cassettes --repeat 200
+
+For each variant it reports success rate and parse time for both parsers,
+plus how much of the text a streaming caller has to read before the
+extractor can stop generation.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import time
+from collections import defaultdict
+
+from common.model_backend import stub_reply
+from common.structured_output import JsonExtractor, OutputSchema, SchemaError
+
+AGENTS = ("buyer", "seller", "price", "neighborhood")
+SCHEMAS = {agent: OutputSchema(agent) for agent in AGENTS}
+PROMPT = "Location: {}\nProperty Type: Apartment\nSize: 1100 sq. ft\nBudget: 9000000"
+LOCATIONS = ["Koramangala, Bangalore", "Andheri West, Mumbai", "Baner, Pune", "Gachibowli, Hyderabad"]
+TAIL = "\n\nNote: prices are indicative {as of this quarter} and vary by floor and facing."
+
+VARIANTS = {
+    "clean": lambda text: text,
+    "fenced": lambda text: f"```json\n{text}\n```",
+    "lead_in": lambda text: f"Here are the results you asked for:\n{text}",
+    "trailing": lambda text: text + TAIL,
+    "lead_in_fenced_trailing": lambda text: f"Sure! Here you go:\n```json\n{text}\n```{TAIL}",
+    "truncated": lambda text: text[: int(len(text) * 0.8)],
+}
+
+
+def legacy_parse(text, key):
+    """The per-agent parsing this replaced."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    try:
+        return json.loads(text.strip()).get(key, [])
+    except (json.JSONDecodeError, AttributeError):
+        return None
+
+
+def new_parse(text, key):
+    try:
+        return SCHEMAS[key].parse(text)
+    except SchemaError:
+        return None
+
+
+def stop_point(text, key, chunk=16):
+    """Fraction of the text read before the extractor has the result."""
+    extractor = JsonExtractor(key)
+    for i in range(0, len(text), chunk):
+        if extractor.feed(text[i:i + chunk]):
+            return min(1.0, (i + chunk) / len(text))
+    return 1.0
+
+
+def builtin_corpus(seed):
+    rng = random.Random(seed)
+    corpus = []
+    for agent in AGENTS:
+        for location in LOCATIONS:
+            base = stub_reply(agent, PROMPT.format(location), rng)
+            for variant, wrap in VARIANTS.items():
+                corpus.append((variant, agent, wrap(base)))
+    return corpus
+
+
+def cassette_corpus(directory):
+    corpus = []
+    for path in glob.glob(os.path.join(directory, "*.jsonl")):
+        agent = os.path.splitext(os.path.basename(path))[0]
+        if agent not in SCHEMAS:
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                for response in entry["responses"]:
+                    parts = (response.get("content") or {}).get("parts") or []
+                    text = "".join(part.get("text") or "" for part in parts)
+                    if text:
+                        corpus.append(("recorded", agent, text))
+    return corpus
+
+
+def time_parser(parse, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, agent, text in corpus:
+            parse(text, agent)
+    return (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassettes", help="directory of recorded cassettes to include")
+    parser.add_argument("--no-builtin", action="store_true")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = [] if args.no_builtin else builtin_corpus(args.seed)
+    if args.cassettes:
+        corpus += cassette_corpus(args.cassettes)
+    if not corpus:
+        parser.error("empty corpus")
+
+    by_variant = defaultdict(list)
+    for item in corpus:
+        by_variant[item[0]].append(item)
+
+    print(f"{'variant':<26}{'n':>4}{'legacy ok':>11}{'new ok':>8}{'legacy us':>11}{'new us':>8}{'read to stop':>14}")
+    for variant, items in by_variant.items():
+        legacy_ok = sum(legacy_parse(text, agent) is not None for _, agent, text in items)
+        new_ok = sum(new_parse(text, agent) is not None for _, agent, text in items)
+        read = sum(stop_point(text, agent) for _, agent, text in items) / len(items)
+        print(f"{variant:<26}{len(items):>4}{legacy_ok / len(items):>10.0%}{new_ok / len(items):>8.0%}"
+              f"{time_parser(legacy_parse, items, args.repeat):>11.1f}{time_parser(new_parse, items, args.repeat):>8.1f}"
+              f"{read:>13.0%}")
+
+
+if __name__ == "__main__":
+    main()
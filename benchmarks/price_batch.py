@@ -0,0 +1,100 @@
+"""
+Price agent throughput: one call per property vs /run/batch chunking.
+
+The price agent's model is swapped for a stub whose latency is a fixed
+per-call cost plus a small per-property cost, which is roughly how a hosted
+LLM behaves. Both paths run with the same concurrency limit.
+
+    python -m benchmarks.price_batch --properties 200 --chunk-size 20 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "off")
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from agents.price_agent import agent as price
+
+CITIES = ["Koramangala, Bangalore", "Andheri West, Mumbai", "Baner, Pune", "Gachibowli, Hyderabad"]
+
+
+class LatencyStubLlm(BaseLlm):
+    call_latency: float = 0.4
+    item_latency: float = 0.01
+
+    async def generate_content_async(self, llm_request, stream=False):
+        prompt = llm_request.contents[-1].parts[0].text
+        ids = re.findall(r"- id: (\S+)", prompt) or [None]
+        await asyncio.sleep(self.call_latency + self.item_latency * len(ids))
+        entries = []
+        for item_id in ids:
+            entry = {"Estimated price range (min-max INR)": "60,00,000 - 75,00,000", "Justification": "stub"}
+            if item_id is not None:
+                entry["id"] = item_id
+            entries.append(entry)
+        text = json.dumps({"price": entries})
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def make_properties(count):
+    return [
+        {"id": f"P{i}", "location": CITIES[i % len(CITIES)], "property_type": "Apartment", "size": 800 + 10 * (i % 50)}
+        for i in range(count)
+    ]
+
+
+async def single_path(properties, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(item):
+        async with semaphore:
+            return await price.execute(item)
+
+    results = await asyncio.gather(*(one(item) for item in properties))
+    return sum(1 for r in results if r.get("status") != "success")
+
+
+async def batch_path(properties, chunk_size, concurrency):
+    result = await price.execute_batch(
+        {"properties": properties, "chunk_size": chunk_size, "concurrency": concurrency}
+    )
+    return result["stats"]["failed"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--properties", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--call-latency", type=float, default=0.4)
+    parser.add_argument("--item-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    price.price_agent.model = LatencyStubLlm(
+        model="stub", call_latency=args.call_latency, item_latency=args.item_latency
+    )
+    properties = make_properties(args.properties)
+
+    async def bench():
+        for label, run in (
+            ("single", lambda: single_path(properties, args.concurrency)),
+            ("batch", lambda: batch_path(properties, args.chunk_size, args.concurrency)),
+        ):
+            start = time.perf_counter()
+            failed = await run()
+            elapsed = time.perf_counter() - start
+            print(f"{label:>7}: {len(properties) / elapsed:8.1f} properties/s  "
+                  f"({elapsed:.2f}s, {failed} failed)")
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()
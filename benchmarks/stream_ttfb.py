@@ -0,0 +1,90 @@
+"""
+Time-to-first-byte benchmark for /run vs /run/stream.
+
+Serves the price agent app with its model swapped for a stub that emits the
+response in chunks with a fixed delay between them, then measures time to
+first byte and time to the complete result for both endpoints.
+
+    python -m benchmarks.stream_ttfb --chunks 20 --chunk-delay 0.05
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "off")
+
+import httpx
+import uvicorn
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from agents.price_agent import agent as price
+from agents.price_agent.__main__ import app
+from benchmarks.host_fanout import free_port
+
+RESPONSE_TEXT = (
+    '{"price": [{"Property type": "Apartment", "Location": "Koramangala, Bangalore", '
+    '"Size (sq. ft)": 1450, "Estimated price range (min-max INR)": "1,80,00,000 - 2,10,00,000", '
+    '"Justification": "Established locality with strong rental demand and metro access"}]}'
+)
+
+
+class ChunkedStubLlm(BaseLlm):
+    chunks: int = 20
+    chunk_delay: float = 0.05
+
+    async def generate_content_async(self, llm_request, stream=False):
+        size = max(1, len(RESPONSE_TEXT) // self.chunks)
+        pieces = [RESPONSE_TEXT[i:i + size] for i in range(0, len(RESPONSE_TEXT), size)]
+        for piece in pieces:
+            await asyncio.sleep(self.chunk_delay)
+            if stream:
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=piece)]), partial=True)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=RESPONSE_TEXT)]))
+
+
+async def time_run(client, url, payload):
+    start = time.perf_counter()
+    async with client.stream("POST", url, json=payload) as response:
+        first = None
+        async for _ in response.aiter_bytes():
+            if first is None:
+                first = time.perf_counter() - start
+    return first * 1000, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    price.price_agent.model = ChunkedStubLlm(model="stub", chunks=args.chunks, chunk_delay=args.chunk_delay)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    payload = {"location": "Koramangala, Bangalore", "property_type": "Apartment", "size": 1450}
+
+    async def bench():
+        async with httpx.AsyncClient(timeout=60) as client:
+            for path in ("/run", "/run/stream"):
+                await time_run(client, f"http://127.0.0.1:{port}{path}", payload)  # warm-up
+                samples = [await time_run(client, f"http://127.0.0.1:{port}{path}", payload)
+                           for _ in range(args.iterations)]
+                ttfb = statistics.mean(s[0] for s in samples)
+                total = statistics.mean(s[1] for s in samples)
+                print(f"{path:>12}: ttfb {ttfb:8.1f} ms  complete {total:8.1f} ms")
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Rate-table valuation throughput.
+
+Values N synthetic properties with the vectorized engine, and a sample of
+them one at a time through the scalar seller fallback for comparison.
+
+    python -m benchmarks.valuation --rows 100000
+"""
+import argparse
+import random
+import time
+
+from common.valuation import rate_table, value_properties
+from agents.seller_agent.agent import calculate_fallback_price
+
+LOCATIONS = [
+    "Koramangala, Bangalore", "Whitefield, Bengaluru", "Andheri West, Mumbai", "Powai, Mumbai",
+    "Baner, Pune", "Gachibowli, Hyderabad", "Adyar, Chennai", "Salt Lake, Kolkata",
+    "Gomti Nagar, Lucknow", "Satellite, Ahmedabad", "Sector 62, Noida", "Civil Lines, Nagpur",
+]
+TYPES = ["Apartment", "Villa", "Plot", "Other"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--scalar-sample", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    locations = [rng.choice(LOCATIONS) for _ in range(args.rows)]
+    sizes = [rng.randint(400, 4000) for _ in range(args.rows)]
+    types_ = [rng.choice(TYPES) for _ in range(args.rows)]
+    rate_table()  # load once, outside the timings
+
+    start = time.perf_counter()
+    values = value_properties(locations, sizes, types_)
+    vector_ms = (time.perf_counter() - start) * 1000
+    print(f"vectorized: {args.rows:>7} rows in {vector_ms:8.1f} ms  ({args.rows / vector_ms * 1000:,.0f} rows/s)")
+
+    n = min(args.scalar_sample, args.rows)
+    start = time.perf_counter()
+    scalar = [calculate_fallback_price(locations[i], sizes[i], types_[i]) for i in range(n)]
+    scalar_ms = (time.perf_counter() - start) * 1000
+    print(f"    scalar: {n:>7} rows in {scalar_ms:8.1f} ms  ({n / scalar_ms * 1000:,.0f} rows/s)")
+    assert scalar == [int(v) for v in values[:n]]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Workload generator: realistic request mixes for the five agents.
+
+Locations are drawn from the valuation rate table, weighted towards the big
+metros and mostly at locality level ("Koramangala, Bangalore"); sizes,
+property types and budgets follow the usual Indian residential mix. A
+fraction of requests repeat an earlier one, as real traffic has hot keys.
+
+    python -m benchmarks.workloads --count 2000 --seed 7 --out workload.jsonl
+    python -m benchmarks.workloads --mix host=1 --count 200 --out host.jsonl
+
+Each output line is {"agent": ..., "payload": ...}; `benchmarks.loadgen`
+replays it.
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+from collections import defaultdict
+
+from common.valuation import RATES_PATH
+
+AGENTS = ("host", "buyer", "seller", "price", "neighborhood")
+DEFAULT_MIX = {"host": 0.2, "buyer": 0.25, "seller": 0.15, "price": 0.25, "neighborhood": 0.15}
+
+# Share of property search traffic by city.
+CITY_WEIGHTS = {
+    "mumbai": 0.20, "bangalore": 0.20, "delhi": 0.14, "pune": 0.10, "hyderabad": 0.10,
+    "chennai": 0.08, "gurgaon": 0.06, "kolkata": 0.05, "ahmedabad": 0.03, "jaipur": 0.02,
+    "lucknow": 0.01, "surat": 0.01,
+}
+LOCALITY_SHARE = 0.75  # the rest name only the city
+DISPLAY_NAMES = {"omr": "OMR", "hsr layout": "HSR Layout", "bangalore": "Bangalore"}
+
+# property type -> (weight, typical sizes in sq. ft)
+PROPERTY_TYPES = {
+    "Apartment": (0.75, (550, 850, 1250, 1800)),  # 1-4 BHK
+    "Villa": (0.12, (1800, 2400, 3200)),
+    "Plot": (0.08, (1200, 1800, 2400)),
+    "Other": (0.05, (400, 900)),
+}
+REQUIREMENTS = [
+    "2 BHK near metro", "3 BHK with parking", "Gated community", "Good schools nearby",
+    "Close to IT parks", "Park facing", "Ready to move", "Vastu compliant", "Pet friendly",
+    "Near hospital", "Low maintenance", "East facing",
+]
+
+
+def _display(name):
+    return DISPLAY_NAMES.get(name, name.title())
+
+
+def load_locations(path=RATES_PATH):
+    """{city: [locality, ...]} from the rate table."""
+    localities = defaultdict(list)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["kind"] == "locality":
+                localities[row["city"]].append(row["name"])
+    return localities
+
+
+class WorkloadGenerator:
+    def __init__(self, seed=None, mix=None, repeat=0.15):
+        self.rng = random.Random(seed)
+        self.mix = mix or DEFAULT_MIX
+        self.repeat = repeat
+        self.localities = load_locations()
+        self.history = []
+
+    def location(self):
+        rng = self.rng
+        city = rng.choices(list(CITY_WEIGHTS), weights=list(CITY_WEIGHTS.values()))[0]
+        localities = self.localities.get(city)
+        if localities and rng.random() < LOCALITY_SHARE:
+            return f"{_display(rng.choice(localities))}, {_display(city)}"
+        return _display(city)
+
+    def listing(self):
+        rng = self.rng
+        names = list(PROPERTY_TYPES)
+        property_type = rng.choices(names, weights=[PROPERTY_TYPES[n][0] for n in names])[0]
+        size = int(rng.choice(PROPERTY_TYPES[property_type][1]) * rng.uniform(0.9, 1.15))
+        return self.location(), property_type, size
+
+    def payload(self, agent):
+        rng = self.rng
+        location, property_type, size = self.listing()
+        # Budgets in whole lakhs, loosely tied to size.
+        budget = int(size * rng.uniform(6000, 16000) / 100000) * 100000
+        requirements = ", ".join(rng.sample(REQUIREMENTS, rng.randint(1, 3)))
+        if agent == "buyer":
+            return {"location": location, "budget": budget, "property_type": property_type,
+                    "requirements": requirements}
+        if agent == "seller":
+            return {"property": {"location": location, "size_sqft": size, "price": budget,
+                                 "type": property_type}}
+        if agent == "price":
+            return {"location": location, "property_type": property_type, "size": size}
+        if agent == "neighborhood":
+            return {"location": location, "requirements": requirements}
+        return {"location": location, "budget": budget, "property_type": property_type}
+
+    def next(self):
+        if self.history and self.rng.random() < self.repeat:
+            return self.rng.choice(self.history)
+        agent = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        item = {"agent": agent, "payload": self.payload(agent)}
+        self.history.append(item)
+        return item
+
+    def generate(self, count):
+        return [self.next() for _ in range(count)]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        agent, _, weight = part.partition("=")
+        if agent.strip() not in AGENTS:
+            raise argparse.ArgumentTypeError(f"unknown agent {agent!r}")
+        mix[agent.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mix", type=parse_mix, default=None, help="e.g. host=1,price=2")
+    parser.add_argument("--repeat", type=float, default=0.15, help="fraction of repeated requests")
+    parser.add_argument("--out", default="-")
+    args = parser.parse_args()
+
+    items = WorkloadGenerator(args.seed, args.mix, args.repeat).generate(args.count)
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    with out:
+        for item in items:
+            out.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
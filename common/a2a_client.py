@@ -1,24 +1,51 @@
-from httpx import AsyncClient, TimeoutException
+from common.circuit_breaker import breaker_for
+from common.http_pool import pool
+from common.retry import RETRYABLE, RetryPolicy, classify, hedged, host_of
+from common.tracing import trace_headers
 import logging
 import asyncio
+import os
 
 TIMEOUT_SECONDS = 30
 MAX_RETRIES = 3
-logging.basicConfig(level=logging.DEBUG)
+# Send a hedged duplicate of an idempotent call after this many seconds (0 disables)
+HEDGE_AFTER_SECONDS = float(os.getenv("A2A_HEDGE_AFTER_SECONDS", "0"))
 logger = logging.getLogger(__name__)
-async def call_agent(url, payload, timeout=TIMEOUT_SECONDS, retries=MAX_RETRIES):
-    async with AsyncClient() as client:
-        for attempt in range(retries):
-            try:
-                response = await client.post(url, json=payload, timeout=timeout)
-                response.raise_for_status()
-                return response.json()
-            except TimeoutException:
-                logger.warning(f"Timeout on attempt {attempt + 1} for {url}")
-                if attempt == retries - 1:
-                    return {}
-            except Exception as e:
-                logger.error(f"Error calling {url}: {str(e)}")
-                if attempt == retries - 1:
-                    return {}
-            await asyncio.sleep(1)  
\ No newline at end of file
+
+async def _post_json(url, payload, timeout):
+    response = await pool.post(url, json=payload, timeout=timeout, headers=trace_headers())
+    response.raise_for_status()
+    return response.json()
+
+async def call_agent(url, payload, timeout=TIMEOUT_SECONDS, retries=MAX_RETRIES,
+                     idempotent=False, hedge_after=HEDGE_AFTER_SECONDS):
+    policy = RetryPolicy(max_attempts=retries)
+    breaker = breaker_for(url)
+    host = host_of(url)
+    for attempt in range(retries):
+        if not breaker.allow():
+            logger.warning(f"Circuit open for {url}; failing fast")
+            return {}
+        try:
+            if idempotent and hedge_after:
+                result = await hedged(lambda: _post_json(url, payload, timeout), hedge_after, host)
+            else:
+                result = await _post_json(url, payload, timeout)
+            breaker.record_success()
+            return result
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            error_class = classify(e)
+            if error_class in RETRYABLE:
+                breaker.record_failure()
+            else:
+                # The endpoint answered; a bad request is not an outage.
+                breaker.record_success()
+            retry, reason = policy.should_retry(error_class, attempt, host)
+            logger.warning(f"{error_class} error on attempt {attempt + 1} for {url}: {e!r} ({reason})")
+            if not retry:
+                return {}
+        await asyncio.sleep(policy.backoff(attempt))
+    return {}
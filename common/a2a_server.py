@@ -1,13 +1,246 @@
-from fastapi import FastAPI
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import ValidationError
+from starlette.background import BackgroundTask
+from common import http_pool
+from common.admission import AdmissionController, AdmissionRejected
+from common.circuit_breaker import breaker_stats
+from common.geo import geo_stats
+from common.http_pool import pool_stats
+from common.insight_store import insight_stats
+from common.listing_store import listing_stats
+from common.logging_setup import configure_logging, logging_stats
+from common.prompt_budget import prompt_stats
+from common.rate_limit import rate_limit_stats
+from common.response_cache import cache_stats
+from common.retry import retry_stats
+from common.sessions import session_stats
+from common.singleflight import flight_stats
+from common.streaming import sse_response
+from common.structured_output import parser_stats
+from common.tracing import PRIORITY_HEADER, TRACE_HEADER, new_trace_id, record, render_metrics, request_trace, span
+from shared.schema import AgentRequest, AgentResponse
+import asyncio
+import logging
+import os
 
-def create_app(agent=None):
-    app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Server settings (env overridable)
+# ---------------------------
+HOST = os.getenv("AGENT_HOST", "127.0.0.1")
+WORKERS = int(os.getenv("AGENT_WORKERS", "1"))
+RELOAD = os.getenv("AGENT_RELOAD", "0").lower() in ("1", "true", "yes")
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("AGENT_SHUTDOWN_GRACE_SECONDS", "20"))
+KEEP_ALIVE_SECONDS = int(os.getenv("AGENT_KEEP_ALIVE_SECONDS", "30"))
+
+
+class ValidationFailed(Exception):
+    pass
+
+
+def parse_agent_request(body):
+    """Validate a request body as an AgentRequest.
+
+    Bodies that already use the {task, data, metadata} envelope are validated
+    as-is; plain payloads (what the UI and host send today) are wrapped as
+    the data of a "run" task.
+    """
+    if not isinstance(body, dict):
+        raise ValidationFailed("Request body must be a JSON object")
+    try:
+        if "task" in body and "data" in body:
+            return AgentRequest(**body)
+        return AgentRequest(task="run", data=body)
+    except ValidationError as e:
+        raise ValidationFailed(str(e))
+
+
+def request_priority(admission, agent_request, request, route):
+    """The request's priority class: `metadata.priority`, else the X-Priority
+    header (set by the host on downstream calls), else "batch" for /run/batch
+    and the default class for everything else."""
+    value = (agent_request.metadata or {}).get("priority") or request.headers.get(PRIORITY_HEADER)
+    if value is None and route == "batch" and "batch" in admission.weights:
+        value = "batch"
+    try:
+        return admission.priority(value)
+    except ValueError as e:
+        raise ValidationFailed(str(e))
+
+
+def error_response(status_code, message, headers=None):
+    body = AgentResponse(status="error", message=message)
+    return JSONResponse(status_code=status_code, content=body.model_dump(exclude_none=True), headers=headers)
+
+
+def create_app(agent=None, name="agent", admission=None):
+    """Build the FastAPI app for one agent.
+
+    `agent` provides `execute(payload)` and may provide `stream(payload)`
+    (async iterator of (event, data)) and `batch(payload)`; the matching
+    /run, /run/stream and /run/batch routes are registered for whichever
+    exist. Optional async `startup()` and `shutdown()` run in the lifespan,
+    for background work such as cache warmers. Every run route goes through `admission`, so excess load is
+    queued briefly, per priority class, and then shed with 429/503 plus
+    Retry-After instead of piling up behind the model.
+    """
+    configure_logging()
+    state = {"ready": False, "in_flight": 0}
+    admission = admission or AdmissionController(name)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await http_pool.startup()
+        if hasattr(agent, "startup"):
+            await agent.startup()
+        state["ready"] = True
+        logger.info(f"{name} ready")
+        try:
+            yield
+        finally:
+            # Stop advertising readiness, then let in-flight work drain.
+            state["ready"] = False
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + SHUTDOWN_GRACE_SECONDS
+            while state["in_flight"] and loop.time() < deadline:
+                await asyncio.sleep(0.1)
+            if state["in_flight"]:
+                logger.warning(f"{name} shutting down with {state['in_flight']} requests in flight")
+            if hasattr(agent, "shutdown"):
+                await agent.shutdown()
+            await http_pool.shutdown()
+
+    app = FastAPI(title=name, lifespan=lifespan)
+
+    async def read_payload(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            raise ValidationFailed("Request body is not valid JSON")
+        return parse_agent_request(body)
+
+    @app.exception_handler(ValidationFailed)
+    async def validation_failed(request, exc):
+        return error_response(422, str(exc))
+
+    @app.exception_handler(AdmissionRejected)
+    async def admission_rejected(request, exc):
+        logger.warning(f"{name} shed a request with {exc.status_code}: {exc}")
+        return error_response(exc.status_code, str(exc), headers={"Retry-After": str(exc.retry_after)})
 
     @app.get("/")
     def root():
-        return {"message": "Hello from the agent server"}
+        return {"message": f"Hello from the {name} server"}
+
+    @app.get("/healthz")
+    def healthz():
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    def readyz():
+        if not state["ready"]:
+            return JSONResponse(status_code=503, content={"status": "not ready"})
+        return {"status": "ready", "in_flight": state["in_flight"]}
+
+    @app.get("/stats")
+    def stats():
+        return {
+            "http_pool": pool_stats(),
+            "retries": retry_stats(),
+            "circuits": breaker_stats(),
+            "sessions": session_stats(),
+            "response_cache": cache_stats(),
+            "coalescing": flight_stats(),
+            "insights": insight_stats(),
+            "listings": listing_stats(),
+            "geo": geo_stats(),
+            "admission": admission.snapshot(),
+            "parser": parser_stats(),
+            "prompts": prompt_stats(),
+            "rate_limit": rate_limit_stats(),
+            "logging": logging_stats(),
+            "in_flight": state["in_flight"],
+        }
+
+    @app.get("/metrics")
+    def prometheus_metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    if agent is None:
+        return app
+
+    app.state.agent = agent
+
+    async def traced(request, route, call):
+        agent_request = await read_payload(request)
+        priority = request_priority(admission, agent_request, request, route)
+        with request_trace(name, route, request.headers.get(TRACE_HEADER), priority) as trace:
+            async with admission.admit(priority) as waited:
+                record("queue_wait", waited)
+                state["in_flight"] += 1
+                try:
+                    result = await call(agent_request.data)
+                finally:
+                    state["in_flight"] -= 1
+            with span("serialize"):
+                return JSONResponse(jsonable_encoder(result), headers={TRACE_HEADER: trace.trace_id})
 
-    if agent:
-        app.state.agent = agent
+    @app.post("/run")
+    async def run(request: Request):
+        return await traced(request, "run", agent.execute)
+
+    if hasattr(agent, "stream"):
+        @app.post("/run/stream")
+        async def run_stream(request: Request):
+            agent_request = await read_payload(request)
+            priority = request_priority(admission, agent_request, request, "stream")
+            # Admit before the response starts so a rejection is still a
+            # plain 429/503; the slot is held until the stream ends.
+            trace_id = request.headers.get(TRACE_HEADER) or new_trace_id()
+            slot = AsyncExitStack()
+            waited = await slot.enter_async_context(admission.admit(priority))
+
+            async def events():
+                state["in_flight"] += 1
+                try:
+                    with request_trace(name, "stream", trace_id, priority):
+                        record("queue_wait", waited)
+                        async for item in agent.stream(agent_request.data):
+                            yield item
+                finally:
+                    state["in_flight"] -= 1
+                    await slot.aclose()
+
+            response = sse_response(events(), background=BackgroundTask(slot.aclose))
+            response.headers[TRACE_HEADER] = trace_id
+            return response
+
+    if hasattr(agent, "batch"):
+        @app.post("/run/batch")
+        async def run_batch(request: Request):
+            return await traced(request, "batch", agent.batch)
 
     return app
+
+
+def serve(app_path, port):
+    """Run an agent app under uvicorn with the env-configured worker settings.
+
+    `app_path` is the "module:attribute" import string, which uvicorn needs
+    to start more than one worker process.
+    """
+    import uvicorn
+
+    uvicorn.run(
+        app_path,
+        host=HOST,
+        port=int(os.getenv("AGENT_PORT", port)),
+        workers=None if RELOAD else WORKERS,
+        reload=RELOAD,
+        timeout_graceful_shutdown=int(SHUTDOWN_GRACE_SECONDS),
+        timeout_keep_alive=KEEP_ALIVE_SECONDS,
+    )
@@ -0,0 +1,208 @@
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Admission settings (env overridable)
+# ---------------------------
+MAX_IN_FLIGHT = int(os.getenv("AGENT_MAX_IN_FLIGHT", "8"))
+MAX_QUEUE = int(os.getenv("AGENT_MAX_QUEUE", "32"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("AGENT_QUEUE_TIMEOUT", "10"))
+# Priority classes and their weights; queued requests are dispatched
+# weighted-fair across classes. AGENT_MAX_QUEUE_<CLASS> and
+# AGENT_QUEUE_TIMEOUT_<CLASS> override the queue settings for one class.
+PRIORITY_WEIGHTS = os.getenv("AGENT_PRIORITY_WEIGHTS", "interactive=8,batch=1")
+DEFAULT_PRIORITY = os.getenv("AGENT_DEFAULT_PRIORITY", "interactive")
+WAIT_SAMPLES = 512
+
+
+def _parse_weights(text):
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() and weight.strip():
+            weights[name.strip()] = float(weight)
+    if not weights or min(weights.values()) <= 0:
+        raise ValueError(f"AGENT_PRIORITY_WEIGHTS needs positive weights: {text}")
+    return weights
+
+
+def _class_setting(env_name, priority, default, cast):
+    return cast(os.getenv(f"{env_name}_{priority.upper()}", default))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; maps to an HTTP status."""
+
+    def __init__(self, status_code, message, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency with bounded, weighted-fair wait queues.
+
+    At most `max_in_flight` requests run at once. Each priority class has
+    its own queue of up to `max_queue` waiters; a full queue is rejected at
+    once with 429, and a request that waits longer than `queue_timeout` is
+    rejected with 503. A freed slot goes to the class that has had the
+    least of its weighted share (stride scheduling), so with the default
+    weights interactive requests get 8 of every 9 slots while batch work
+    keeps draining at the rest.
+    """
+
+    def __init__(self, name, max_in_flight=MAX_IN_FLIGHT, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT_SECONDS,
+                 weights=None, default_priority=DEFAULT_PRIORITY):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.weights = weights if weights is not None else _parse_weights(PRIORITY_WEIGHTS)
+        if default_priority not in self.weights:
+            raise ValueError(f"Default priority {default_priority!r} is not one of {sorted(self.weights)}")
+        self.default_priority = default_priority
+        self.max_queue = {p: _class_setting("AGENT_MAX_QUEUE", p, max_queue, int) for p in self.weights}
+        self.queue_timeout = {p: _class_setting("AGENT_QUEUE_TIMEOUT", p, queue_timeout, float) for p in self.weights}
+        self.in_flight = 0
+        self._queues = {p: deque() for p in self.weights}
+        # Stride scheduling: each class's pass advances by 1/weight per slot
+        # granted; the class with the lowest pass goes next.
+        self._pass = {p: 0.0 for p in self.weights}
+        self._virtual_time = 0.0
+        self._wait_ms = {p: deque(maxlen=WAIT_SAMPLES) for p in self.weights}
+        self._service_seconds = 1.0  # moving average, seeds Retry-After
+        self.stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+        self.class_stats = {p: {"admitted": 0, "queued": 0, "rejected": 0} for p in self.weights}
+
+    @property
+    def queue_depth(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def priority(self, value=None):
+        """The priority class for a requested value; None gives the default."""
+        if value is None:
+            return self.default_priority
+        if value not in self.weights:
+            raise ValueError(f"Unknown priority {value!r}; expected one of {sorted(self.weights)}")
+        return value
+
+    def retry_after(self, priority=None):
+        """Seconds until a slot is likely free, for the Retry-After header."""
+        priority = priority or self.default_priority
+        # A backlogged class is guaranteed at least its weighted share of the slots.
+        share = self.weights[priority] / sum(self.weights.values())
+        backlog = (len(self._queues[priority]) + 1) / max(1, self.max_in_flight * share)
+        return max(1, math.ceil(backlog * self._service_seconds))
+
+    async def _acquire(self, priority):
+        if self.in_flight < self.max_in_flight and not self.queue_depth:
+            self.in_flight += 1
+            return 0.0
+        queue = self._queues[priority]
+        if len(queue) >= self.max_queue[priority]:
+            self.stats["rejected_queue_full"] += 1
+            self.class_stats[priority]["rejected"] += 1
+            raise AdmissionRejected(
+                429, f"{self.name} is at capacity; {priority} queue is full", self.retry_after(priority)
+            )
+
+        if not queue:
+            # A class that was idle rejoins at the current virtual time, so it
+            # cannot claim the slots it did not use.
+            self._pass[priority] = max(self._pass[priority], self._virtual_time)
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self.stats["queued"] += 1
+        self.class_stats[priority]["queued"] += 1
+        start = time.monotonic()
+        timeout = self.queue_timeout[priority]
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter, priority):
+                return time.monotonic() - start  # the slot arrived just as we timed out
+            self.stats["rejected_timeout"] += 1
+            self.class_stats[priority]["rejected"] += 1
+            raise AdmissionRejected(
+                503, f"{self.name} {priority} queue wait exceeded {timeout}s", self.retry_after(priority)
+            )
+        except asyncio.CancelledError:
+            if not self._abandon(waiter, priority):
+                self._release()
+            raise
+        return time.monotonic() - start
+
+    def _abandon(self, waiter, priority):
+        """Withdraw a queued waiter; returns False if it was already granted a slot."""
+        if waiter.done():
+            return False
+        waiter.cancel()
+        try:
+            self._queues[priority].remove(waiter)
+        except ValueError:
+            pass
+        return True
+
+    def _next_waiter(self):
+        while True:
+            backlogged = [p for p, queue in self._queues.items() if queue]
+            if not backlogged:
+                return None
+            priority = min(backlogged, key=lambda p: (self._pass[p], -self.weights[p]))
+            waiter = self._queues[priority].popleft()
+            if waiter.done():
+                continue
+            self._virtual_time = self._pass[priority]
+            self._pass[priority] += 1 / self.weights[priority]
+            return waiter
+
+    def _release(self):
+        # Hand the slot straight to the next waiter, if any.
+        waiter = self._next_waiter()
+        if waiter is not None:
+            waiter.set_result(None)
+        else:
+            self.in_flight -= 1
+
+    @asynccontextmanager
+    async def admit(self, priority=None):
+        """Hold a slot for the body of the block; yields the seconds spent queued."""
+        priority = self.priority(priority)
+        waited = await self._acquire(priority)
+        self.stats["admitted"] += 1
+        self.class_stats[priority]["admitted"] += 1
+        self._wait_ms[priority].append(waited * 1000)
+        start = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * (time.monotonic() - start)
+            self._release()
+
+    def snapshot(self):
+        classes = {}
+        for priority, samples in self._wait_ms.items():
+            waits = sorted(samples)
+            classes[priority] = {
+                **self.class_stats[priority],
+                "weight": self.weights[priority],
+                "queue_depth": len(self._queues[priority]),
+                "wait_ms_p95": round(waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0,
+            }
+        waits = sorted(w for samples in self._wait_ms.values() for w in samples)
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "wait_ms_avg": round(sum(waits) / len(waits), 1) if waits else 0.0,
+            "wait_ms_p95": round(waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0,
+            "wait_ms_max": round(waits[-1], 1) if waits else 0.0,
+            "classes": classes,
+        }
@@ -0,0 +1,111 @@
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Breaker settings (env overridable)
+# ---------------------------
+FAILURE_THRESHOLD = int(os.getenv("A2A_BREAKER_FAILURE_THRESHOLD", "5"))
+COOLDOWN_SECONDS = float(os.getenv("A2A_BREAKER_COOLDOWN", "15"))
+HALF_OPEN_PROBES = int(os.getenv("A2A_BREAKER_HALF_OPEN_PROBES", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures.
+
+    While open every call is refused. After `cooldown` seconds the breaker
+    goes half-open and lets `half_open_probes` calls through; a successful
+    probe closes it again, a failed one re-opens it for another cool-down.
+    """
+
+    def __init__(
+        self,
+        name,
+        failure_threshold=FAILURE_THRESHOLD,
+        cooldown=COOLDOWN_SECONDS,
+        half_open_probes=HALF_OPEN_PROBES,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.half_open_probes = half_open_probes
+        self._state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        if self._state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state):
+        if state != self._state:
+            logger.warning(f"Circuit for {self.name}: {self._state} -> {state}")
+        self._state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        if state != CLOSED:
+            self.probes_in_flight = 0
+
+    def allow(self):
+        """Return True if a call may go out now. Call record_* afterwards."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self.probes_in_flight < self.half_open_probes:
+            self.probes_in_flight += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        if self._state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._transition(OPEN)
+
+    def release(self):
+        """Give back a half-open probe slot when the call was abandoned."""
+        if self._state == HALF_OPEN and self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+_breakers = {}
+
+
+def breaker_for(url):
+    breaker = _breakers.get(url)
+    if breaker is None:
+        breaker = _breakers[url] = CircuitBreaker(url)
+    return breaker
+
+
+def circuit_state(url):
+    return breaker_for(url).state
+
+
+def breaker_stats():
+    return {url: breaker.snapshot() for url, breaker in _breakers.items()}
@@ -0,0 +1,229 @@
+"""
+Locality gazetteer and proximity lookups.
+
+Localities and their coordinates are loaded from a local CSV
+(GEO_LOCALITIES_PATH) and bucketed into a grid of roughly GEO_CELL_KM square
+cells, so radius and nearest-neighbour queries only measure the points in
+the cells around the query. Free-text locations are matched to a locality
+on word n-grams, as the rate table does; when no locality matches, the city
+comes from the rate table.
+"""
+from collections import defaultdict
+from functools import lru_cache
+import csv
+import logging
+import math
+import os
+import re
+import time
+
+import numpy as np
+
+from common import valuation
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Geo settings (env overridable)
+# ---------------------------
+LOCALITIES_PATH = os.getenv(
+    "GEO_LOCALITIES_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "shared", "data", "localities.csv"),
+)
+CELL_KM = float(os.getenv("GEO_CELL_KM", "5"))
+NEIGHBOR_RADIUS_KM = float(os.getenv("GEO_NEIGHBOR_RADIUS_KM", "8"))
+NEIGHBOR_COUNT = int(os.getenv("GEO_NEIGHBOR_COUNT", "5"))
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+MAX_NGRAM = 3
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _words(text):
+    return _WORD_RE.findall(str(text).lower())
+
+
+def locality_key(name):
+    """Canonical form of a locality name, as gazetteer entries are keyed."""
+    return " ".join(_words(name))
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from one point to arrays of points."""
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """Points bucketed into square lat/lon cells of about cell_km a side."""
+
+    def __init__(self, lats, lons, cell_km=CELL_KM):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.cell_km = cell_km
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        cells = defaultdict(list)
+        for i, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            cells[self._cell(lat, lon)].append(i)
+        self.cells = {cell: np.array(points, dtype=np.int64) for cell, points in cells.items()}
+        keys = np.array(list(self.cells) or [(0, 0)])
+        self._bounds = keys.min(axis=0), keys.max(axis=0)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _gather(self, cells):
+        found = [self.cells[cell] for cell in cells if cell in self.cells]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def _measured(self, lat, lon, points):
+        """(points, distances) sorted nearest first."""
+        distances = haversine_km(lat, lon, self.lats[points], self.lons[points])
+        order = np.argsort(distances, kind="stable")
+        return points[order], distances[order]
+
+    def within(self, lat, lon, radius_km):
+        """(points, distances) within radius_km, nearest first."""
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        i0, j0 = self._cell(lat - dlat, lon - dlon)
+        i1, j1 = self._cell(lat + dlat, lon + dlon)
+        points = self._gather((i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1))
+        points, distances = self._measured(lat, lon, points)
+        keep = distances <= radius_km
+        return points[keep], distances[keep]
+
+    def nearest(self, lat, lon, k):
+        """(points, distances) of the k nearest points, nearest first.
+
+        Rings of cells are added around the query cell until the k-th
+        nearest point found is closer than anything an outer ring could hold.
+        """
+        ci, cj = self._cell(lat, lon)
+        (min_i, min_j), (max_i, max_j) = self._bounds
+        reach = max(abs(ci - min_i), abs(ci - max_i), abs(cj - min_j), abs(cj - max_j))
+        found = []
+        for ring in range(reach + 1):
+            if ring == 0:
+                cells = [(ci, cj)]
+            else:
+                cells = [(ci + di, cj + dj) for di in range(-ring, ring + 1) for dj in (-ring, ring)]
+                cells += [(ci + di, cj + dj) for di in (-ring, ring) for dj in range(-ring + 1, ring)]
+            found.append(self._gather(cells))
+            points, distances = self._measured(lat, lon, np.concatenate(found))
+            # Anything outside this ring is at least `ring` whole cells away.
+            outside_km = ring * self.cell_km * math.cos(math.radians(min(89.0, abs(lat) + ring * self.cell_deg)))
+            if len(points) >= k and distances[k - 1] <= outside_km:
+                break
+        return points[:k], distances[:k]
+
+
+class Gazetteer:
+    """Named localities with coordinates, matched from free text."""
+
+    def __init__(self, rows, cell_km=CELL_KM):
+        names, labels, cities, lats, lons = [], [], [], [], []
+        self.index = {}
+        for row in rows:
+            name = locality_key(row["name"])
+            if not name or name in self.index:
+                continue
+            self.index[name] = len(names)
+            names.append(name)
+            labels.append((row["name"].strip(), row["city"].strip()))
+            cities.append(" ".join(_words(row["city"])))
+            lats.append(float(row["lat"]))
+            lons.append(float(row["lon"]))
+        self.names = names
+        self.labels = labels  # (locality, city) as written in the file, for display
+        self.cities = cities
+        self.grid = GridIndex(lats, lons, cell_km)
+        self.locate = lru_cache(maxsize=65536)(self._locate)
+
+    @classmethod
+    def load(cls, path=LOCALITIES_PATH):
+        with open(path, newline="", encoding="utf-8") as f:
+            gazetteer = cls(csv.DictReader(f))
+        logger.info(f"Loaded {len(gazetteer.names)} localities from {path}")
+        return gazetteer
+
+    def _locate(self, location):
+        """Index of the locality named in a free-text location (longest match), or None."""
+        tokens = _words(location)
+        for n in range(min(MAX_NGRAM, len(tokens)), 0, -1):
+            for i in range(len(tokens) - n + 1):
+                found = self.index.get(" ".join(tokens[i:i + n]))
+                if found is not None:
+                    return found
+        return None
+
+    def place(self, i, distance_km=None):
+        name, city = self.labels[i]
+        place = {
+            "name": name,
+            "city": city,
+            "lat": float(self.grid.lats[i]),
+            "lon": float(self.grid.lons[i]),
+        }
+        if distance_km is not None:
+            place["distance_km"] = round(float(distance_km), 1)
+        return place
+
+
+@lru_cache(maxsize=1)
+def gazetteer():
+    """The process-wide gazetteer, loaded on first use."""
+    return Gazetteer.load()
+
+
+stats = {"lookups": 0, "lookup_seconds": 0.0}
+
+
+def resolve_location(location):
+    """(locality, city) canonical names for a free-text location; "" where unknown.
+
+    A gazetteer locality wins; otherwise the rate table decides.
+    """
+    places = gazetteer()
+    found = places.locate(str(location))
+    if found is not None:
+        return places.names[found], places.cities[found]
+    return valuation.resolve_location(location)
+
+
+def nearby(location, radius_km=NEIGHBOR_RADIUS_KM, limit=NEIGHBOR_COUNT):
+    """Localities within radius_km of the one named in `location`, nearest
+    first and not including it; [] when no locality is recognised."""
+    start = time.perf_counter()
+    places = gazetteer()
+    found = places.locate(str(location))
+    result = []
+    if found is not None:
+        points, distances = places.grid.within(places.grid.lats[found], places.grid.lons[found], radius_km)
+        result = [places.place(p, d) for p, d in zip(points, distances) if p != found][:limit]
+    stats["lookups"] += 1
+    stats["lookup_seconds"] += time.perf_counter() - start
+    return result
+
+
+def nearest(lat, lon, k=NEIGHBOR_COUNT):
+    """The k localities nearest a coordinate."""
+    places = gazetteer()
+    points, distances = places.grid.nearest(lat, lon, k)
+    return [places.place(p, d) for p, d in zip(points, distances)]
+
+
+def geo_stats():
+    lookups = stats["lookups"]
+    return {
+        "localities": len(gazetteer().names),
+        "lookups": lookups,
+        "lookup_us_avg": round(stats["lookup_seconds"] / lookups * 1e6, 1) if lookups else 0.0,
+    }
@@ -0,0 +1,19 @@
+"""
+Gunicorn settings for running any agent app with several worker processes:
+
+    gunicorn -c common/gunicorn_conf.py agents.buyer_agent.__main__:app
+
+Every value can be overridden with the same AGENT_* variables `serve()` reads.
+"""
+import multiprocessing
+import os
+
+bind = f"{os.getenv('AGENT_HOST', '127.0.0.1')}:{os.getenv('AGENT_PORT', '8000')}"
+workers = int(os.getenv("AGENT_WORKERS", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+graceful_timeout = int(float(os.getenv("AGENT_SHUTDOWN_GRACE_SECONDS", "20")))
+keepalive = int(os.getenv("AGENT_KEEP_ALIVE_SECONDS", "30"))
+# LLM calls are slow; only kill a worker that has been silent far longer than one generation.
+timeout = int(os.getenv("AGENT_WORKER_TIMEOUT", "120"))
+max_requests = int(os.getenv("AGENT_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("AGENT_MAX_REQUESTS_JITTER", "0"))
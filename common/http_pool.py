@@ -0,0 +1,131 @@
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from httpx import AsyncClient, Limits
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Pool settings (env overridable)
+# ---------------------------
+MAX_CONNECTIONS = int(os.getenv("A2A_POOL_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("A2A_POOL_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("A2A_POOL_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("A2A_HTTP2", "0").lower() in ("1", "true", "yes")
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ClientPool:
+    """Long-lived httpx clients, one keep-alive pool per downstream host."""
+
+    def __init__(
+        self,
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        http2=HTTP2_ENABLED,
+    ):
+        self.limits = Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        if http2 and not _http2_available():
+            logger.warning("A2A_HTTP2 is set but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self._clients = {}
+        self._lock = asyncio.Lock()
+        self.stats = {
+            "pool_hits": 0,
+            "pool_misses": 0,
+            "requests": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+        }
+
+    @staticmethod
+    def _host_key(url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    async def get(self, url):
+        key = self._host_key(url)
+        client = self._clients.get(key)
+        if client is not None and not client.is_closed:
+            self.stats["pool_hits"] += 1
+            return client
+        async with self._lock:
+            client = self._clients.get(key)
+            if client is None or client.is_closed:
+                self.stats["pool_misses"] += 1
+                client = AsyncClient(limits=self.limits, http2=self.http2)
+                self._clients[key] = client
+            else:
+                self.stats["pool_hits"] += 1
+        return client
+
+    async def post(self, url, **kwargs):
+        """POST through the pooled client, counting new vs reused connections."""
+        client = await self.get(url)
+        opened = False
+
+        async def trace(event_name, info):
+            nonlocal opened
+            if event_name == "connection.connect_tcp.started":
+                opened = True
+
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = trace
+        response = await client.post(url, extensions=extensions, **kwargs)
+        self.stats["requests"] += 1
+        if opened:
+            self.stats["connections_opened"] += 1
+        else:
+            self.stats["connections_reused"] += 1
+        return response
+
+    async def close(self):
+        async with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+    def snapshot(self):
+        return {**self.stats, "hosts": len(self._clients), "http2": self.http2}
+
+
+# Process-wide pool shared by every call_agent
+pool = ClientPool()
+
+
+def pool_stats():
+    return pool.snapshot()
+
+
+async def startup():
+    logger.info(f"A2A client pool ready (http2={pool.http2}, limits={pool.limits})")
+
+
+async def shutdown():
+    await pool.close()
+    logger.info(f"A2A client pool closed: {pool.snapshot()}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """FastAPI lifespan that opens and drains the shared client pool."""
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
@@ -0,0 +1,216 @@
+"""
+Precomputed neighborhood insights.
+
+Neighborhood facts (safety, schools, amenities, connectivity) change slowly,
+so results are kept per canonical locality in a local SQLite file and
+mirrored in memory; a lookup is a dict read. A background warmer keeps the
+most requested localities (seeded with the rate table's localities)
+generated, and regenerates entries in the last part of their TTL so popular
+ones never expire in front of a user. Workers sharing the file claim an
+entry in SQLite before generating it, so each is generated once, not once
+per worker.
+"""
+from collections import Counter
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Insight store settings (env overridable)
+# ---------------------------
+STORE_PATH = os.getenv("INSIGHT_STORE_PATH", ".cache/insights.sqlite3")
+INSIGHT_TTL = float(os.getenv("INSIGHT_TTL", str(7 * 86400)))  # seconds
+# Entries are regenerated once less than this share of their TTL remains
+REFRESH_AHEAD = float(os.getenv("INSIGHT_REFRESH_AHEAD", "0.2"))
+WARMER = os.getenv("INSIGHT_WARMER", "on")  # "off" serves stored entries without precomputing
+WARM_TOP_N = int(os.getenv("INSIGHT_WARM_TOP_N", "20"))
+WARM_INTERVAL = float(os.getenv("INSIGHT_WARM_INTERVAL", "60"))  # seconds between warmer passes
+WARM_PAUSE = float(os.getenv("INSIGHT_WARM_PAUSE", "1"))  # seconds between generations in a pass
+# How long a worker's claim on an entry lasts before another worker may retry it
+CLAIM_SECONDS = float(os.getenv("INSIGHT_CLAIM_SECONDS", "300"))
+
+
+class InsightStore:
+    """Insights keyed by canonical locality, persisted to SQLite.
+
+    Every lookup, hit or miss, counts towards the key's popularity; counts
+    are written back by `flush()`, which the warmer calls each pass. Rows
+    without a value record demand for localities not generated yet. SQLite
+    work outside __init__ runs in a worker thread.
+    """
+
+    def __init__(self, name, path=STORE_PATH, ttl=INSIGHT_TTL):
+        self.name = name
+        self.ttl = ttl
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS insights ("
+            " kind TEXT NOT NULL, key TEXT NOT NULL, location TEXT NOT NULL, value TEXT,"
+            " expires_at REAL NOT NULL DEFAULT 0, hits INTEGER NOT NULL DEFAULT 0,"
+            " refreshing_until REAL NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (kind, key))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(insights)")}
+        if "refreshing_until" not in columns:
+            self._conn.execute("ALTER TABLE insights ADD COLUMN refreshing_until REAL NOT NULL DEFAULT 0")
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (expires_at, value)
+        self._lookups = Counter()  # key -> lookups not yet flushed
+        self._locations = {}  # key -> display location for unflushed keys
+        self.stats = {
+            "hits": 0, "misses": 0, "expired": 0, "stored": 0,
+            "refreshed": 0, "refresh_errors": 0, "claimed_elsewhere": 0,
+        }
+        self._entries = self._read_entries()
+        _stores[name] = self
+
+    def _read_entries(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value, expires_at FROM insights WHERE kind = ? AND value IS NOT NULL", (self.name,)
+            ).fetchall()
+        return {key: (expires_at, json.loads(value)) for key, value, expires_at in rows}
+
+    async def reload(self):
+        """Re-read stored values, picking up entries other workers generated."""
+        self._entries = await asyncio.to_thread(self._read_entries)
+
+    def get(self, key, location):
+        self._lookups[key] += 1
+        self._locations.setdefault(key, location)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if entry[0] < time.time():
+            self.stats["expired"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry[1]
+
+    async def put(self, key, location, value):
+        expires_at = time.time() + self.ttl
+        self._entries[key] = (expires_at, value)
+        await asyncio.to_thread(self._write_value, key, location, json.dumps(value), expires_at)
+        self.stats["stored"] += 1
+
+    def _write_value(self, key, location, value, expires_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO insights (kind, key, location, value, expires_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (kind, key) DO UPDATE SET"
+                " value = excluded.value, expires_at = excluded.expires_at, refreshing_until = 0",
+                (self.name, key, location, value, expires_at),
+            )
+
+    async def flush(self):
+        """Write accumulated lookup counts."""
+        lookups, self._lookups = self._lookups, Counter()
+        locations, self._locations = self._locations, {}
+        if not lookups:
+            return
+        rows = [(self.name, key, locations.get(key, key), count) for key, count in lookups.items()]
+        await asyncio.to_thread(self._write_hits, rows)
+
+    def _write_hits(self, rows):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO insights (kind, key, location, hits) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (kind, key) DO UPDATE SET hits = hits + excluded.hits",
+                rows,
+            )
+
+    async def claim(self, key, location):
+        """Take the job of (re)generating `key`; False if another worker holds
+        it or has already refreshed it."""
+        return await asyncio.to_thread(self._claim, key, location)
+
+    def _claim(self, key, location):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO insights (kind, key, location) VALUES (?, ?, ?) ON CONFLICT (kind, key) DO NOTHING",
+                (self.name, key, location),
+            )
+            claimed = self._conn.execute(
+                "UPDATE insights SET refreshing_until = ?"
+                " WHERE kind = ? AND key = ? AND refreshing_until < ? AND (value IS NULL OR expires_at < ?)",
+                (now + CLAIM_SECONDS, self.name, key, now, now + self.ttl * REFRESH_AHEAD),
+            ).rowcount
+        return claimed == 1
+
+    def _top(self, top_n):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, location FROM insights WHERE kind = ? ORDER BY hits DESC LIMIT ?",
+                (self.name, top_n),
+            ).fetchall()
+
+    async def due(self, top_n, seeds=()):
+        """(key, location) of the top-N localities that are missing or close to expiry.
+
+        Popularity comes from recorded lookups; seed localities fill the
+        list while there is not enough traffic to rank.
+        """
+        candidates = dict(await asyncio.to_thread(self._top, top_n))
+        for key, location in seeds:
+            if len(candidates) >= top_n:
+                break
+            candidates.setdefault(key, location)
+        refresh_at = time.time() + self.ttl * REFRESH_AHEAD
+        return [
+            (key, location) for key, location in candidates.items()
+            if key not in self._entries or self._entries[key][0] < refresh_at
+        ]
+
+    def snapshot(self):
+        return {**self.stats, "entries": len(self._entries), "ttl": self.ttl}
+
+
+async def run_warmer(store, generate, seeds=(), top_n=WARM_TOP_N, interval=WARM_INTERVAL):
+    """Keep the store's top localities generated until cancelled.
+
+    `generate(location)` returns the agent's result dict; only successful
+    results are stored.
+    """
+    while True:
+        try:
+            await store.flush()
+            await store.reload()
+            due = await store.due(top_n, seeds)
+            if due:
+                logger.info(f"Warming {len(due)} {store.name} insights")
+            for key, location in due:
+                if not await store.claim(key, location):
+                    store.stats["claimed_elsewhere"] += 1
+                    continue
+                try:
+                    result = await generate(location)
+                except Exception as e:
+                    logger.warning(f"Could not generate {store.name} insights for {location}: {e}")
+                    result = None
+                if isinstance(result, dict) and result.get("status") == "success":
+                    await store.put(key, location, result)
+                    store.stats["refreshed"] += 1
+                else:
+                    store.stats["refresh_errors"] += 1
+                await asyncio.sleep(WARM_PAUSE)
+        except Exception as e:
+            logger.error(f"{store.name} insight warmer pass failed: {e}")
+        await asyncio.sleep(interval)
+
+
+_stores = {}
+
+
+def insight_stats():
+    return {name: store.snapshot() for name, store in _stores.items()}
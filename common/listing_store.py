@@ -0,0 +1,348 @@
+"""
+Local listing store: the seller agent writes every listing it creates, and
+the buyer agent searches them before asking the model for anything.
+
+Listings live in a local SQLite file shared by the agent processes. A
+reader keeps an in-memory index over them, rebuilt when another process
+has added rows (checked at most every LISTING_REFRESH_SECONDS):
+
+- hash indexes from locality, city and property type to row positions
+- price and size sorted arrays, so a range is two binary searches
+- an inverted index from feature/title words to row positions
+
+A search narrows by budget, type and size, then by location: the locality
+first, widening to neighbouring localities (common.geo) and then the whole
+city while there are too few. Survivors are ranked on how close their
+location matched, requirement words matched and closeness to budget.
+
+The methods are synchronous and thread-safe; agents call them through
+asyncio.to_thread so neither SQLite nor an index rebuild blocks the loop.
+"""
+from collections import defaultdict
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from common.geo import locality_key, nearby, resolve_location
+from common.valuation import PROPERTY_TYPES
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Listing store settings (env overridable)
+# ---------------------------
+STORE_PATH = os.getenv("LISTING_STORE_PATH", ".cache/listings.sqlite3")
+REFRESH_SECONDS = float(os.getenv("LISTING_REFRESH_SECONDS", "2"))
+BUDGET_SLACK = float(os.getenv("LISTING_BUDGET_SLACK", "0.1"))  # allow up to 10% over budget
+BUDGET_FLOOR = float(os.getenv("LISTING_BUDGET_FLOOR", "0.5"))  # ignore listings under half the budget
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {"a", "an", "and", "the", "of", "in", "on", "to", "with", "for", "near", "or", "is", "at", "by"}
+
+
+def _words(text):
+    return [w for w in _WORD_RE.findall(str(text).lower()) if w not in STOP_WORDS]
+
+
+def _number(value):
+    try:
+        number = float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 and np.isfinite(number) else None
+
+
+def _type_code(property_type):
+    return PROPERTY_TYPES.get(str(property_type or "").strip().lower(), 0)
+
+
+def nearby_keys(location):
+    """Canonical names of the localities around a location, nearest first."""
+    return [locality_key(place["name"]) for place in nearby(location)]
+
+
+def _fingerprint(listing):
+    parts = (" ".join(_words(listing["title"])), " ".join(_words(listing["location"])),
+             str(_number(listing.get("price"))), str(_number(listing.get("size_sqft"))))
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class ListingStore:
+    """Listings persisted to SQLite, with an in-memory index for search.
+
+    Writers only insert; the index is loaded by `load()` at startup or on
+    the first search, so a process that only writes (the seller) never
+    builds it. Searches and index updates take turns. Searchers count
+    in "answered" the requests the store served alone and in "gaps_filled"
+    those the model had to complete.
+    """
+
+    def __init__(self, name, path=STORE_PATH, refresh_seconds=REFRESH_SECONDS):
+        self.name = name
+        self.refresh_seconds = refresh_seconds
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            " id INTEGER PRIMARY KEY, fingerprint TEXT NOT NULL UNIQUE,"
+            " title TEXT NOT NULL, description TEXT NOT NULL, location TEXT NOT NULL,"
+            " locality TEXT NOT NULL, city TEXT NOT NULL, property_type TEXT NOT NULL,"
+            " price INTEGER NOT NULL, size_sqft REAL, features TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()  # index updates and the searches reading it
+        self._loaded = False
+        self._last_id = 0
+        self._data_version = None
+        self._checked_at = 0.0
+        self._listings = []
+        self._locality_lists = defaultdict(list)
+        self._city_lists = defaultdict(list)
+        self._type_lists = defaultdict(list)
+        self._term_lists = defaultdict(list)
+        self._arrays = {"locality": {}, "city": {}, "type": {}, "term": {}}
+        self._by_locality, self._by_city = self._arrays["locality"], self._arrays["city"]
+        self._by_type, self._by_term = self._arrays["type"], self._arrays["term"]
+        self._prices = np.empty(0, dtype=np.float64)
+        self._sizes = np.empty(0, dtype=np.float64)
+        self.stats = {"added": 0, "duplicates": 0, "searches": 0, "matched": 0, "reloads": 0,
+                      "answered": 0, "gaps_filled": 0, "search_ms": 0.0}
+        _stores[name] = self
+
+    # ---------------------------
+    # Writing
+    # ---------------------------
+    def add(self, listing):
+        """Store one listing; returns its id, or None if it was already stored.
+
+        `listing` has title, description, price, location, size_sqft,
+        property_type and features.
+        """
+        price = _number(listing.get("price"))
+        if price is None:
+            raise ValueError(f"Listing has no usable price: {listing.get('price')!r}")
+        locality, city = resolve_location(listing["location"])
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO listings (fingerprint, title, description, location, locality, city,"
+                " property_type, price, size_sqft, features, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    _fingerprint(listing), listing["title"], listing.get("description") or "", listing["location"],
+                    locality, city, listing.get("property_type") or "Other", int(price),
+                    _number(listing.get("size_sqft")), json.dumps(listing.get("features") or []), time.time(),
+                ),
+            )
+        if not cursor.rowcount:
+            self.stats["duplicates"] += 1
+            return None
+        self._checked_at = 0.0  # data_version only moves for other connections' writes
+        self._data_version = None
+        self.stats["added"] += 1
+        return cursor.lastrowid
+
+    # ---------------------------
+    # Index
+    # ---------------------------
+    async def load(self):
+        """Build the index now, off the event loop, rather than on the first search."""
+        await asyncio.to_thread(len, self)
+
+    def _refresh(self):
+        """Index rows added since the last load, if any other connection has written."""
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < self.refresh_seconds:
+            return
+        self._checked_at = now
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._loaded and version == self._data_version:
+                return
+            self._data_version = version
+            rows = self._conn.execute(
+                "SELECT id, title, description, location, locality, city, property_type, price, size_sqft, features"
+                " FROM listings WHERE id > ? ORDER BY id",
+                (self._last_id,),
+            ).fetchall()
+        self._loaded = True
+        if rows:
+            self._index(rows)
+
+    def _index(self, rows):
+        touched = {name: set() for name in ("locality", "city", "type", "term")}
+        lists = {"locality": self._locality_lists, "city": self._city_lists,
+                 "type": self._type_lists, "term": self._term_lists}
+
+        def post(name, key, position):
+            lists[name][key].append(position)
+            touched[name].add(key)
+
+        start = len(self._listings)
+        for row_id, title, description, location, locality, city, property_type, price, size, features in rows:
+            position = len(self._listings)
+            features = json.loads(features)
+            self._listings.append({
+                "id": row_id, "title": title, "description": description, "location": location,
+                "property_type": property_type, "price": price, "size_sqft": size, "features": features,
+            })
+            if locality:
+                post("locality", locality, position)
+            if city:
+                post("city", city, position)
+            post("type", _type_code(property_type), position)
+            for term in set(_words(title)).union(*(_words(f) for f in features)):
+                post("term", term, position)
+            self._last_id = row_id
+
+        # Only the postings that gained rows are converted again.
+        for name, keys in touched.items():
+            arrays = self._arrays[name]
+            for key in keys:
+                arrays[key] = np.array(lists[name][key], dtype=np.int64)
+        added = self._listings[start:]
+        self._prices = np.concatenate([self._prices, np.array([l["price"] for l in added], dtype=np.float64)])
+        self._sizes = np.concatenate([self._sizes, np.array([l["size_sqft"] or np.nan for l in added], dtype=np.float64)])
+        self._price_order = np.argsort(self._prices, kind="stable")
+        self._sorted_prices = self._prices[self._price_order]
+        # NaN sizes sort last and are never inside a size range.
+        self._size_order = np.argsort(self._sizes, kind="stable")
+        self._sorted_sizes = self._sizes[self._size_order]
+        self.stats["reloads"] += 1
+        logger.info(f"{self.name} index holds {len(self._listings)} listings")
+
+    @staticmethod
+    def _range(order, sorted_values, low, high):
+        """Positions whose value is in [low, high], from a sorted array."""
+        start = np.searchsorted(sorted_values, low, side="left")
+        stop = np.searchsorted(sorted_values, high, side="right")
+        return order[start:stop]
+
+    def _location_tiers(self, location):
+        """[(match, positions)] from the closest match outwards: the locality,
+        localities around it, then the rest of the city.
+
+        None when no location was given; an unknown location matches nothing.
+        """
+        empty = np.empty(0, dtype=np.int64)
+        locality, city = resolve_location(location)
+        tiers = []
+        if locality:
+            tiers.append(("locality", self._by_locality.get(locality, empty)))
+            around = [self._by_locality[key] for key in nearby_keys(location) if key in self._by_locality]
+            if around:
+                tiers.append(("nearby", np.concatenate(around)))
+        if city:
+            tiers.append(("city", self._by_city.get(city, empty)))
+        if tiers or _words(location):
+            return tiers
+        return None
+
+    # ---------------------------
+    # Search
+    # ---------------------------
+    def search(self, location=None, budget=None, property_type=None, requirements="",
+               min_size=None, max_size=None, limit=3):
+        """Best `limit` listings for a buyer's preferences, best first.
+
+        Listings in the locality come first; when there are fewer than
+        `limit`, the search widens to neighbouring localities and then to
+        the whole city. Each result is a listing dict with "match"
+        ("locality", "nearby", "city" or None) and "score" added.
+        """
+        with self._index_lock:
+            return self._search(location, budget, property_type, requirements, min_size, max_size, limit)
+
+    def _search(self, location, budget, property_type, requirements, min_size, max_size, limit):
+        start = time.perf_counter()
+        self.stats["searches"] += 1
+        self._refresh()
+        if not self._listings:
+            return []
+
+        count = len(self._listings)
+        mask = np.ones(count, dtype=bool)
+
+        def keep(positions):
+            selected = np.zeros(count, dtype=bool)
+            selected[positions] = True
+            mask[:] &= selected
+
+        budget = _number(budget)
+        if budget:
+            keep(self._range(self._price_order, self._sorted_prices, budget * BUDGET_FLOOR, budget * (1 + BUDGET_SLACK)))
+        type_code = _type_code(property_type)
+        if type_code:
+            keep(self._by_type.get(type_code, np.empty(0, dtype=np.int64)))
+        min_size, max_size = _number(min_size), _number(max_size)
+        if min_size or max_size:
+            keep(self._range(self._size_order, self._sorted_sizes, min_size or 0, max_size or np.inf))
+
+        # tier[p]: how far out position p was found; lower ranks first.
+        tiers = self._location_tiers(location or "")
+        tier = np.full(count, len(tiers or ()), dtype=np.int64)
+        labels = [match for match, _ in tiers or ()] + [None]
+        if tiers is not None:
+            found = np.zeros(count, dtype=bool)
+            for level, (_, positions) in enumerate(tiers):
+                positions = positions[mask[positions] & ~found[positions]]
+                tier[positions] = level
+                found[positions] = True
+                if found.sum() >= limit:
+                    break
+            mask &= found
+
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            self._finish(start, 0)
+            return []
+
+        scores = np.zeros(count, dtype=np.float64)
+        terms = set(_words(requirements))
+        for term in terms:
+            postings = self._by_term.get(term)
+            if postings is not None:
+                scores[postings] += 2.0 / len(terms)
+        if budget:
+            scores += 1.0 - np.minimum(np.abs(self._prices - budget) / budget, 1.0)
+        ranked = candidates[np.lexsort((-scores[candidates], tier[candidates]))][:limit]
+
+        results = [
+            {**self._listings[p], "match": labels[tier[p]], "score": round(float(scores[p]), 3)}
+            for p in ranked
+        ]
+        self._finish(start, len(results))
+        return results
+
+    def _finish(self, start, found):
+        if found:
+            self.stats["matched"] += 1
+        self.stats["search_ms"] += (time.perf_counter() - start) * 1000
+
+    def __len__(self):
+        with self._index_lock:
+            self._refresh()
+            return len(self._listings)
+
+    def snapshot(self):
+        searches = self.stats["searches"]
+        return {
+            **{k: v for k, v in self.stats.items() if k != "search_ms"},
+            "indexed": len(self._listings),
+            "search_ms_avg": round(self.stats["search_ms"] / searches, 3) if searches else 0.0,
+        }
+
+
+_stores = {}
+
+
+def listing_stats():
+    return {name: store.snapshot() for name, store in _stores.items()}
@@ -0,0 +1,227 @@
+"""
+Process-wide logging for the agents.
+
+Records are handed to a queue on the calling thread and formatted and
+written by a background listener, so logging never blocks the event loop.
+Output is one JSON object per line carrying the request's trace ID.
+
+DEBUG detail from the agents' own loggers (request payloads, raw model
+output) is kept for a sample of requests per route, and for any request
+slower than LOG_SLOW_REQUEST_MS, whose held-back detail is written when it
+finishes. Everything else logs at LOG_LEVEL. Payloads logged through
+`LogPayload` are redacted and truncated only for records that are written:
+a record's message is rendered just before it is queued, so the listener
+never reads objects the event loop may still be changing. Held-back detail
+keeps a shallow copy of its arguments and is rendered only if its request
+turns out to be slow.
+"""
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+
+from common import tracing
+
+# ---------------------------
+# Logging settings (env overridable)
+# ---------------------------
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+# Share of requests whose DEBUG detail is logged, per route: "0.01" or "run=0.01,stream=0.05"
+LOG_DETAIL_SAMPLE = os.getenv("LOG_DETAIL_SAMPLE", "0.01")
+LOG_SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", "5000"))  # 0 disables
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
+LOG_REDACT_FIELDS = {
+    f.strip().lower()
+    for f in os.getenv(
+        "LOG_REDACT_FIELDS", "contact,phone,email,seller_id,seller_name,api_key,authorization"
+    ).split(",")
+    if f.strip()
+}
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+DETAIL_LOGGERS = ("agents", "common")
+MAX_DEFERRED_PER_REQUEST = 50
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def _parse_rates(text):
+    rates = {}
+    for part in text.split(","):
+        route, _, rate = part.rpartition("=")
+        if rate.strip():
+            rates[route.strip() or "*"] = float(rate)
+    return rates
+
+
+DETAIL_RATES = _parse_rates(LOG_DETAIL_SAMPLE)
+
+
+# ---------------------------
+# Payload redaction
+# ---------------------------
+def _redact(value):
+    if isinstance(value, dict):
+        return {
+            k: "[redacted]" if str(k).lower() in LOG_REDACT_FIELDS else _redact(v) for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_redact(v) for v in value]
+    return value
+
+
+class LogPayload:
+    """Log argument that redacts and truncates its value when formatted.
+
+        logger.debug("Incoming request: %s", LogPayload(request))
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        value = self.value
+        if isinstance(value, (dict, list, tuple)):
+            text = json.dumps(_redact(value), ensure_ascii=False, default=str)
+        else:
+            text = str(value)
+        if len(text) > LOG_PAYLOAD_MAX_CHARS:
+            text = f"{text[:LOG_PAYLOAD_MAX_CHARS]}... [{len(text) - LOG_PAYLOAD_MAX_CHARS} more chars]"
+        return text
+
+
+# ---------------------------
+# Formatting
+# ---------------------------
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in ("trace_id", "agent", "route"):
+            value = getattr(record, field, None)
+            if value:
+                entry[field] = value
+        if getattr(record, "slow_request", False):
+            entry["slow_request"] = True
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _render(record):
+    """Build the message now, so %-args (and LogPayload) are read once, here."""
+    record.msg = record.getMessage()
+    record.args = None
+    return record
+
+
+def _shallow(value):
+    if isinstance(value, LogPayload):
+        return LogPayload(_shallow(value.value))
+    return copy.copy(value) if isinstance(value, (dict, list, set)) else value
+
+
+def _snapshot(record):
+    """Cheap copy of a held-back record's arguments, rendered later if needed."""
+    if isinstance(record.args, tuple):
+        record.args = tuple(_shallow(arg) for arg in record.args)
+    elif isinstance(record.args, dict):
+        record.args = dict(record.args)
+    return record
+
+
+class _Handler(QueueHandler):
+    """Renders each record's message and hands it to the listener, which
+    does the JSON formatting and writing."""
+
+    def __init__(self, log_queue, threshold):
+        super().__init__(log_queue)
+        self.threshold = threshold
+        self.dropped = 0
+
+    def prepare(self, record):
+        return _render(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def filter(self, record):
+        trace = tracing.current_trace()
+        if trace is not None:
+            record.trace_id, record.agent, record.route = trace.trace_id, trace.agent, trace.route
+        if record.levelno >= self.threshold:
+            return True
+        # DEBUG detail: only for sampled requests; held back for the others
+        # in case the request turns out to be slow.
+        if trace is None:
+            return False
+        sampled = trace.log_sampled
+        if sampled is None:
+            rate = DETAIL_RATES.get(trace.route, DETAIL_RATES.get("*", 0.0))
+            sampled = trace.log_sampled = random.random() < rate
+        if sampled:
+            return True
+        if LOG_SLOW_REQUEST_MS > 0 and len(trace.log_deferred) < MAX_DEFERRED_PER_REQUEST:
+            trace.log_deferred.append(_snapshot(record))
+        return False
+
+
+_handler = None
+_listener = None
+
+
+def _flush_slow_request(trace, elapsed):
+    deferred, trace.log_deferred = trace.log_deferred, []
+    if not deferred or _handler is None or elapsed * 1000 < LOG_SLOW_REQUEST_MS:
+        return
+    for record in deferred:
+        record.slow_request = True
+        _handler.enqueue(_render(record))
+
+
+def configure_logging():
+    """Install the queue handler on the root logger (once per process)."""
+    global _handler, _listener
+    if _handler is not None:
+        return
+    threshold = logging.getLevelName(LOG_LEVEL)
+    if not isinstance(threshold, int):
+        threshold = logging.INFO
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _listener = QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    _handler = _Handler(log_queue, threshold)
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    root.setLevel(threshold)
+
+    detail = threshold > logging.DEBUG and (any(DETAIL_RATES.values()) or LOG_SLOW_REQUEST_MS > 0)
+    for name in DETAIL_LOGGERS:
+        logging.getLogger(name).setLevel(logging.DEBUG if detail else threshold)
+    tracing.end_hooks.append(_flush_slow_request)
+
+
+def logging_stats():
+    return {"dropped": _handler.dropped if _handler else 0, "queued": _handler.queue.qsize() if _handler else 0}
@@ -0,0 +1,344 @@
+"""
+Pluggable model backends for the agents.
+
+MODEL_BACKEND selects what `get_model(agent)` hands to `Agent(model=...)`:
+
+    live    the hosted model named by MODEL_NAME (default)
+    stub    a local model returning schema-correct JSON for each agent, with
+            configurable latency and error rates; no network needed
+    record  the live model, with every response saved to a cassette
+    replay  responses served back from the cassettes; a prompt that was
+            never recorded fails (or falls back to the stub, see
+            MODEL_CASSETTE_MISS)
+"""
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+from pydantic import PrivateAttr
+from common.prompt_budget import request_chars
+from common.valuation import value_property
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Backend settings (env overridable)
+# ---------------------------
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "live")  # "live", "stub", "record" or "replay"
+MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash")
+
+# Stub latency is normal(mean, jitter) clipped at zero; STUB_LATENCY_MS_<AGENT> overrides the mean.
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "300"))
+STUB_JITTER_MS = float(os.getenv("STUB_JITTER_MS", "50"))
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))  # raise, like a provider error
+STUB_MALFORMED_RATE = float(os.getenv("STUB_MALFORMED_RATE", "0"))  # reply with text that is not JSON
+STUB_FENCED_RATE = float(os.getenv("STUB_FENCED_RATE", "0"))  # wrap the JSON in ```json fences
+STUB_CHUNKS = int(os.getenv("STUB_CHUNKS", "8"))  # partial chunks per streamed reply
+STUB_SEED = os.getenv("STUB_SEED")
+
+CASSETTE_DIR = os.getenv("MODEL_CASSETTE_DIR", "shared/cassettes")
+CASSETTE_MISS = os.getenv("MODEL_CASSETTE_MISS", "error")  # "error" or "stub"
+CASSETTE_REPLAY_LATENCY = os.getenv("MODEL_CASSETTE_REPLAY_LATENCY", "0").lower() in ("1", "true", "yes")
+
+
+class StubModelError(RuntimeError):
+    pass
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+# ---------------------------
+# Prompt helpers
+# ---------------------------
+_FIELD_RE = re.compile(r"^[ \t]*([A-Za-z][A-Za-z ]*?):[ \t]*(\S.*?)[ \t]*$", re.MULTILINE)
+_BATCH_LINE_RE = re.compile(r"^- id: (\S+) \| (.+)$", re.MULTILINE)
+
+
+def _prompt_text(llm_request):
+    """Text of the latest user turn."""
+    for content in reversed(llm_request.contents or []):
+        if content.role == "user" and content.parts:
+            return "".join(part.text or "" for part in content.parts)
+    return ""
+
+
+def _fields(text):
+    return {key.strip().lower(): value for key, value in _FIELD_RE.findall(text)}
+
+
+def _number(value, default):
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", str(value or ""))
+    if not match:
+        return default
+    return float(match.group().replace(",", ""))
+
+
+def _chunks(text, count):
+    size = max(1, -(-len(text) // max(1, count)))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _text_response(text, partial=False, prompt_chars=None):
+    response = LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]), partial=partial)
+    if prompt_chars is not None:
+        # Rough 4-characters-per-token counts, so usage accounting has something to work with.
+        prompt_tokens, reply_tokens = prompt_chars // 4 + 1, len(text) // 4 + 1
+        response.usage_metadata = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=reply_tokens,
+            total_token_count=prompt_tokens + reply_tokens,
+        )
+    return response
+
+
+# ---------------------------
+# Stub replies, one builder per agent
+# ---------------------------
+def _stub_buyer(text, rng):
+    fields = _fields(text)
+    location = fields.get("location", "Bangalore")
+    property_type = fields.get("property type", "Apartment")
+    budget = _number(fields.get("budget"), 8000000)
+    options = []
+    for i in range(rng.randint(2, 3)):
+        size = 700 + 150 * i + rng.randrange(0, 100)
+        options.append({
+            "name": f"{property_type} option {i + 1} in {location}",
+            "description": f"A {size} sq. ft {property_type.lower()} close to schools and transit.",
+            "price": int(min(budget, value_property(location, size, property_type)) * rng.uniform(0.85, 1.0)),
+            "location": location,
+            "size": size,
+            "features": ["Parking", "Power backup", "Gated community"][: 1 + i],
+        })
+    return {"buyer": options}
+
+
+def _stub_seller(text, rng):
+    fields = _fields(text)
+    location = fields.get("location", "Bangalore")
+    property_type = fields.get("property type", "Apartment")
+    size = int(_number(fields.get("size"), 1000))
+    return {"seller": [{
+        "title": f"Well-kept {property_type} in {location}",
+        "description": f"Bright {size} sq. ft {property_type.lower()} with good connectivity.",
+        "price_in_inr": int(value_property(location, size, property_type) * rng.uniform(0.95, 1.1)),
+        "location": location,
+        "size_sq_ft": size,
+        "features": ["Vastu compliant", "Covered parking", "24x7 security"],
+    }]}
+
+
+def _price_entry(fields, rng, item_id=None):
+    location = fields.get("location", "Bangalore")
+    property_type = fields.get("property type", "Apartment")
+    size = _number(fields.get("size"), 1000)
+    mid = value_property(location, size, property_type)
+    entry = {
+        "Property type": property_type,
+        "Location": location,
+        "Size (sq. ft)": int(size),
+        "Estimated price range (min-max INR)": f"{int(mid * 0.9):,} - {int(mid * 1.1):,}",
+        "Justification": f"Based on recent per sq. ft rates in {location}.",
+    }
+    if item_id is not None:
+        entry["id"] = item_id
+    return entry
+
+
+def _stub_price(text, rng):
+    batch = _BATCH_LINE_RE.findall(text)
+    if batch:
+        return {"price": [
+            _price_entry(_fields(line.replace(" | ", "\n")), rng, item_id) for item_id, line in batch
+        ]}
+    return {"price": [_price_entry(_fields(text), rng)]}
+
+
+def _stub_neighborhood(text, rng):
+    fields = _fields(text)
+    location = fields.get("location", "Bangalore")
+    return {"neighborhood": [{
+        "Area name": location,
+        "Safety rating": rng.randint(3, 5),
+        "Nearby schools": [{"name": f"{location.split(',')[0]} Public School", "rating": 4}],
+        "Key amenities": ["Hospital", "Mall", "Supermarket", "Park", "Gym"],
+        "Transportation": "Metro and bus stops within 2 km.",
+        "Lifestyle": "Residential, family-friendly community.",
+    }]}
+
+
+STUB_BUILDERS = {
+    "buyer": _stub_buyer,
+    "seller": _stub_seller,
+    "price": _stub_price,
+    "neighborhood": _stub_neighborhood,
+}
+
+
+def stub_reply(agent, text, rng=None):
+    """The stub's JSON reply text for `agent` given the prompt text."""
+    rng = rng or random.Random(0)
+    if agent in STUB_BUILDERS:
+        return json.dumps(STUB_BUILDERS[agent](text, rng))
+    location = _fields(text).get("preferred location", "the requested area")
+    return f"Summary of buyer, seller, price and neighborhood findings for {location}."
+
+
+class StubLlm(BaseLlm):
+    """Local stand-in for the hosted model."""
+
+    agent: str = ""
+    latency_ms: float = STUB_LATENCY_MS
+    jitter_ms: float = STUB_JITTER_MS
+    error_rate: float = STUB_ERROR_RATE
+    malformed_rate: float = STUB_MALFORMED_RATE
+    fenced_rate: float = STUB_FENCED_RATE
+    chunks: int = STUB_CHUNKS
+    seed: int | None = int(STUB_SEED) if STUB_SEED else None
+
+    _rng: random.Random = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        self._rng = random.Random(self.seed)
+
+    async def generate_content_async(self, llm_request, stream=False):
+        rng = self._rng
+        delay = max(0.0, rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        roll = rng.random()
+        if roll < self.error_rate:
+            await asyncio.sleep(delay)
+            raise StubModelError(f"stub {self.agent or 'model'} error (injected)")
+        prompt = _prompt_text(llm_request)
+        text = stub_reply(self.agent, prompt, rng)
+        if roll < self.error_rate + self.malformed_rate:
+            text = "Sorry, I could not produce JSON for that request."
+        elif roll < self.error_rate + self.malformed_rate + self.fenced_rate and self.agent in STUB_BUILDERS:
+            text = f"```json\n{text}\n```"
+
+        if not stream:
+            await asyncio.sleep(delay)
+        else:
+            pieces = _chunks(text, self.chunks)
+            for piece in pieces:
+                await asyncio.sleep(delay / len(pieces))
+                yield _text_response(piece, partial=True)
+        yield _text_response(text, prompt_chars=request_chars(llm_request))
+
+
+# ---------------------------
+# Cassettes (record / replay)
+# ---------------------------
+def request_key(agent, llm_request):
+    """Stable key for a model call: the agent plus the full conversation sent."""
+    contents = [c.model_dump(mode="json", exclude_none=True) for c in llm_request.contents or []]
+    blob = json.dumps([agent, contents], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded model responses for one agent, stored as JSON lines."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+            logger.info(f"Loaded {len(self.entries)} recorded responses from {path}")
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def add(self, key, prompt, responses, latency_ms):
+        entry = {
+            "key": key,
+            "prompt": prompt[:200],
+            "latency_ms": round(latency_ms, 1),
+            "responses": [r.model_dump(mode="json", exclude_none=True) for r in responses],
+        }
+        with self._lock:
+            self.entries[key] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class CassetteLlm(BaseLlm):
+    """Records the live model's responses, or replays them without a network."""
+
+    agent: str = ""
+    mode: str = "replay"  # "record" or "replay"
+    live_model: str = MODEL_NAME
+    chunks: int = STUB_CHUNKS
+
+    _cassette: Cassette = PrivateAttr(default=None)
+    _live: BaseLlm = PrivateAttr(default=None)
+    _stub: StubLlm = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        self._cassette = Cassette(os.path.join(CASSETTE_DIR, f"{self.agent or 'model'}.jsonl"))
+
+    async def generate_content_async(self, llm_request, stream=False):
+        key = request_key(self.agent, llm_request)
+        if self.mode == "record":
+            async for response in self._record(key, llm_request, stream):
+                yield response
+            return
+
+        entry = self._cassette.get(key)
+        if entry is None:
+            if CASSETTE_MISS != "stub":
+                raise CassetteMiss(f"No recorded response for {self.agent} prompt {key[:12]}")
+            if self._stub is None:
+                self._stub = StubLlm(model=f"stub/{self.agent}", agent=self.agent)
+            async for response in self._stub.generate_content_async(llm_request, stream=stream):
+                yield response
+            return
+
+        if CASSETTE_REPLAY_LATENCY:
+            await asyncio.sleep(entry["latency_ms"] / 1000)
+        for data in entry["responses"]:
+            response = LlmResponse.model_validate(data)
+            if stream and response.content and response.content.parts and response.content.parts[0].text:
+                for piece in _chunks(response.content.parts[0].text, self.chunks):
+                    yield _text_response(piece, partial=True)
+            yield response
+
+    async def _record(self, key, llm_request, stream):
+        if self._live is None:
+            self._live = LLMRegistry.new_llm(self.live_model)
+        start = time.perf_counter()
+        final = []
+        async for response in self._live.generate_content_async(llm_request, stream=stream):
+            if not response.partial:
+                final.append(response)
+            yield response
+        self._cassette.add(key, _prompt_text(llm_request), final, (time.perf_counter() - start) * 1000)
+
+
+def get_model(agent, backend=None):
+    """The `model` argument for an agent's `Agent(...)`, per MODEL_BACKEND."""
+    backend = backend or MODEL_BACKEND
+    if backend == "live":
+        return MODEL_NAME
+    if backend == "stub":
+        latency = float(os.getenv(f"STUB_LATENCY_MS_{agent.upper()}", STUB_LATENCY_MS))
+        return StubLlm(model=f"stub/{agent}", agent=agent, latency_ms=latency)
+    if backend in ("record", "replay"):
+        return CassetteLlm(model=f"cassette/{agent}", agent=agent, mode=backend, live_model=MODEL_NAME)
+    raise ValueError(f"Unknown MODEL_BACKEND {backend!r}; expected live, stub, record or replay")
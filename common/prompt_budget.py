@@ -0,0 +1,207 @@
+"""
+Prompt-size accounting and history compaction.
+
+Agents register `before_model` and `after_model` as ADK model callbacks, so
+every model call passes through here. Before the call the prompt (system
+instruction plus conversation contents) is measured and, if it is over
+PROMPT_BUDGET_TOKENS, compacted. Compaction only changes the request being
+sent; the stored session is left alone. The oldest whole turns are dropped,
+and in "summarize" mode a short digest of the most recent dropped turns is
+prepended in their place. After the call the model's reported token usage is added.
+
+Counts are kept per agent (`prompt_stats()`) and on the request's trace, so
+the trace summary log line shows prompt size next to stage latencies. When a
+request finishes, its model time is also recorded in
+`agent_model_duration_seconds`, labelled by prompt-size band.
+"""
+from collections import defaultdict
+from google.genai import types
+from common import tracing
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Prompt budget settings (env overridable)
+# ---------------------------
+PROMPT_BUDGET_TOKENS = int(os.getenv("PROMPT_BUDGET_TOKENS", "6000"))
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "truncate")  # "truncate", "summarize" or "off"
+CHARS_PER_TOKEN = 4  # rough estimate when the model has not reported usage
+SUMMARY_LINE_CHARS = 160
+
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+
+def estimate_tokens(chars):
+    return chars // CHARS_PER_TOKEN + 1 if chars else 0
+
+
+def content_chars(content):
+    chars = 0
+    for part in (content.parts or []) if content is not None else []:
+        if part.text:
+            chars += len(part.text)
+        elif part.function_call is not None:
+            chars += len(part.function_call.name or "") + len(str(part.function_call.args or ""))
+        elif part.function_response is not None:
+            chars += len(str(part.function_response.response or ""))
+    return chars
+
+
+def request_chars(llm_request):
+    """Characters sent to the model: system instruction plus every content."""
+    chars = sum(content_chars(c) for c in llm_request.contents or [])
+    instruction = llm_request.config.system_instruction if llm_request.config else None
+    if isinstance(instruction, str):
+        chars += len(instruction)
+    elif isinstance(instruction, types.Content):
+        chars += content_chars(instruction)
+    return chars
+
+
+# ---------------------------
+# Compaction
+# ---------------------------
+def _starts_turn(content):
+    return content.role == "user" and any(part.text for part in content.parts or [])
+
+
+def _turns(contents):
+    """Split contents into turns, each starting at a user message."""
+    turns = []
+    for content in contents:
+        if not turns or _starts_turn(content):
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+def _text(content):
+    return re.sub(r"\s+", " ", " ".join(part.text for part in content.parts or [] if part.text)).strip()
+
+
+def _summary(turns, max_chars):
+    """A few lines per dropped turn, newest first until max_chars is reached."""
+    header = "Summary of earlier conversation (older turns omitted):"
+    entries = []
+    used = len(header)
+    for turn in reversed(turns):
+        entry = f"- User asked: {_text(turn[0])[:SUMMARY_LINE_CHARS]}"
+        replies = [_text(c) for c in turn[1:] if c.role == "model" and _text(c)]
+        if replies:
+            entry += f"\n  Answered: {replies[-1][:SUMMARY_LINE_CHARS]}"
+        if used + len(entry) + 1 > max_chars:
+            break
+        entries.insert(0, entry)
+        used += len(entry) + 1
+    return "\n".join([header, *entries])
+
+
+def compact(contents, budget_chars, mode=PROMPT_COMPACTION):
+    """Drop the oldest turns until contents fit budget_chars.
+
+    The latest turn is always kept. In "summarize" mode a quarter of the
+    budget is set aside for the summary. Returns (contents, turns dropped).
+    """
+    summary_chars = budget_chars // 4 if mode == "summarize" else 0
+    budget_chars -= summary_chars
+    turns = _turns(list(contents))
+    sizes = [sum(content_chars(c) for c in turn) for turn in turns]
+    used = sizes[-1] if sizes else 0
+    first_kept = len(turns) - 1
+    while first_kept > 0 and used + sizes[first_kept - 1] <= budget_chars:
+        first_kept -= 1
+        used += sizes[first_kept]
+    if first_kept <= 0:
+        return contents, 0
+    kept = [c for turn in turns[first_kept:] for c in turn]
+    if mode == "summarize":
+        # A new Content, so the session's own event is not modified.
+        first = kept[0]
+        summary = types.Part(text=_summary(turns[:first_kept], summary_chars) + "\n\n")
+        kept[0] = types.Content(role=first.role, parts=[summary, *(first.parts or [])])
+    return kept, first_kept
+
+
+# ---------------------------
+# Accounting
+# ---------------------------
+stats = defaultdict(lambda: {
+    "calls": 0, "prompt_chars": 0, "prompt_tokens": 0, "output_tokens": 0,
+    "largest_prompt_tokens": 0, "compactions": 0, "turns_dropped": 0,
+})
+
+
+def _add_usage(**counts):
+    trace = tracing.current_trace()
+    if trace is None:
+        return
+    for key, value in counts.items():
+        trace.usage[key] = trace.usage.get(key, 0) + value
+
+
+def before_model(callback_context, llm_request):
+    """ADK before_model_callback: measure, and compact if over budget."""
+    agent = callback_context.agent_name
+    chars = request_chars(llm_request)
+    budget_chars = PROMPT_BUDGET_TOKENS * CHARS_PER_TOKEN
+    if PROMPT_COMPACTION != "off" and chars > budget_chars and llm_request.contents:
+        overflow = chars - budget_chars
+        contents_chars = sum(content_chars(c) for c in llm_request.contents)
+        llm_request.contents, dropped = compact(llm_request.contents, contents_chars - overflow)
+        if dropped:
+            before, chars = chars, request_chars(llm_request)
+            stats[agent]["compactions"] += 1
+            stats[agent]["turns_dropped"] += dropped
+            _add_usage(turns_dropped=dropped)
+            logger.info(f"{agent} prompt compacted from {before} to {chars} chars ({dropped} turns dropped)")
+    entry = stats[agent]
+    entry["calls"] += 1
+    entry["prompt_chars"] += chars
+    entry["largest_prompt_tokens"] = max(entry["largest_prompt_tokens"], estimate_tokens(chars))
+    _add_usage(model_calls=1, prompt_chars=chars)
+    return None
+
+
+def after_model(callback_context, llm_response):
+    """ADK after_model_callback: add the usage the model reported."""
+    usage = llm_response.usage_metadata
+    if llm_response.partial or usage is None:
+        return None
+    entry = stats[callback_context.agent_name]
+    prompt_tokens = usage.prompt_token_count or 0
+    output_tokens = usage.candidates_token_count or 0
+    entry["prompt_tokens"] += prompt_tokens
+    entry["output_tokens"] += output_tokens
+    entry["largest_prompt_tokens"] = max(entry["largest_prompt_tokens"], prompt_tokens)
+    _add_usage(prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+    return None
+
+
+def _band(tokens):
+    for bound in TOKEN_BUCKETS:
+        if tokens <= bound:
+            return str(bound)
+    return "+Inf"
+
+
+def _observe_request(trace, elapsed):
+    usage = trace.usage
+    if not usage.get("model_calls"):
+        return
+    # Prefer what the model reported; fall back to the character estimate.
+    tokens = usage.get("prompt_tokens") or estimate_tokens(usage.get("prompt_chars", 0))
+    tracing.metrics.observe("agent_prompt_tokens", {"agent": trace.agent}, tokens, buckets=TOKEN_BUCKETS)
+    model_seconds = sum(seconds for stage, seconds in trace.spans if stage == "model")
+    tracing.metrics.observe(
+        "agent_model_duration_seconds", {"agent": trace.agent, "prompt_tokens_le": _band(tokens)}, model_seconds
+    )
+
+
+tracing.end_hooks.append(_observe_request)
+
+
+def prompt_stats():
+    return {agent: dict(entry) for agent, entry in stats.items()}
@@ -0,0 +1,223 @@
+"""
+Model-provider rate limiting shared by every agent process on the host.
+
+The provider's requests-per-minute and tokens-per-minute quotas are split
+into token buckets kept in one SQLite file, so the five agent processes
+draw from the same quota. An agent can reserve a share (MODEL_RATE_SHARES):
+its own bucket with that part of the rate. The unreserved remainder is a
+common pool that any agent uses once its own bucket runs dry.
+
+Buckets hold only MODEL_RATE_BURST_SECONDS worth of quota, so a quiet
+minute does not allow a burst of a minute's worth of calls; a caller that
+finds its buckets empty sleeps for the time the refill needs, spreading
+calls evenly. Token debits are an estimate (prompt size plus
+MODEL_RATE_OUTPUT_TOKENS) settled against the usage the model reports.
+A call that would wait longer than MODEL_RATE_MAX_WAIT is rejected with a
+429 instead of holding the request.
+"""
+from common import tracing
+from common.admission import AdmissionRejected
+from common.prompt_budget import estimate_tokens, request_chars
+import asyncio
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Rate limit settings (env overridable)
+# ---------------------------
+MODEL_RPM = float(os.getenv("MODEL_RPM", "0"))  # 0 disables the request limit
+MODEL_TPM = float(os.getenv("MODEL_TPM", "0"))  # 0 disables the token limit
+# Reserved shares of both limits, e.g. "buyer=0.3,price=0.2"; the rest is pooled
+MODEL_RATE_SHARES = os.getenv("MODEL_RATE_SHARES", "")
+MODEL_RATE_BURST_SECONDS = float(os.getenv("MODEL_RATE_BURST_SECONDS", "5"))
+MODEL_RATE_MAX_WAIT = float(os.getenv("MODEL_RATE_MAX_WAIT", "30"))  # seconds
+MODEL_RATE_OUTPUT_TOKENS = int(os.getenv("MODEL_RATE_OUTPUT_TOKENS", "500"))  # expected reply size
+MODEL_RATE_PATH = os.getenv("MODEL_RATE_PATH", ".cache/model_rate.sqlite3")
+
+POOL = "*"
+
+
+def _parse_shares(text):
+    shares = {}
+    for part in text.split(","):
+        agent, _, share = part.partition("=")
+        if agent.strip() and share.strip():
+            shares[agent.strip()] = float(share)
+    if sum(shares.values()) > 1:
+        raise ValueError(f"MODEL_RATE_SHARES adds up to more than 1: {text}")
+    return shares
+
+
+class RateLimiter:
+    """Cross-process RPM/TPM token buckets in a SQLite file."""
+
+    def __init__(self, rpm=MODEL_RPM, tpm=MODEL_TPM, shares=None, path=MODEL_RATE_PATH,
+                 burst_seconds=MODEL_RATE_BURST_SECONDS, max_wait=MODEL_RATE_MAX_WAIT):
+        self.limits = {"requests": rpm / 60, "tokens": tpm / 60}  # per second; 0 = unlimited
+        self.shares = shares if shares is not None else _parse_shares(MODEL_RATE_SHARES)
+        self.burst_seconds = burst_seconds
+        self.max_wait = max_wait
+        self.enabled = any(self.limits.values())
+        self.stats = {"calls": 0, "waited": 0, "wait_seconds": 0.0, "rejected": 0, "from_pool": 0}
+        self._lock = threading.Lock()
+        self._conn = None
+        if self.enabled:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " name TEXT NOT NULL, kind TEXT NOT NULL, level REAL NOT NULL, updated REAL NOT NULL,"
+                " PRIMARY KEY (name, kind))"
+            )
+
+    def _rate(self, name, kind):
+        share = self.shares.get(name) if name != POOL else 1 - sum(self.shares.values())
+        return self.limits[kind] * (share or 0)
+
+    def _take(self, agent, cost):
+        """One attempt: debit `cost` ({kind: amount}) from the agent's bucket,
+        else from the pool. Returns (bucket name, 0) on success or (None, seconds to wait)."""
+        now = time.time()
+        candidates = [name for name in (agent, POOL) if name == POOL or name in self.shares]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                waits = []
+                for name in candidates:
+                    levels, wait = {}, 0.0
+                    for kind, amount in cost.items():
+                        rate = self._rate(name, kind)
+                        if not self.limits[kind]:
+                            continue
+                        if rate <= 0:
+                            wait = math.inf
+                            break
+                        capacity = max(rate * self.burst_seconds, amount)
+                        row = self._conn.execute(
+                            "SELECT level, updated FROM buckets WHERE name = ? AND kind = ?", (name, kind)
+                        ).fetchone()
+                        level = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                        levels[kind] = level
+                        if level < amount:
+                            wait = max(wait, (amount - level) / rate)
+                    if wait == 0:
+                        for kind, level in levels.items():
+                            self._conn.execute(
+                                "INSERT OR REPLACE INTO buckets (name, kind, level, updated) VALUES (?, ?, ?, ?)",
+                                (name, kind, level - cost[kind], now),
+                            )
+                        self._conn.execute("COMMIT")
+                        return name, 0.0
+                    waits.append(wait)
+                self._conn.execute("COMMIT")
+                return None, min(waits)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def adjust(self, name, kind, amount):
+        """Debit (or with a negative amount, credit) a bucket after the fact."""
+        if not self.enabled or not self.limits[kind] or not amount:
+            return
+        with self._lock:
+            self._conn.execute(
+                "UPDATE buckets SET level = level - ? WHERE name = ? AND kind = ?", (amount, name, kind)
+            )
+
+    async def acquire(self, agent, tokens):
+        """Wait for one request and `tokens` tokens of quota; returns the bucket charged."""
+        if not self.enabled:
+            return None
+        self.stats["calls"] += 1
+        cost = {"requests": 1, "tokens": tokens}
+        start = time.perf_counter()
+        while True:
+            # The transaction can wait on another process's write lock; keep it off the event loop.
+            name, wait = await asyncio.to_thread(self._take, agent, cost)
+            if name is not None:
+                break
+            waited = time.perf_counter() - start
+            if waited + wait > self.max_wait:
+                self.stats["rejected"] += 1
+                raise AdmissionRejected(429, "Model rate limit reached; try again shortly", math.ceil(min(wait, 60)))
+            # A little jitter so processes woken together do not collide again.
+            await asyncio.sleep(wait * random.uniform(1.0, 1.2))
+        waited = time.perf_counter() - start
+        if waited > 0.001:
+            self.stats["waited"] += 1
+            self.stats["wait_seconds"] += waited
+            tracing.record("rate_limit", waited)
+        if name == POOL:
+            self.stats["from_pool"] += 1
+        return name
+
+    def levels(self):
+        if not self.enabled:
+            return {}
+        with self._lock:
+            rows = self._conn.execute("SELECT name, kind, level FROM buckets").fetchall()
+        return {f"{name}.{kind}": round(level, 1) for name, kind, level in rows}
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "wait_seconds": round(self.stats["wait_seconds"], 3),
+            "rpm": self.limits["requests"] * 60,
+            "tpm": self.limits["tokens"] * 60,
+            "shares": self.shares,
+            "levels": self.levels(),
+        }
+
+
+limiter = RateLimiter()
+
+# Token estimate charged per in-flight model call: invocation id -> (bucket, tokens).
+# Calls stopped early never report usage; their estimate stands.
+_charged = {}
+MAX_UNSETTLED = 1024
+
+
+def _agent_key(agent_name):
+    return agent_name[:-len("_agent")] if agent_name.endswith("_agent") else agent_name
+
+
+async def limit_model_call(callback_context, llm_request):
+    """ADK before_model_callback: wait for quota before the call goes out.
+
+    Register after prompt_budget.before_model, so the estimate is of the
+    compacted prompt.
+    """
+    if not limiter.enabled:
+        return None
+    tokens = estimate_tokens(request_chars(llm_request)) + MODEL_RATE_OUTPUT_TOKENS
+    name = await limiter.acquire(_agent_key(callback_context.agent_name), tokens)
+    _charged[callback_context.invocation_id] = (name, tokens)
+    while len(_charged) > MAX_UNSETTLED:
+        _charged.pop(next(iter(_charged)))
+    return None
+
+
+async def settle_model_call(callback_context, llm_response):
+    """ADK after_model_callback: correct the token estimate with reported usage."""
+    if llm_response.partial:
+        return None
+    charged = _charged.pop(callback_context.invocation_id, None)
+    usage = llm_response.usage_metadata
+    if charged is None or usage is None or not usage.total_token_count:
+        return None
+    name, estimate = charged
+    await asyncio.to_thread(limiter.adjust, name, "tokens", usage.total_token_count - estimate)
+    return None
+
+
+def rate_limit_stats():
+    return limiter.snapshot()
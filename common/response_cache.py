@@ -0,0 +1,247 @@
+from collections import OrderedDict
+from functools import wraps
+from common.singleflight import SingleFlight
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Cache settings (env overridable)
+# ---------------------------
+CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # "memory", "disk" or "off"
+CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite3")
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+MONEY_BUCKET_INR = int(os.getenv("RESPONSE_CACHE_MONEY_BUCKET", "500000"))
+SIZE_BUCKET_SQFT = int(os.getenv("RESPONSE_CACHE_SIZE_BUCKET", "50"))
+
+# Default TTL per agent type, in seconds. Override with RESPONSE_CACHE_TTL_<AGENT>.
+DEFAULT_TTLS = {
+    "buyer": 900,
+    "seller": 300,
+    "price": 3600,
+    "neighborhood": 86400,
+}
+
+
+# ---------------------------
+# Key normalization
+# ---------------------------
+MONEY_FIELDS = {"budget", "price"}
+SIZE_FIELDS = {"size", "size_sqft"}
+
+
+def _normalize_value(field, value):
+    name = field.rsplit(".", 1)[-1].lower()
+    if isinstance(value, str):
+        text = re.sub(r"\s+", " ", value.casefold()).strip()
+        text = re.sub(r"\s*,\s*", ", ", text)
+        if name not in MONEY_FIELDS | SIZE_FIELDS:
+            return text
+        try:
+            value = float(text.replace(",", "").replace(" ", ""))
+        except ValueError:
+            return text
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if name in MONEY_FIELDS:
+        return int(round(value / MONEY_BUCKET_INR)) * MONEY_BUCKET_INR
+    if name in SIZE_FIELDS:
+        return int(round(value / SIZE_BUCKET_SQFT)) * SIZE_BUCKET_SQFT
+    return value
+
+
+def _lookup(request, field):
+    value = request
+    for part in field.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def cache_key(agent, request, fields):
+    """Stable key from the normalized request fields that shape the answer."""
+    normalized = {}
+    for field in fields:
+        value = _lookup(request, field)
+        if value not in (None, ""):
+            normalized[field] = _normalize_value(field, value)
+    raw = json.dumps([agent, normalized], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+class MemoryBackend:
+    """Size-bounded LRU dict of key -> (expires_at, value)."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl):
+        self._data[key] = (time.time() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskBackend:
+    """SQLite file store, shared by every worker on the same machine."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def make_backend(kind=CACHE_BACKEND):
+    if kind == "disk":
+        return DiskBackend()
+    return MemoryBackend()
+
+
+# ---------------------------
+# Response cache
+# ---------------------------
+class ResponseCache:
+    """Caches successful execute() results for one agent type.
+
+    Requests that carry a session_id are passed straight through, since the
+    conversation history changes the answer.
+    """
+
+    def __init__(self, agent, fields, ttl=None, backend=None, enabled=None):
+        self.agent = agent
+        self.fields = fields
+        self.ttl = ttl if ttl is not None else float(
+            os.getenv(f"RESPONSE_CACHE_TTL_{agent.upper()}", DEFAULT_TTLS.get(agent, 600))
+        )
+        self.enabled = enabled if enabled is not None else CACHE_BACKEND != "off"
+        self.backend = backend or make_backend()
+        self.flights = SingleFlight()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "bypassed": 0, "stored": 0}
+        _caches[agent] = self
+
+    def _cacheable(self, request):
+        return (
+            self.enabled
+            and self.ttl > 0
+            and isinstance(request, dict)
+            and not request.get("session_id")
+        )
+
+    def get(self, request):
+        """Return the cached response for request, or None."""
+        if not self._cacheable(request):
+            self.stats["bypassed"] += 1
+            return None
+        value = self.backend.get(cache_key(self.agent, request, self.fields))
+        self.stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    def put(self, request, result):
+        if self._cacheable(request) and isinstance(result, dict) and result.get("status") == "success":
+            self.backend.set(cache_key(self.agent, request, self.fields), result, self.ttl)
+            self.stats["stored"] += 1
+
+    def cached(self, execute):
+        @wraps(execute)
+        async def wrapper(request):
+            if not self._cacheable(request):
+                self.stats["bypassed"] += 1
+                return await execute(request)
+
+            value = self.get(request)
+            if value is not None:
+                return value
+
+            async def fill():
+                result = await execute(request)
+                self.put(request, result)
+                return result
+
+            key = cache_key(self.agent, request, self.fields)
+            if self.flights.is_in_flight(key):
+                self.stats["coalesced"] += 1
+            return await self.flights.do(key, fill)
+
+        return wrapper
+
+    def snapshot(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.backend),
+            "hit_ratio": round((self.stats["hits"] + self.stats["coalesced"]) / lookups, 3) if lookups else 0.0,
+            "ttl": self.ttl,
+        }
+
+
+_caches = {}
+
+
+def cache_stats():
+    return {agent: cache.snapshot() for agent, cache in _caches.items()}
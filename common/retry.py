@@ -0,0 +1,166 @@
+from collections import defaultdict
+from urllib.parse import urlsplit
+from httpx import ConnectError, HTTPStatusError, TimeoutException, TransportError
+import asyncio
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Retry settings (env overridable)
+# ---------------------------
+BASE_DELAY_SECONDS = float(os.getenv("A2A_RETRY_BASE_DELAY", "0.2"))
+MAX_DELAY_SECONDS = float(os.getenv("A2A_RETRY_MAX_DELAY", "5"))
+BUDGET_CAPACITY = float(os.getenv("A2A_RETRY_BUDGET_TOKENS", "10"))
+BUDGET_REFILL_PER_SECOND = float(os.getenv("A2A_RETRY_BUDGET_REFILL", "0.5"))
+
+# Error classes
+TIMEOUT = "timeout"
+CONNECT = "connect"
+SERVER_ERROR = "5xx"
+THROTTLED = "throttled"  # 408 / 429
+CLIENT_ERROR = "4xx"
+OTHER = "other"
+
+RETRYABLE = {TIMEOUT, CONNECT, SERVER_ERROR, THROTTLED}
+
+
+def classify(error):
+    """Map an exception raised by an HTTP call to one of the error classes."""
+    if isinstance(error, TimeoutException):
+        return TIMEOUT
+    if isinstance(error, ConnectError):
+        return CONNECT
+    if isinstance(error, HTTPStatusError):
+        status = error.response.status_code
+        if status in (408, 429):
+            return THROTTLED
+        if status >= 500:
+            return SERVER_ERROR
+        return CLIENT_ERROR
+    if isinstance(error, TransportError):
+        return CONNECT
+    return OTHER
+
+
+def host_of(url):
+    return urlsplit(url).netloc
+
+
+class TokenBucket:
+    """Refilling token bucket; one token is spent per retry."""
+
+    def __init__(self, capacity=BUDGET_CAPACITY, refill_per_second=BUDGET_REFILL_PER_SECOND):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def try_acquire(self, tokens=1.0):
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+
+class RetryMetrics:
+    def __init__(self):
+        self.counters = defaultdict(int)
+
+    def incr(self, name, host=None):
+        self.counters[name] += 1
+        if host:
+            self.counters[f"{name}:{host}"] += 1
+
+    def snapshot(self):
+        return dict(self.counters)
+
+
+metrics = RetryMetrics()
+
+
+class RetryPolicy:
+    """Decides whether a failed call is retried and how long to wait first.
+
+    Only timeouts, connect errors, throttling and 5xx responses are retried.
+    Each retry spends a token from the downstream host's budget, so a
+    struggling agent sees at most a bounded trickle of retries.
+    """
+
+    def __init__(
+        self,
+        max_attempts=3,
+        base_delay=BASE_DELAY_SECONDS,
+        max_delay=MAX_DELAY_SECONDS,
+        budgets=None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budgets = budgets if budgets is not None else _budgets
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def should_retry(self, error_class, attempt, host):
+        """Return (retry, reason) and record the decision in metrics."""
+        metrics.incr(f"errors_{error_class}", host)
+        if error_class not in RETRYABLE:
+            reason = "non_retryable"
+        elif attempt + 1 >= self.max_attempts:
+            reason = "attempts_exhausted"
+        elif not self.budgets[host].try_acquire():
+            reason = "budget_exhausted"
+        else:
+            metrics.incr("retries", host)
+            return True, "retry"
+        metrics.incr(f"give_up_{reason}", host)
+        return False, reason
+
+
+_budgets = defaultdict(TokenBucket)
+
+
+async def hedged(make_call, hedge_after, host=None):
+    """Run make_call(); if it has not finished after hedge_after seconds,
+    start a second copy and return whichever succeeds first.
+
+    Only use this for idempotent calls.
+    """
+    first = asyncio.create_task(make_call())
+    pending = {first}
+    error = None
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if done:
+            return first.result()
+
+        metrics.incr("hedges_sent", host)
+        second = asyncio.create_task(make_call())
+        pending = {first, second}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        metrics.incr("hedges_won", host)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def retry_stats():
+    return metrics.snapshot()
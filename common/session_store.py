@@ -0,0 +1,346 @@
+"""
+Durable ADK sessions backed by SQLite.
+
+`DurableSessionService` keeps recently used sessions in memory (the
+InMemorySessionService it extends) and persists them to a SQLite file, so a
+conversation survives restarts and can continue on another worker or replica
+sharing the file. Appended events are written behind: a background thread
+batches them into one transaction every SESSION_FLUSH_INTERVAL seconds, off
+the request path. Only the most recent turns are kept, both on disk and in
+memory, and idle sessions fall out of the hot cache and are reloaded from
+disk when next used.
+
+Per-request throwaway sessions (see SessionPool) never touch the disk, and
+app- and user-scoped state stays per-process.
+"""
+from collections import OrderedDict
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+import asyncio
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Session store settings (env overridable)
+# ---------------------------
+SESSION_BACKEND = os.getenv("AGENT_SESSION_BACKEND", "sqlite")  # "sqlite" or "memory"
+SESSION_STORE_PATH = os.getenv("AGENT_SESSION_STORE_PATH", ".cache/sessions.sqlite3")
+SESSION_HOT_CACHE_SIZE = int(os.getenv("AGENT_SESSION_HOT_CACHE", "256"))
+SESSION_FLUSH_INTERVAL = float(os.getenv("AGENT_SESSION_FLUSH_INTERVAL", "0.5"))  # seconds
+SESSION_FLUSH_BATCH = int(os.getenv("AGENT_SESSION_FLUSH_BATCH", "200"))  # pending writes that trigger a flush
+# Events kept per session; older turns are dropped, whole turns at a time
+SESSION_KEEP_EVENTS = int(os.getenv("AGENT_SESSION_KEEP_EVENTS", os.getenv("AGENT_MAX_EVENTS_PER_SESSION", "40")))
+
+EPHEMERAL_PREFIX = "req-"
+
+
+def recent_turns(events, keep):
+    """The last `keep` events or fewer, starting at a user message so no turn is cut in half."""
+    if len(events) <= keep:
+        return events
+    recent = events[-keep:]
+    for i, event in enumerate(recent):
+        if event.author == "user":
+            return recent[i:]
+    return []
+
+
+class DurableSessionService(InMemorySessionService):
+    def __init__(
+        self,
+        path=SESSION_STORE_PATH,
+        hot_cache_size=SESSION_HOT_CACHE_SIZE,
+        keep_events=SESSION_KEEP_EVENTS,
+        flush_interval=SESSION_FLUSH_INTERVAL,
+    ):
+        super().__init__()
+        self.hot_cache_size = hot_cache_size
+        self.keep_events = keep_events
+        self.flush_interval = flush_interval
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " app_name TEXT NOT NULL, user_id TEXT NOT NULL, id TEXT NOT NULL,"
+            " state TEXT NOT NULL, last_update_time REAL NOT NULL,"
+            " PRIMARY KEY (app_name, user_id, id))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_events ("
+            " app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL, event TEXT NOT NULL,"
+            " PRIMARY KEY (app_name, user_id, session_id, seq))"
+        )
+        self._db_lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one batch at a time, so events land in order
+        # Write-behind queue: session key -> {"session": (state, last_update_time), "events": [...], "delete": bool}
+        self._pending = {}
+        self._pending_lock = threading.Condition()
+        self._pending_writes = 0
+        self._hot = OrderedDict()  # (app, user, id) -> None, in LRU order
+        self.stats = {
+            "loaded": 0, "hot_hits": 0, "hot_evictions": 0, "reloaded_stale": 0,
+            "flushes": 0, "events_written": 0, "events_trimmed": 0, "flush_errors": 0,
+        }
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-write-behind", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # ---------------------------
+    # Hot cache
+    # ---------------------------
+    def _touch(self, key):
+        self._hot[key] = None
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_cache_size:
+            self.evict(*next(iter(self._hot)))
+
+    def _hot_session(self, app_name, user_id, session_id):
+        return self.sessions.get(app_name, {}).get(user_id, {}).get(session_id)
+
+    def evict(self, app_name, user_id, session_id):
+        """Drop a session from memory only; its persisted copy stays."""
+        key = (app_name, user_id, session_id)
+        self._hot.pop(key, None)
+        if self._hot_session(*key) is not None:
+            self.sessions[app_name][user_id].pop(session_id)
+            self.stats["hot_evictions"] += 1
+
+    def _stored_update_time(self, key):
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT last_update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key
+            ).fetchone()
+        return row[0] if row else None
+
+    def _read(self, key):
+        """Read a session from disk; None if it is not stored. Runs in a worker thread."""
+        with self._write_lock:
+            if key in self._pending:
+                self._write_batch()  # evicted before its last writes went out
+            with self._db_lock:
+                row = self._conn.execute(
+                    "SELECT state, last_update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key
+                ).fetchone()
+                if row is None:
+                    return None
+                events = self._conn.execute(
+                    "SELECT event FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+                    " ORDER BY seq DESC LIMIT ?",
+                    (*key, self.keep_events),
+                ).fetchall()
+        app_name, user_id, session_id = key
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=json.loads(row[0]),
+            events=recent_turns([Event.model_validate_json(e) for (e,) in reversed(events)], self.keep_events),
+            last_update_time=row[1],
+        )
+
+    async def _load(self, key):
+        """Read a session from disk into the hot cache; False if it is not stored."""
+        session = await asyncio.to_thread(self._read, key)
+        if session is None:
+            return False
+        if self._hot_session(*key) is not None:
+            return True  # loaded or created by another request meanwhile
+        app_name, user_id, session_id = key
+        self.sessions.setdefault(app_name, {}).setdefault(user_id, {})[session_id] = session
+        self.stats["loaded"] += 1
+        return True
+
+    # ---------------------------
+    # BaseSessionService
+    # ---------------------------
+    async def create_session(self, *, app_name, user_id, state=None, session_id=None):
+        session_id = session_id.strip() if session_id else None
+        if session_id and not session_id.startswith(EPHEMERAL_PREFIX):
+            key = (app_name, user_id, session_id)
+            # Raises AlreadyExistsError below if another worker created it.
+            if self._hot_session(*key) is None:
+                await self._load(key)
+        session = await super().create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        if not session.id.startswith(EPHEMERAL_PREFIX):
+            key = (app_name, user_id, session.id)
+            self._touch(key)
+            self._enqueue(key, session=self._hot_session(*key))
+        return session
+
+    async def get_session(self, *, app_name, user_id, session_id, config=None):
+        key = (app_name, user_id, session_id)
+        if not session_id.startswith(EPHEMERAL_PREFIX):
+            hot = self._hot_session(*key)
+            if hot is None:
+                await self._load(key)
+            elif key not in self._pending:
+                # Another worker may have continued this conversation.
+                stored = await asyncio.to_thread(self._stored_update_time, key)
+                hot = self._hot_session(*key)
+                if stored is not None and hot is not None and stored > hot.last_update_time:
+                    self.evict(*key)
+                    await self._load(key)
+                    self.stats["reloaded_stale"] += 1
+                else:
+                    self.stats["hot_hits"] += 1
+            if self._hot_session(*key) is not None:
+                self._touch(key)
+        return await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+
+    async def delete_session(self, *, app_name, user_id, session_id):
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if not session_id.startswith(EPHEMERAL_PREFIX):
+            key = (app_name, user_id, session_id)
+            self._hot.pop(key, None)
+            self._enqueue(key, delete=True)
+
+    async def expire_session(self, *, app_name, user_id, session_id, idle_seconds):
+        """Delete a session nobody has updated for idle_seconds, on any worker;
+        otherwise only drop it from memory. Returns True if it was deleted."""
+        key = (app_name, user_id, session_id)
+        stored = await asyncio.to_thread(self._stored_update_time, key)
+        if key in self._pending or (stored is not None and time.time() - stored < idle_seconds):
+            self.evict(*key)
+            return False
+        await self.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        return True
+
+    async def append_event(self, session, event):
+        key = (session.app_name, session.user_id, session.id)
+        if not event.partial and not session.id.startswith(EPHEMERAL_PREFIX) and self._hot_session(*key) is None:
+            # Dropped from the hot cache while its request was still running.
+            await self._load(key)
+        event = await super().append_event(session, event)
+        if event.partial or session.id.startswith(EPHEMERAL_PREFIX):
+            return event
+        stored = self._hot_session(*key)
+        if stored is None:
+            return event
+        if len(stored.events) > 2 * self.keep_events:
+            trimmed = recent_turns(stored.events, self.keep_events)
+            self.stats["events_trimmed"] += len(stored.events) - len(trimmed)
+            stored.events = trimmed
+        self._enqueue(key, session=stored, event=event)
+        return event
+
+    async def flush(self):
+        await asyncio.to_thread(self._write_pending)
+
+    # ---------------------------
+    # Write-behind
+    # ---------------------------
+    def _enqueue(self, key, session=None, event=None, delete=False):
+        with self._pending_lock:
+            op = self._pending.get(key)
+            if delete:
+                # Nothing queued for the session needs writing any more.
+                self._pending[key] = {"session": None, "events": [], "delete": True}
+            else:
+                if op is None:
+                    op = self._pending[key] = {"session": None, "events": [], "delete": False}
+                # State is copied here; events are not changed once appended.
+                op["session"] = (dict(session.state), session.last_update_time)
+                if event is not None:
+                    op["events"].append(event)
+            self._pending_writes += 1
+            if self._pending_writes >= SESSION_FLUSH_BATCH:
+                self._pending_lock.notify()
+
+    def _flush_loop(self):
+        while not self._closed:
+            with self._pending_lock:
+                self._pending_lock.wait(self.flush_interval)
+            self._write_pending()
+
+    def _write_pending(self):
+        with self._write_lock:
+            self._write_batch()
+
+    def _write_batch(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            self._pending_writes = 0
+        if not pending:
+            return
+        rows = []
+        for key, op in pending.items():
+            state, last_update_time = op["session"] or ({}, 0.0)
+            rows.append((
+                key,
+                op["delete"],
+                (json.dumps(state, default=str), last_update_time),
+                [event.model_dump_json(exclude_none=True) for event in op["events"]],
+            ))
+        try:
+            with self._db_lock:
+                self._conn.execute("BEGIN")
+                for key, delete, session_row, events in rows:
+                    if delete:
+                        self._conn.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key)
+                        self._conn.execute(
+                            "DELETE FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+                        )
+                        continue
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO sessions (app_name, user_id, id, state, last_update_time)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (*key, *session_row),
+                    )
+                    if not events:
+                        continue
+                    start = self._conn.execute(
+                        "SELECT COALESCE(MAX(seq), 0) FROM session_events"
+                        " WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                        key,
+                    ).fetchone()[0]
+                    self._conn.executemany(
+                        "INSERT INTO session_events (app_name, user_id, session_id, seq, event) VALUES (?, ?, ?, ?, ?)",
+                        [(*key, start + i + 1, event) for i, event in enumerate(events)],
+                    )
+                    # Compact: only the most recent events are ever loaded back.
+                    self._conn.execute(
+                        "DELETE FROM session_events WHERE app_name = ? AND user_id = ? AND session_id = ? AND seq <= ?",
+                        (*key, start + len(events) - self.keep_events),
+                    )
+                    self.stats["events_written"] += len(events)
+                self._conn.execute("COMMIT")
+            self.stats["flushes"] += 1
+        except Exception as e:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            self.stats["flush_errors"] += 1
+            logger.error(f"Failed to write {len(rows)} sessions: {e}")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._pending_lock:
+            self._pending_lock.notify()
+        self._write_pending()
+
+    def snapshot(self):
+        return {**self.stats, "hot_sessions": len(self._hot), "pending_writes": len(self._pending)}
+
+
+def make_session_service():
+    """The session service agents run on, chosen by AGENT_SESSION_BACKEND."""
+    if SESSION_BACKEND == "memory":
+        return InMemorySessionService()
+    return DurableSessionService()
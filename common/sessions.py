@@ -0,0 +1,211 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from common.session_store import EPHEMERAL_PREFIX
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from common.tracing import span
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Session store limits (env overridable)
+# ---------------------------
+SESSION_TTL_SECONDS = float(os.getenv("AGENT_SESSION_TTL", "1800"))
+MAX_SESSIONS = int(os.getenv("AGENT_MAX_SESSIONS", "1000"))
+MAX_EVENTS_PER_SESSION = int(os.getenv("AGENT_MAX_EVENTS_PER_SESSION", "40"))
+MAX_TOTAL_EVENTS = int(os.getenv("AGENT_MAX_TOTAL_EVENTS", "20000"))
+
+
+class _Entry:
+    __slots__ = ("user_id", "session_id", "last_used", "events", "leases")
+
+    def __init__(self, user_id, session_id):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.last_used = time.monotonic()
+        self.events = 0
+        self.leases = 0
+
+
+class SessionPool:
+    """Per-client ADK sessions with TTL, LRU and history-size limits.
+
+    Requests that carry a `session_id` (and optionally `user_id`) reuse that
+    client's session; everything else runs in a throwaway session that is
+    deleted as soon as the request finishes, so unrelated users never share
+    one conversation.
+
+    With a durable session service, LRU eviction only drops the session from
+    this worker's memory; the conversation stays on disk and is reloaded if
+    the client comes back. TTL expiry deletes it only if no worker has
+    updated it within the TTL, and long histories are trimmed to their
+    recent turns by the store instead of being reset.
+    """
+
+    def __init__(
+        self,
+        session_service,
+        app_name,
+        default_user_id,
+        ttl=SESSION_TTL_SECONDS,
+        max_sessions=MAX_SESSIONS,
+        max_events_per_session=MAX_EVENTS_PER_SESSION,
+        max_total_events=MAX_TOTAL_EVENTS,
+    ):
+        self.session_service = session_service
+        self.app_name = app_name
+        self.default_user_id = default_user_id
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_events_per_session = max_events_per_session
+        self.max_total_events = max_total_events
+        self.durable = hasattr(session_service, "evict")
+        self._entries = OrderedDict()
+        self.stats = {
+            "created": 0,
+            "reused": 0,
+            "ephemeral": 0,
+            "evicted_ttl": 0,
+            "evicted_lru": 0,
+            "history_resets": 0,
+        }
+        _pools[app_name] = self
+
+    @asynccontextmanager
+    async def lease(self, request):
+        """Yield (user_id, session_id) for one request."""
+        client_session = request.get("session_id") if isinstance(request, dict) else None
+        user_id = str((request.get("user_id") if isinstance(request, dict) else None) or self.default_user_id)
+
+        if not client_session:
+            session_id = f"{EPHEMERAL_PREFIX}{uuid.uuid4().hex}"
+            with span("session"):
+                await self.session_service.create_session(
+                    app_name=self.app_name, user_id=user_id, session_id=session_id
+                )
+            self.stats["ephemeral"] += 1
+            try:
+                yield user_id, session_id
+            finally:
+                await self._delete(user_id, session_id)
+            return
+
+        with span("session"):
+            entry = await self._get_or_create(user_id, str(client_session))
+        entry.leases += 1
+        try:
+            yield entry.user_id, entry.session_id
+        finally:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+            await self._account(entry)
+            await self._evict()
+
+    async def _get_or_create(self, user_id, session_id):
+        key = (user_id, session_id)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.last_used > self.ttl and not entry.leases:
+            await self._drop(key, "evicted_ttl")
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.stats["reused"] += 1
+            return entry
+
+        try:
+            existing = await self.session_service.get_session(
+                app_name=self.app_name, user_id=user_id, session_id=session_id
+            )
+            if existing is None:
+                await self.session_service.create_session(
+                    app_name=self.app_name, user_id=user_id, session_id=session_id
+                )
+                self.stats["created"] += 1
+            else:
+                self.stats["reused"] += 1
+        except AlreadyExistsError:
+            # A concurrent request (here or on another worker) created it first.
+            self.stats["reused"] += 1
+        # Another request for this session may have registered it while we waited.
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry(user_id, session_id)
+        return entry
+
+    async def _account(self, entry):
+        session = await self.session_service.get_session(
+            app_name=self.app_name, user_id=entry.user_id, session_id=entry.session_id
+        )
+        entry.events = len(session.events) if session else 0
+        # A durable store trims history to recent turns itself.
+        if entry.events > self.max_events_per_session and not entry.leases and not self.durable:
+            # Start the client over rather than let its prompt grow without bound.
+            await self._delete(entry.user_id, entry.session_id)
+            await self.session_service.create_session(
+                app_name=self.app_name, user_id=entry.user_id, session_id=entry.session_id
+            )
+            entry.events = 0
+            self.stats["history_resets"] += 1
+
+    async def _evict(self):
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            if not entry.leases and now - entry.last_used > self.ttl:
+                await self._drop(key, "evicted_ttl")
+
+        def over_limit():
+            total = sum(e.events for e in self._entries.values())
+            return len(self._entries) > self.max_sessions or total > self.max_total_events
+
+        for key, entry in list(self._entries.items()):
+            if not over_limit():
+                break
+            if not entry.leases:
+                if self.durable:
+                    self._entries.pop(key, None)
+                    self.session_service.evict(self.app_name, *key)
+                    self.stats["evicted_lru"] += 1
+                else:
+                    await self._drop(key, "evicted_lru")
+
+    async def _drop(self, key, reason):
+        self._entries.pop(key, None)
+        if self.durable:
+            # Another worker may still be serving this conversation.
+            try:
+                await self.session_service.expire_session(
+                    app_name=self.app_name, user_id=key[0], session_id=key[1], idle_seconds=self.ttl
+                )
+            except Exception as e:
+                logger.warning(f"Failed to expire session {key[1]}: {e}")
+        else:
+            await self._delete(*key)
+        self.stats[reason] += 1
+
+    async def _delete(self, user_id, session_id):
+        try:
+            await self.session_service.delete_session(
+                app_name=self.app_name, user_id=user_id, session_id=session_id
+            )
+        except Exception as e:
+            logger.warning(f"Failed to delete session {session_id}: {e}")
+
+    def snapshot(self):
+        events = [e.events for e in self._entries.values()]
+        return {
+            **self.stats,
+            "sessions": len(events),
+            "history_events": sum(events),
+            "largest_history": max(events, default=0),
+            **({"store": self.session_service.snapshot()} if hasattr(self.session_service, "snapshot") else {}),
+        }
+
+
+_pools = {}
+
+
+def session_stats():
+    return {name: pool.snapshot() for name, pool in _pools.items()}
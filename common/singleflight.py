@@ -0,0 +1,62 @@
+import asyncio
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one in-flight call.
+
+    The first caller for a key starts the work; callers that arrive while it
+    is running wait on the same task and get the same result or exception.
+
+    With `cancel_abandoned`, the work is cancelled once every caller waiting
+    on it has been cancelled (a deadline hit or the client went away), rather
+    than running on for nobody. Named instances are reported by flight_stats().
+    """
+
+    def __init__(self, name=None, cancel_abandoned=False):
+        self._inflight = {}
+        self._waiters = {}
+        self.cancel_abandoned = cancel_abandoned
+        self.stats = {"leaders": 0, "shared": 0, "failed": 0, "abandoned": 0}
+        if name is not None:
+            _flights[name] = self
+
+    def is_in_flight(self, key):
+        return key in self._inflight
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["failed"] += 1
+
+    async def do(self, key, make_call):
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["leaders"] += 1
+            task = asyncio.ensure_future(make_call())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.stats["shared"] += 1
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+                if self.cancel_abandoned and self._waiters[key] == 0 and not task.done():
+                    self.stats["abandoned"] += 1
+                    task.cancel()
+            raise
+
+    def snapshot(self):
+        return {**self.stats, "in_flight": len(self._inflight)}
+
+
+_flights = {}
+
+
+def flight_stats():
+    return {name: flight.snapshot() for name, flight in _flights.items()}
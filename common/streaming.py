@@ -0,0 +1,79 @@
+from contextlib import aclosing
+from fastapi.responses import StreamingResponse
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from common.tracing import span
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+SSE_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
+
+def sse(data, event=None):
+    """Format one server-sent event."""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    payload = json.dumps(data, default=str)
+    lines.extend(f"data: {line}" for line in payload.splitlines())
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_response(events, background=None):
+    """Wrap an async iterator of (event, data) pairs in a text/event-stream response.
+
+    `background` runs once the response has finished, even if the client
+    went away before the body was consumed.
+    """
+
+    async def body():
+        try:
+            async for event, data in events:
+                yield sse(data, event)
+        except Exception as e:
+            logger.error(f"Stream failed: {e}")
+            yield sse({"status": "error", "message": str(e)}, "error")
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background,
+    )
+
+
+async def stream_model(runner, sessions, request, message, extractor=None):
+    """Run the agent in SSE mode and yield ("token", text) for each partial
+    chunk, then ("final", text) once with the complete response text.
+
+    ("final", None) is yielded if the model never produced a final response.
+    With an `extractor` (see common.structured_output), partial chunks are
+    fed to it and generation stops as soon as it holds a complete result;
+    the final text is then what had arrived so far.
+    """
+    final = None
+    async with sessions.lease(request) as (user_id, session_id):
+        # aclosing: breaking out must close the run (and the model stream)
+        # now, before the lease gives the session back.
+        with span("model"):
+            async with aclosing(runner.run_async(
+                user_id=user_id,
+                session_id=session_id,
+                new_message=message,
+                run_config=SSE_RUN_CONFIG,
+            )) as events:
+                async for event in events:
+                    text = ""
+                    if event.content and event.content.parts:
+                        text = "".join(part.text or "" for part in event.content.parts)
+                    if event.partial:
+                        if text:
+                            yield "token", text
+                            if extractor is not None and extractor.feed(text):
+                                logger.debug("Structured output complete; stopping generation early")
+                                final = extractor.text
+                                break
+                    elif event.is_final_response() and final is None:
+                        final = text
+    yield "final", final
@@ -0,0 +1,224 @@
+"""
+Structured-output parsing shared by the agents.
+
+Models wrap JSON in code fences, lead with a sentence ("Here are the
+listings:") or trail off into commentary. `JsonExtractor` scans text as it
+arrives and finds the first complete top-level JSON object or array,
+whatever surrounds it. Given the key the agent wants ("buyer", "price", ...)
+it also notices when that array has closed, so a streaming caller can stop
+generation there. `OutputSchema` checks the result has the agent's shape.
+"""
+from collections import defaultdict
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_OPENERS = re.compile(r"[{\[]")
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_STRING_END = re.compile(r'["\\]')
+
+
+class JsonExtractor:
+    """Incremental scanner for the first complete JSON object or array in text.
+
+    Call `feed(chunk)` as text arrives; it returns True once `value` holds a
+    parsed result. With `key` set, the extractor also finishes as soon as the
+    top-level object's `key` array has closed, and `value` is then
+    {key: that array}.
+    """
+
+    def __init__(self, key=None):
+        self.key = key
+        self.text = ""
+        self.value = None
+        self.done = False
+        self.early = False  # finished on the key's array before the whole object closed
+        self._reset(0)
+
+    def _reset(self, pos):
+        self._pos = pos
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._string_start = None
+        self._last_key = None
+        self._array_start = None
+
+    def feed(self, chunk):
+        if self.done:
+            return True
+        self.text += chunk
+        self._scan()
+        return self.done
+
+    def _scan(self):
+        text = self.text
+        while not self.done:
+            if self._start is None:
+                match = _OPENERS.search(text, self._pos)
+                if match is None:
+                    self._pos = len(text)
+                    return
+                self._start = match.start()
+                self._depth = 1
+                self._pos = match.end()
+                continue
+
+            match = (_STRING_END if self._in_string else _STRUCTURE).search(text, self._pos)
+            if match is None:
+                self._pos = len(text)
+                return
+            pos = match.start()
+            char = text[pos]
+            if self._in_string:
+                if char == "\\":
+                    if pos + 1 >= len(text):
+                        self._pos = pos  # wait for the escaped character
+                        return
+                    self._pos = pos + 2
+                    continue
+                if char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:pos]
+                self._pos = pos + 1
+                continue
+
+            self._pos = pos + 1
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char in "{[":
+                if (char == "[" and self._depth == 1 and self.key is not None
+                        and self._last_key == self.key and text[self._start] == "{"):
+                    self._array_start = pos
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._array_start is not None and char == "]":
+                    self._finish_array(pos)
+                elif self._depth == 0:
+                    self._finish(pos)
+                if self._depth == 1 and char in "}]":
+                    self._last_key = None
+
+    def close(self):
+        """Signal end of input: an opener that never closed was prose, so
+        look for a value after it. Returns True if a value was found."""
+        while not self.done and self._start is not None:
+            self._reset(self._start + 1)
+            self._scan()
+        return self.done
+
+    def _finish_array(self, end):
+        try:
+            items = json.loads(self.text[self._array_start:end + 1])
+        except json.JSONDecodeError:
+            self._array_start = None
+            return
+        self.value = {self.key: items}
+        self.done = self.early = True
+
+    def _finish(self, end):
+        candidate = self.text[self._start:end + 1]
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            value = None
+        if isinstance(value, dict) or (isinstance(value, list) and all(isinstance(v, dict) for v in value)):
+            self.value = value
+            self.done = True
+            return
+        # Not the payload (prose like "[1]" or "{see below}"): keep looking after it.
+        self._reset(self._start + 1)
+
+
+def extract_json(text, key=None):
+    """The first complete JSON object/array in `text`, or None."""
+    stripped = (text or "").strip()
+    if stripped.startswith("```"):
+        stripped = stripped.split("\n", 1)[-1].rstrip("`").strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            value = json.loads(stripped)  # the common case: nothing around the JSON
+            if isinstance(value, (dict, list)):
+                return value
+        except json.JSONDecodeError:
+            pass
+    extractor = JsonExtractor(key)
+    extractor.feed(text or "")
+    extractor.close()
+    return extractor.value
+
+
+class SchemaError(ValueError):
+    pass
+
+
+class OutputSchema:
+    """Expected shape of one agent's output: {key: [item, ...]}.
+
+    Items are objects; `required` lists fields each item must have. Items
+    missing them are dropped, and if none survive the output is rejected.
+    A bare array is accepted as the key's items, and a single object under
+    the key as a one-item array.
+    """
+
+    def __init__(self, key, required=()):
+        self.key = key
+        self.required = tuple(required)
+
+    def extractor(self):
+        return JsonExtractor(self.key)
+
+    def validate(self, value):
+        if isinstance(value, dict) and self.key in value:
+            items = value[self.key]
+        elif isinstance(value, list):
+            items = value
+        else:
+            items = None
+        if isinstance(items, dict):
+            items = [items]
+        if not isinstance(items, list):
+            raise SchemaError(f"expected a '{self.key}' array")
+        valid = [
+            item for item in items
+            if isinstance(item, dict) and all(item.get(field) not in (None, "") for field in self.required)
+        ]
+        if items and not valid:
+            raise SchemaError(f"no '{self.key}' item has all of {', '.join(self.required)}")
+        if len(valid) < len(items):
+            logger.warning(f"Dropped {len(items) - len(valid)} malformed '{self.key}' items")
+        return valid
+
+    def parse(self, text, extractor=None):
+        """Return the validated items from model text (or a finished extractor).
+
+        Raises SchemaError when no usable JSON is found.
+        """
+        value = extractor.value if extractor is not None and extractor.done else None
+        if value is None:
+            if not text:
+                stats[self.key]["failed"] += 1
+                raise SchemaError("empty model output")
+            value = extract_json(text, self.key)
+        if value is None:
+            stats[self.key]["failed"] += 1
+            raise SchemaError("no JSON object found in model output")
+        try:
+            items = self.validate(value)
+        except SchemaError:
+            stats[self.key]["failed"] += 1
+            raise
+        stats[self.key]["early" if extractor is not None and extractor.early else "ok"] += 1
+        return items
+
+
+stats = defaultdict(lambda: {"ok": 0, "early": 0, "failed": 0})
+
+
+def parser_stats():
+    return {key: dict(counts) for key, counts in stats.items()}
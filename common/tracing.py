@@ -0,0 +1,180 @@
+"""
+Request tracing and Prometheus metrics.
+
+Every request to an agent server runs under a trace ID: taken from the
+X-Trace-Id header when a caller (the host) sends one, otherwise newly made.
+`call_agent` forwards it, so one host request and its four downstream calls
+share an ID in the logs. The request's priority class travels the same way
+in X-Priority. Inside a request, `span(stage)` times a stage;
+durations go into per-agent, per-stage histograms served by /metrics.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import bisect
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace-Id"
+PRIORITY_HEADER = "X-Priority"
+
+# Histogram buckets in seconds: sub-millisecond parsing up to slow generations.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_trace = ContextVar("trace", default=None)
+
+# Called as hook(trace, elapsed_seconds) when a request finishes.
+end_hooks = []
+
+
+class Trace:
+    def __init__(self, trace_id, agent, route, priority=None):
+        self.trace_id = trace_id
+        self.agent = agent
+        self.route = route
+        self.priority = priority
+        self.start = time.perf_counter()
+        self.spans = []  # (stage, seconds); shared with tasks spawned from the request
+        # Per-request log sampling state, managed by common.logging_setup
+        self.log_sampled = None
+        self.log_deferred = []
+        # Prompt and token counts, managed by common.prompt_budget
+        self.usage = {}
+
+    def summary(self):
+        parts = " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in self.spans)
+        usage = " ".join(f"{key}={value}" for key, value in self.usage.items())
+        return f"trace={self.trace_id} agent={self.agent} route={self.route} {parts} {usage}".rstrip()
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Histograms keyed by (metric name, label tuple)."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, labels, value, buckets=BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def render(self):
+        """Prometheus text exposition of every histogram."""
+        lines = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+        seen = set()
+        for (name, labels), histogram in items:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                cumulative += count
+                sep = "," if label_text else ""
+                lines.append(f'{name}_bucket{{{label_text}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{label_text}}} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{{{label_text}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def current_trace():
+    return _trace.get()
+
+
+def current_trace_id():
+    trace = _trace.get()
+    return trace.trace_id if trace else None
+
+
+def trace_headers():
+    """Headers that carry the current trace and priority to a downstream agent."""
+    trace = _trace.get()
+    if trace is None:
+        return {}
+    headers = {TRACE_HEADER: trace.trace_id}
+    if trace.priority:
+        headers[PRIORITY_HEADER] = trace.priority
+    return headers
+
+
+@contextmanager
+def request_trace(agent, route, trace_id=None, priority=None):
+    """Run one request under a trace; records the total and logs the span summary."""
+    trace = Trace(trace_id or new_trace_id(), agent, route, priority)
+    token = _trace.set(trace)
+    status = "error"
+    try:
+        yield trace
+        status = "ok"
+    finally:
+        elapsed = time.perf_counter() - trace.start
+        metrics.observe(
+            "agent_request_duration_seconds", {"agent": agent, "route": route, "outcome": status}, elapsed
+        )
+        logger.info(f"{trace.summary()} total={elapsed * 1000:.1f}ms outcome={status}")
+        for hook in end_hooks:
+            hook(trace, elapsed)
+        _trace.reset(token)
+
+
+def record(stage, seconds):
+    """Record an already-measured stage on the current trace."""
+    trace = _trace.get()
+    if trace is None:
+        return
+    trace.spans.append((stage, seconds))
+    metrics.observe("agent_stage_duration_seconds", {"agent": trace.agent, "stage": stage}, seconds)
+
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def traced(stage):
+    """Decorator form of span() for plain functions."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def render_metrics():
+    return metrics.render()
@@ -0,0 +1,168 @@
+import csv
+import logging
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RATES_PATH = os.getenv(
+    "VALUATION_RATES_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "shared", "data", "city_rates.csv"),
+)
+
+DEFAULT_RATE_PER_SQFT = 4000
+DEFAULT_SIZE_SQFT = 1000
+FALLBACK_PRICE = 5000000
+MAX_NGRAM = 3
+
+# Property type -> code; the multiplier array is indexed by the same code.
+PROPERTY_TYPES = {"other": 0, "apartment": 1, "villa": 2, "plot": 3}
+TYPE_MULTIPLIERS = np.array([1.0, 1.0, 1.3, 0.7])
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+class RateTable:
+    """Per-sq.ft rates for cities and localities, indexed for fast lookup.
+
+    Location code 0 is the unknown-location default. Free-text locations are
+    matched on word n-grams; a locality match wins over a city match, and
+    among several cities the highest-rated one wins.
+    """
+
+    def __init__(self, rows):
+        names = ["<default>"]
+        kinds = ["default"]
+        cities = [""]
+        rates = [DEFAULT_RATE_PER_SQFT]
+        self.index = {}
+        for row in rows:
+            name = " ".join(_tokens(row["name"]))
+            if not name or name in self.index:
+                continue
+            self.index[name] = len(names)
+            names.append(name)
+            kinds.append(row["kind"])
+            cities.append(" ".join(_tokens(row.get("city") or "")))
+            rates.append(float(row["rate_per_sqft"]))
+        self.names = names
+        self.cities = cities
+        self.is_locality = np.array([k == "locality" for k in kinds])
+        self.rates = np.array(rates, dtype=np.float64)
+        self.encode = lru_cache(maxsize=65536)(self._encode)
+
+    @classmethod
+    def load(cls, path=RATES_PATH):
+        with open(path, newline="", encoding="utf-8") as f:
+            table = cls(csv.DictReader(f))
+        logger.info(f"Loaded {len(table.names) - 1} valuation rates from {path}")
+        return table
+
+    def _encode(self, location):
+        tokens = _tokens(location)
+        best = 0
+        for n in range(1, MAX_NGRAM + 1):
+            for i in range(len(tokens) - n + 1):
+                code = self.index.get(" ".join(tokens[i:i + n]))
+                if code is None:
+                    continue
+                if (self.is_locality[code], self.rates[code]) > (self.is_locality[best], self.rates[best]):
+                    best = code
+        return best
+
+    def encode_many(self, locations):
+        """Location strings -> int32 codes; each distinct string is matched once."""
+        return np.fromiter(map(self.encode, locations), dtype=np.int32, count=len(locations))
+
+    def rate_for(self, location):
+        return float(self.rates[self.encode(str(location))])
+
+    def value_many(self, sizes, type_codes, location_codes):
+        """Vectorized price in INR for arrays of size, type code and location code."""
+        sizes = np.asarray(sizes, dtype=np.float64)
+        sizes = np.where(np.isfinite(sizes) & (sizes > 0), np.floor(sizes), DEFAULT_SIZE_SQFT)
+        multipliers = TYPE_MULTIPLIERS[np.asarray(type_codes, dtype=np.int64)]
+        return (self.rates[np.asarray(location_codes, dtype=np.int64)] * multipliers * sizes).astype(np.int64)
+
+
+@lru_cache(maxsize=1024)
+def _type_code(property_type):
+    return PROPERTY_TYPES.get(property_type.strip().lower(), 0)
+
+
+def encode_types(property_types):
+    return np.fromiter(map(_type_code, property_types), dtype=np.int64, count=len(property_types))
+
+
+def to_sizes(values):
+    """Coerce mixed size values to floats; anything unparseable becomes NaN."""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    sizes = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            sizes[i] = float(value)
+        except (TypeError, ValueError):
+            sizes[i] = np.nan
+    return sizes
+
+
+@lru_cache(maxsize=1)
+def rate_table():
+    """The process-wide rate table, loaded on first use."""
+    return RateTable.load()
+
+
+def canonical_location(location):
+    """Stable key for a free-text location.
+
+    A known locality is keyed by its name alone, however the city is
+    written ("Koramangala", "koramangala, Bengaluru"); anything else by its
+    lower-cased words.
+    """
+    table = rate_table()
+    code = table.encode(str(location))
+    if code and table.is_locality[code]:
+        return table.names[code]
+    return " ".join(_tokens(location))
+
+
+def resolve_location(location):
+    """(locality, city) canonical names for a free-text location; "" where unknown."""
+    table = rate_table()
+    code = table.encode(str(location))
+    if not code:
+        return "", ""
+    locality = table.names[code] if table.is_locality[code] else ""
+    return locality, table.cities[code]
+
+
+def known_localities():
+    """(canonical key, display location) for every locality in the rate table."""
+    table = rate_table()
+    return [
+        (name, f"{name.title()}, {city.title()}")
+        for name, city, is_locality in zip(table.names, table.cities, table.is_locality)
+        if is_locality
+    ]
+
+
+def value_properties(locations, sizes, property_types):
+    """Value parallel sequences of locations, sizes and types; returns an int64 array."""
+    table = rate_table()
+    return table.value_many(
+        to_sizes(sizes), encode_types(property_types), table.encode_many(locations)
+    )
+
+
+def value_property(location, size_sqft, property_type):
+    return int(value_properties([str(location)], [size_sqft], [str(property_type)])[0])
@@ -1,6 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
 import requests
 import json
+import os
+import threading
+import time
 
 # ---------------------------
 # Agent Endpoints
@@ -12,12 +16,66 @@ AGENT_URLS = {
     "neighborhood": "http://localhost:8004/run",
 }
 
+# Seconds a successful agent result is reused for the same inputs (0 disables)
+RESULT_CACHE_TTL = float(os.getenv("STREAMLIT_RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_MAX_ENTRIES = 256
+
+# ---------------------------
+# Helper: Shared HTTP Session and Result Cache
+# (cache_resource keeps them across Streamlit reruns and browser sessions)
+# ---------------------------
+@st.cache_resource
+def http_session():
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=len(AGENT_URLS), pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def result_cache():
+    return {"entries": {}, "lock": threading.Lock()}
+
+
+def _cache_key(agent: str, payload: dict):
+    return agent, json.dumps(payload, sort_keys=True, default=str)
+
+
+def cached_result(agent: str, payload: dict):
+    cache = result_cache()
+    key = _cache_key(agent, payload)
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del cache["entries"][key]
+            return None
+        return entry[1]
+
+
+def remember_result(agent: str, payload: dict, result: dict):
+    # Only successful results are reused; errors are retried on the next run.
+    if RESULT_CACHE_TTL <= 0 or not isinstance(result, dict) or result.get("status") != "success":
+        return
+    cache = result_cache()
+    now = time.monotonic()
+    with cache["lock"]:
+        entries = cache["entries"]
+        if len(entries) >= RESULT_CACHE_MAX_ENTRIES:
+            for key in [k for k, (expires, _) in entries.items() if expires < now]:
+                del entries[key]
+            while len(entries) >= RESULT_CACHE_MAX_ENTRIES:
+                del entries[next(iter(entries))]
+        entries[_cache_key(agent, payload)] = (now + RESULT_CACHE_TTL, result)
+
 # ---------------------------
 # Helper: Call Agent
 # ---------------------------
-def call_agent(agent: str, payload: dict):
+def call_agent(agent: str, payload: dict, session=None):
     try:
-        response = requests.post(AGENT_URLS[agent], json=payload, timeout=30)
+        response = (session or http_session()).post(AGENT_URLS[agent], json=payload, timeout=30)
         if response.status_code == 200:
             return response.json()
         else:
@@ -25,6 +83,68 @@ def call_agent(agent: str, payload: dict):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+# ---------------------------
+# Helper: Stream Agent (renders model output as it arrives)
+# ---------------------------
+def stream_agent(agent: str, payload: dict, placeholder):
+    result = cached_result(agent, payload)
+    if result is None:
+        result = _stream_agent(agent, payload, placeholder)
+        remember_result(agent, payload, result)
+    return result
+
+
+def _stream_agent(agent: str, payload: dict, placeholder):
+    try:
+        with http_session().post(AGENT_URLS[agent] + "/stream", json=payload, stream=True, timeout=30) as response:
+            if response.status_code != 200:
+                return call_agent(agent, payload)
+            partial = ""
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "token":
+                        partial += data.get("text", "")
+                        placeholder.code(partial[-2000:], language="json")
+                    elif event in ("result", "error"):
+                        placeholder.empty()
+                        return data
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    placeholder.empty()
+    return {"status": "error", "message": "Agent stream ended without a result"}
+
+# ---------------------------
+# Helper: Query Several Agents Concurrently
+# ---------------------------
+def call_agents(payloads: dict):
+    """Yield (agent, result, from_cache) as each agent's result becomes available.
+
+    Cached results come first; the rest are requested in parallel and yielded
+    in completion order.
+    """
+    pending = {}
+    for agent, payload in payloads.items():
+        result = cached_result(agent, payload)
+        if result is not None:
+            yield agent, result, True
+        else:
+            pending[agent] = payload
+    if not pending:
+        return
+    # Cached resources need the script thread; the workers get the session passed in.
+    session = http_session()
+    with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+        futures = {pool.submit(call_agent, agent, payload, session): agent for agent, payload in pending.items()}
+        for future in as_completed(futures):
+            agent = futures[future]
+            result = future.result()
+            remember_result(agent, pending[agent], result)
+            yield agent, result, False
+
 # ---------------------------
 # Helper: Price to Words (Indian numbering system)
 # ---------------------------
@@ -289,7 +409,7 @@ def display_neighborhood_response(result, location):
         data = (result.get("data") or result.get("neighborhood") or 
                result.get("info") or result.get("details") or {})
         
-        if data or any(key not in ["status", "message", "buyer"] for key in result.keys()):
+        if data or any(key not in ["status", "message", "buyer", "nearby"] for key in result.keys()):
             st.markdown(f"### 🌆 {location} - Neighborhood Overview")
             
             # Combine data from both 'data' field and direct result fields
@@ -299,7 +419,7 @@ def display_neighborhood_response(result, location):
             
             # Add other fields from result
             for key, value in result.items():
-                if key not in ["status", "message", "data", "neighborhood", "info", "details", "buyer"] and value:
+                if key not in ["status", "message", "data", "neighborhood", "info", "details", "buyer", "nearby"] and value:
                     all_info[key] = value
             
             if all_info:
@@ -341,6 +461,11 @@ def display_neighborhood_response(result, location):
                 st.info("Neighborhood information is available but no detailed data provided.")
         else:
             st.info("Neighborhood information retrieved successfully.")
+
+        nearby = result.get("nearby")
+        if nearby:
+            st.markdown("**🧭 Nearby Areas**")
+            st.write(" · ".join(f"{place['name']} ({place['distance_km']} km)" for place in nearby))
     else:
         st.error(f"❌ {result.get('message', 'Could not fetch neighborhood info')}")
 
@@ -355,13 +480,97 @@ st.markdown("*Professional real estate platform powered by AI agents*")
 # Sidebar
 agent_choice = st.sidebar.selectbox(
     "Choose Agent",
-    ["Buyer Agent", "Seller Agent", "Price Estimator Agent", "Neighborhood Agent"]
+    ["Full Analysis", "Buyer Agent", "Seller Agent", "Price Estimator Agent", "Neighborhood Agent"]
 )
 
+# ---------------------------
+# Full Analysis (all four agents)
+# ---------------------------
+if agent_choice == "Full Analysis":
+    st.header("📊 Full Analysis - All Agents")
+    st.markdown("Search, listing, valuation and neighborhood insights for one property in a single run")
+
+    with st.form("full_form"):
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            location = st.text_input("📍 Location", placeholder="e.g., Koramangala, Bangalore")
+            property_type = st.selectbox("🏘️ Property Type", ["Apartment", "Villa", "Plot", "Other"])
+
+        with col2:
+            budget = st.number_input("💰 Budget / Price (INR)", min_value=100000, step=100000, value=5000000)
+            size = st.number_input("📏 Size (sq.ft)", min_value=100, value=1000)
+
+        with col3:
+            bedrooms = st.number_input("🛏️ Bedrooms", min_value=1, max_value=10, value=2)
+            bathrooms = st.number_input("🚿 Bathrooms", min_value=1, max_value=10, value=2)
+
+        requirements = st.text_area("📝 Additional Requirements", placeholder="e.g., 2BHK, near metro...")
+        submitted = st.form_submit_button("📊 Run Full Analysis", use_container_width=True)
+
+    if submitted and location:
+        payloads = {
+            "buyer": {
+                "location": location,
+                "budget": budget,
+                "property_type": property_type,
+                "requirements": requirements,
+            },
+            "seller": {
+                "seller_name": "",
+                "contact": "",
+                "property": {
+                    "location": location,
+                    "size_sqft": size,
+                    "price": budget,
+                    "type": property_type,
+                },
+            },
+            "price": {
+                "location": location,
+                "size_sqft": size,
+                "property_type": property_type,
+                "bedrooms": bedrooms,
+                "bathrooms": bathrooms,
+            },
+            "neighborhood": {"location": location},
+        }
+        titles = {
+            "buyer": "🔍 Matching Properties",
+            "seller": "🏠 Comparable Listings",
+            "price": "💰 Valuation",
+            "neighborhood": "🌆 Neighborhood",
+        }
+
+        # One panel per agent, filled in as each result arrives.
+        panels = {}
+        top, bottom = st.columns(2), st.columns(2)
+        for column, agent in zip(top + bottom, titles):
+            with column:
+                st.subheader(titles[agent])
+                panels[agent] = st.empty()
+                panels[agent].info("⏳ Waiting for agent...")
+
+        started = time.perf_counter()
+        for agent, result, from_cache in call_agents(payloads):
+            with panels[agent].container():
+                if from_cache:
+                    st.caption("⚡ Cached result")
+                else:
+                    st.caption(f"⏱️ {time.perf_counter() - started:.1f}s")
+                if agent == "buyer":
+                    display_buyer_response(result)
+                elif agent == "seller":
+                    display_seller_response(result)
+                elif agent == "price":
+                    display_price_response(result)
+                else:
+                    display_neighborhood_response(result, location)
+
 # ---------------------------
 # Buyer Agent
 # ---------------------------
-if agent_choice == "Buyer Agent":
+elif agent_choice == "Buyer Agent":
     st.header("🔍 Property Search - Buyer Agent")
     st.markdown("Find your ideal property based on your preferences and budget")
     
@@ -387,7 +596,7 @@ if agent_choice == "Buyer Agent":
         }
         
         with st.spinner("🔍 Searching for properties..."):
-            result = call_agent("buyer", payload)
+            result = stream_agent("buyer", payload, st.empty())
         
         display_buyer_response(result)
 
@@ -424,7 +633,7 @@ elif agent_choice == "Seller Agent":
         }
         
         with st.spinner("🏠 Creating property listing..."):
-            result = call_agent("seller", payload)
+            result = stream_agent("seller", payload, st.empty())
         
         display_seller_response(result)
 
@@ -457,7 +666,7 @@ elif agent_choice == "Price Estimator Agent":
         }
         
         with st.spinner("💰 Analyzing market data..."):
-            result = call_agent("price", payload)
+            result = stream_agent("price", payload, st.empty())
         
         display_price_response(result)
 
@@ -477,7 +686,7 @@ elif agent_choice == "Neighborhood Agent":
         payload = {"location": location}
         
         with st.spinner("🌆 Analyzing neighborhood..."):
-            result = call_agent("neighborhood", payload)
+            result = stream_agent("neighborhood", payload, st.empty())
         
         display_neighborhood_response(result, location)
 
@@ -0,0 +1,29 @@
+"""Host deadline misses count against the downstream agent's circuit."""
+import asyncio
+
+from agents.host_agent import task_manager
+from common import a2a_client, circuit_breaker
+
+
+async def _hung_agent(url, payload, timeout):
+    await asyncio.sleep(30)
+
+
+def test_deadline_misses_open_the_circuit(monkeypatch):
+    monkeypatch.setattr(a2a_client, "_post_json", _hung_agent)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    payload = {"location": "Powai, Mumbai", "size_sqft": 900}
+
+    async def run():
+        outcomes = []
+        for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+            outcomes.append(await task_manager._call_section("price", payload, 0.05))
+        return outcomes, await task_manager._call_section("price", payload, 0.05)
+
+    outcomes, after = asyncio.run(run())
+
+    assert [status for _, status, _ in outcomes[:-1]] == ["missing"] * (len(outcomes) - 1)
+    assert outcomes[-1][1] == "degraded"
+    assert circuit_breaker.circuit_state(task_manager.AGENT_URLS["price"]) == circuit_breaker.OPEN
+    # Once open, the section is served degraded without waiting on the agent.
+    assert after == (None, "degraded", 0.0)